@@ -0,0 +1,126 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import argparse
+import os
+import time
+import json
+import numpy as np
+import tensorflow as tf
+from tensorflow.python.framework.convert_to_constants import \
+     convert_variables_to_constants_v2_as_graph
+# AUCMEDI libraries
+from aucmedi import Neural_Network
+from aucmedi.neural_network.architectures import architecture_dict
+# ENSMIC libraries
+from ensmic.data_loading import architecture_list
+
+#-----------------------------------------------------#
+#                      Argparser                      #
+#-----------------------------------------------------#
+parser = argparse.ArgumentParser(description="Benchmark: Per-image CPU inference costs of all architectures")
+parser.add_argument("-c", "--classes", help="Number of classes of the classification head",
+                    required=False, type=int, dest="classes", default=4)
+parser.add_argument("-t", "--threads", help="Number of CPU threads for inference",
+                    required=False, type=int, dest="threads", default=1)
+parser.add_argument("-r", "--repetitions", help="Number of timed single-image predictions per architecture",
+                    required=False, type=int, dest="repetitions", default=50)
+args = parser.parse_args()
+
+#-----------------------------------------------------#
+#                    Configurations                   #
+#-----------------------------------------------------#
+# Initialize configuration dictionary
+config = {}
+# Path to result directory
+config["path_results"] = "results"
+# Benchmark configurations
+config["n_classes"] = args.classes
+config["threads"] = args.threads
+config["repetitions"] = args.repetitions
+# List of architectures
+config["architecture_list"] = architecture_list
+
+# Run inference on CPU with a fixed number of threads
+os.environ["CUDA_VISIBLE_DEVICES"] = ""
+tf.config.threading.set_intra_op_parallelism_threads(config["threads"])
+tf.config.threading.set_inter_op_parallelism_threads(config["threads"])
+
+#-----------------------------------------------------#
+#                  Cost Measurement                   #
+#-----------------------------------------------------#
+def measure_latency(model, image, repetitions):
+    # Warm up (graph tracing, memory allocation)
+    model(image, training=False)
+    # Measure latency of each single-image prediction in milliseconds
+    timings = []
+    for i in range(0, repetitions):
+        timer_start = time.perf_counter()
+        model(image, training=False)
+        timings.append((time.perf_counter() - timer_start) * 1e3)
+    return float(np.median(timings))
+
+def measure_flops(model, input_shape):
+    # Freeze forward pass of a single image into a constant graph
+    function = tf.function(lambda x: model(x, training=False))
+    concrete = function.get_concrete_function(
+                   tf.TensorSpec([1] + list(input_shape), tf.float32))
+    _, graph_def = convert_variables_to_constants_v2_as_graph(concrete)
+    # Count floating point operations via the TensorFlow profiler
+    with tf.Graph().as_default() as graph:
+        tf.graph_util.import_graph_def(graph_def, name="")
+        options = tf.compat.v1.profiler.ProfileOptionBuilder.float_operation()
+        options["output"] = "none"
+        profile = tf.compat.v1.profiler.profile(graph=graph, cmd="op",
+                                                options=options)
+    return int(profile.total_float_ops)
+
+#-----------------------------------------------------#
+#                     Main Runner                     #
+#-----------------------------------------------------#
+results = {}
+for architecture in config["architecture_list"]:
+    # Initialize architecture with randomly initialized weights
+    nn_arch = architecture_dict[architecture](channels=3)
+    input_shape = tuple(nn_arch.input)
+    model = Neural_Network(config["n_classes"], channels=3, architecture=nn_arch,
+                           activation_output="softmax",
+                           loss="categorical_crossentropy",
+                           pretrained_weights=False).model
+    # Measure single-image latency, FLOPs and parameters
+    image = np.random.default_rng(0).random((1,) + input_shape,
+                                            dtype=np.float32)
+    results[architecture] = {
+        "latency_ms": measure_latency(model, image, config["repetitions"]),
+        "flops": measure_flops(model, input_shape),
+        "params": int(model.count_params()),
+    }
+    print(architecture, "-", "latency: %.1f ms" % results[architecture]["latency_ms"],
+          "|", "FLOPs: %.2f G" % (results[architecture]["flops"] / 1e9))
+    tf.keras.backend.clear_session()
+
+# Store benchmark results as JSON to disk
+if not os.path.exists(config["path_results"]) : os.mkdir(config["path_results"])
+path_bench = os.path.join(config["path_results"], "benchmark.architecture_costs.json")
+with open(path_bench, "w") as file:
+    json.dump({"config": config, "results": results}, file, indent=2)
@@ -0,0 +1,213 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import argparse
+import os
+import time
+import json
+import platform
+import subprocess
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+import sklearn
+# Internal libraries/scripts
+from ensmic.ensemble import ensembler_dict, ensembler, PredictionCube
+
+#-----------------------------------------------------#
+#                      Argparser                      #
+#-----------------------------------------------------#
+parser = argparse.ArgumentParser(description="Benchmark: Scaling of all ensemblers over a grid of samples x architectures x classes")
+parser.add_argument("-s", "--samples", help="Comma-separated numbers of synthetic samples",
+                    required=False, type=str, dest="samples", default="1000,5000,20000")
+parser.add_argument("-a", "--architectures", help="Comma-separated numbers of synthetic architectures",
+                    required=False, type=str, dest="architectures", default="3,9,27")
+parser.add_argument("-c", "--classes", help="Comma-separated numbers of synthetic classes",
+                    required=False, type=str, dest="classes", default="2,4,10")
+parser.add_argument("-e", "--ensemblers", help="Comma-separated ensemblers (default: all)",
+                    required=False, type=str, dest="ensemblers", default=None)
+parser.add_argument("-r", "--repetitions", help="Number of timed runs per measurement (minimum is reported)",
+                    required=False, type=int, dest="repetitions", default=1)
+parser.add_argument("-l", "--limit", help="Training time in seconds after which larger sample sizes are skipped",
+                    required=False, type=float, dest="limit", default=60.0)
+parser.add_argument("--compare", help="Path to a previous benchmark JSON for comparison",
+                    required=False, type=str, dest="compare", default=None)
+args = parser.parse_args()
+
+#-----------------------------------------------------#
+#                    Configurations                   #
+#-----------------------------------------------------#
+# Initialize configuration dictionary
+config = {}
+# Path to result directory
+config["path_results"] = "results"
+# Synthetic data grid
+config["n_samples"] = sorted(int(n) for n in args.samples.split(","))
+config["n_architectures"] = [int(a) for a in args.architectures.split(",")]
+config["n_classes"] = [int(c) for c in args.classes.split(",")]
+# List of ensemble learning techniques
+if args.ensemblers is None : config["ensembler_list"] = ensembler
+else : config["ensembler_list"] = args.ensemblers.split(",")
+# Optional hyperparameters for ensemble learning techniques
+config["ensembler_params"] = {}
+# Measurement configurations
+config["repetitions"] = args.repetitions
+config["limit"] = args.limit
+
+#-----------------------------------------------------#
+#               Synthetic Softmax Data                #
+#-----------------------------------------------------#
+def create_data(n_samples, n_architectures, n_classes, seed=0):
+    rng = np.random.default_rng(seed)
+    # Create ground truth and noisy softmax outputs favoring the true class
+    labels = rng.integers(0, n_classes, n_samples)
+    data = rng.dirichlet(np.ones(n_classes), size=(n_samples, n_architectures))
+    data[np.arange(n_samples), :, labels] += 0.5
+    data /= data.sum(axis=2, keepdims=True)
+    # Return prediction cube and labels
+    return PredictionCube(data), labels
+
+#-----------------------------------------------------#
+#                 Environment Metadata                #
+#-----------------------------------------------------#
+def environment():
+    # Identify current commit for comparison across commits
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], check=True,
+                                capture_output=True, text=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(),
+            "numpy": np.__version__, "sklearn": sklearn.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count()}
+
+#-----------------------------------------------------#
+#                     Measurement                     #
+#-----------------------------------------------------#
+def measure_time(function, repetitions):
+    # Run function and return minimal wall-clock time with last result
+    timings = []
+    for i in range(0, repetitions):
+        timer_start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - timer_start)
+    return min(timings), result
+
+def measure_memory(function):
+    # Peak traced allocation (Python objects & NumPy arrays) in MB
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024**2
+
+def run_benchmark(name, n_classes, train, test, path_model):
+    train_x, train_y = train
+    test_x, _ = test
+    params = config["ensembler_params"].get(name, {})
+    create = lambda: ensembler_dict[name](n_classes=n_classes, **params)
+    # Time training (fresh model for each repetition)
+    def fit():
+        model = create()
+        model.training(train_x, train_y)
+        return model
+    res = {}
+    res["train_s"], model = measure_time(fit, config["repetitions"])
+    # Time prediction, dump and load
+    res["predict_s"], _ = measure_time(lambda: model.prediction(test_x),
+                                       config["repetitions"])
+    res["dump_s"], _ = measure_time(lambda: model.dump(path_model),
+                                    config["repetitions"])
+    res["model_mb"] = os.path.getsize(path_model) / 1024**2
+    def load():
+        loaded = create()
+        loaded.load(path_model)
+        return loaded
+    res["load_s"], loaded = measure_time(load, config["repetitions"])
+    # Verify loaded model and measure prediction of loaded model
+    res["load_predict_s"], _ = measure_time(lambda: loaded.prediction(test_x),
+                                            config["repetitions"])
+    # Measure peak memory of training and prediction in separate traced runs
+    res["train_peak_mb"] = measure_memory(fit)
+    res["predict_peak_mb"] = measure_memory(lambda: model.prediction(test_x))
+    return res
+
+#-----------------------------------------------------#
+#                     Main Runner                     #
+#-----------------------------------------------------#
+if not os.path.exists(config["path_results"]) : os.mkdir(config["path_results"])
+path_model = os.path.join(tempfile.mkdtemp(), "model.pkl")
+
+results = []
+for n_arch in config["n_architectures"]:
+    for n_classes in config["n_classes"]:
+        # Ensemblers which exceeded the time limit for this (A, C)
+        exceeded = set()
+        for n_samples in config["n_samples"]:
+            train = create_data(n_samples, n_arch, n_classes, seed=0)
+            test = create_data(n_samples, n_arch, n_classes, seed=1)
+            for name in config["ensembler_list"]:
+                record = {"ensembler": name, "n_samples": n_samples,
+                          "n_architectures": n_arch, "n_classes": n_classes}
+                # Skip larger sample sizes after hitting the time limit
+                if name in exceeded:
+                    record["status"] = "skipped"
+                    results.append(record)
+                    continue
+                try:
+                    record.update(run_benchmark(name, n_classes, train, test,
+                                                path_model))
+                    record["status"] = "ok"
+                    if record["train_s"] > config["limit"] : exceeded.add(name)
+                except Exception as e:
+                    record["status"] = "failed"
+                    record["error"] = str(e)
+                results.append(record)
+                print("N=%d A=%d C=%d" % (n_samples, n_arch, n_classes), name,
+                      "-", record["status"], {k: round(v, 4) for k, v in \
+                      record.items() if isinstance(v, float)})
+if os.path.exists(path_model) : os.remove(path_model)
+os.rmdir(os.path.dirname(path_model))
+
+# Store benchmark results as JSON and CSV to disk
+path_bench = os.path.join(config["path_results"], "benchmark.ensemblers")
+with open(path_bench + ".json", "w") as file:
+    json.dump({"config": config, "environment": environment(),
+               "results": results}, file, indent=2)
+table = pd.DataFrame(results)
+table.to_csv(path_bench + ".csv", sep=",", header=True, index=False)
+
+# Compare timings against a previous benchmark run (ratio new / old)
+if args.compare is not None:
+    with open(args.compare, "r") as file:
+        previous = pd.DataFrame(json.load(file)["results"])
+    keys = ["ensembler", "n_samples", "n_architectures", "n_classes"]
+    metrics = ["train_s", "predict_s", "dump_s", "load_s", "train_peak_mb",
+               "predict_peak_mb"]
+    merged = table.merge(previous, on=keys, suffixes=("", "_previous"))
+    for metric in metrics:
+        merged[metric + "_ratio"] = merged[metric] / merged[metric + "_previous"]
+    print(merged[keys + [m + "_ratio" for m in metrics]].to_string(index=False))
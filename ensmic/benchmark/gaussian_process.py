@@ -0,0 +1,121 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import argparse
+import os
+import time
+import json
+import numpy as np
+from sklearn.metrics import f1_score, log_loss
+# Internal libraries/scripts
+from ensmic.ensemble import PredictionCube
+from ensmic.ensemble.gaussian_process import ELM_GaussianProcess
+
+#-----------------------------------------------------#
+#                      Argparser                      #
+#-----------------------------------------------------#
+parser = argparse.ArgumentParser(description="Benchmark: Exact vs approximate Gaussian Process ensembler")
+parser.add_argument("-s", "--samples", help="Comma-separated numbers of val-ensemble samples",
+                    required=False, type=str, dest="samples", default="500,1000,2000,4000")
+parser.add_argument("-m", "--max_exact", help="Maximum number of samples for the exact Gaussian Process",
+                    required=False, type=int, dest="max_exact", default=4000)
+parser.add_argument("-n", "--n_components", help="Number of components for kernel approximation",
+                    required=False, type=int, dest="n_components", default=300)
+parser.add_argument("-a", "--architectures", help="Number of synthetic architectures",
+                    required=False, type=int, dest="architectures", default=9)
+parser.add_argument("-c", "--classes", help="Number of synthetic classes",
+                    required=False, type=int, dest="classes", default=4)
+args = parser.parse_args()
+
+#-----------------------------------------------------#
+#                    Configurations                   #
+#-----------------------------------------------------#
+# Initialize configuration dictionary
+config = {}
+# Path to result directory
+config["path_results"] = "results"
+# Synthetic data configurations
+config["n_samples"] = [int(n) for n in args.samples.split(",")]
+config["n_test"] = 2000
+config["n_architectures"] = args.architectures
+config["n_classes"] = args.classes
+# Approximation configurations
+config["max_exact"] = args.max_exact
+config["n_components"] = args.n_components
+config["modes"] = ["exact", "nystroem", "rff"]
+
+#-----------------------------------------------------#
+#               Synthetic Softmax Data                #
+#-----------------------------------------------------#
+def create_data(n_samples, n_architectures, n_classes, seed=0):
+    rng = np.random.default_rng(seed)
+    # Create ground truth and noisy softmax outputs favoring the true class
+    labels = rng.integers(0, n_classes, n_samples)
+    data = rng.dirichlet(np.ones(n_classes), size=(n_samples, n_architectures))
+    data[np.arange(n_samples), :, labels] += 0.5
+    data /= data.sum(axis=2, keepdims=True)
+    # Return prediction cube and labels
+    return PredictionCube(data), labels
+
+#-----------------------------------------------------#
+#                     Main Runner                     #
+#-----------------------------------------------------#
+test_x, test_y = create_data(config["n_test"], config["n_architectures"],
+                             config["n_classes"], seed=1)
+
+# Measure fit/predict time and quality for each sample size and mode
+results = {}
+for n in config["n_samples"]:
+    train_x, train_y = create_data(n, config["n_architectures"],
+                                   config["n_classes"])
+    results[str(n)] = {}
+    for mode in config["modes"]:
+        # Skip exact Gaussian Process for intractable sample sizes
+        if mode == "exact" and n > config["max_exact"] : continue
+        model = ELM_GaussianProcess(n_classes=config["n_classes"], mode=mode,
+                                    n_components=config["n_components"])
+        # Measure training and inference time
+        timer_start = time.perf_counter()
+        model.training(train_x, train_y)
+        timer_fit = time.perf_counter() - timer_start
+        timer_start = time.perf_counter()
+        pred = model.prediction(test_x)
+        timer_pred = time.perf_counter() - timer_start
+        # Evaluate predictive quality on test set
+        results[str(n)][mode] = {
+            "fit_s": timer_fit,
+            "predict_s": timer_pred,
+            "f1": f1_score(test_y, np.argmax(pred, axis=-1), average="macro"),
+            "log_loss": log_loss(test_y, pred,
+                                 labels=np.arange(config["n_classes"])),
+        }
+        print(n, mode, "-", "fit: %.3f s" % timer_fit,
+              "|", "predict: %.3f s" % timer_pred,
+              "|", "F1: %.4f" % results[str(n)][mode]["f1"],
+              "|", "LogLoss: %.4f" % results[str(n)][mode]["log_loss"])
+
+# Store benchmark results as JSON to disk
+if not os.path.exists(config["path_results"]) : os.mkdir(config["path_results"])
+path_bench = os.path.join(config["path_results"], "benchmark.gaussian_process.json")
+with open(path_bench, "w") as file:
+    json.dump({"config": config, "results": results}, file, indent=2)
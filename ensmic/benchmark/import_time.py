@@ -0,0 +1,85 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import argparse
+import os
+import sys
+import json
+import subprocess
+import numpy as np
+
+#-----------------------------------------------------#
+#                      Argparser                      #
+#-----------------------------------------------------#
+parser = argparse.ArgumentParser(description="Benchmark: Import time of the ensemble package")
+parser.add_argument("-r", "--repetitions", help="Number of fresh interpreter runs per statement",
+                    required=False, type=int, dest="repetitions", default=10)
+args = parser.parse_args()
+
+#-----------------------------------------------------#
+#                    Configurations                   #
+#-----------------------------------------------------#
+# Initialize configuration dictionary
+config = {}
+# Path to result directory
+config["path_results"] = "results"
+# Number of fresh interpreter runs
+config["repetitions"] = args.repetitions
+# Statements to measure (each in a fresh interpreter)
+config["statements"] = {
+    "import_ensemble": "import ensmic.ensemble",
+    "import_ensembler_list": "from ensmic.ensemble import ensembler",
+    "resolve_prediction_cube": "from ensmic.ensemble import PredictionCube",
+    "resolve_all_ensemblers": "from ensmic.ensemble import ensembler_dict, ensembler\n" + \
+                              "for e in ensembler : ensembler_dict[e]",
+}
+
+#-----------------------------------------------------#
+#                Import Time Measurement              #
+#-----------------------------------------------------#
+def measure(statement):
+    # Run statement in a fresh interpreter and measure it in milliseconds
+    code = "import time\n" + \
+           "timer_start = time.perf_counter()\n" + \
+           statement + "\n" + \
+           "print((time.perf_counter() - timer_start) * 1000)"
+    output = subprocess.run([sys.executable, "-c", code], check=True,
+                            capture_output=True, text=True)
+    return float(output.stdout.strip().split("\n")[-1])
+
+#-----------------------------------------------------#
+#                     Main Runner                     #
+#-----------------------------------------------------#
+results = {}
+for key, statement in config["statements"].items():
+    timings = [measure(statement) for i in range(0, config["repetitions"])]
+    results[key] = {"median_ms": float(np.median(timings)),
+                    "min_ms": float(np.min(timings))}
+    print(key, "-", "median: %.1f ms" % results[key]["median_ms"],
+          "|", "min: %.1f ms" % results[key]["min_ms"])
+
+# Store benchmark results as JSON to disk
+if not os.path.exists(config["path_results"]) : os.mkdir(config["path_results"])
+path_bench = os.path.join(config["path_results"], "benchmark.import_time.json")
+with open(path_bench, "w") as file:
+    json.dump({"config": config, "results": results}, file, indent=2)
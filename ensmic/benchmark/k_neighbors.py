@@ -0,0 +1,132 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import argparse
+import os
+import time
+import json
+import numpy as np
+# Internal libraries/scripts
+from ensmic.ensemble import PredictionCube
+from ensmic.ensemble.k_neighbors import ELM_kNearestNeighbors
+
+#-----------------------------------------------------#
+#                      Argparser                      #
+#-----------------------------------------------------#
+parser = argparse.ArgumentParser(description="Benchmark: Exact vs approximate kNN index of the kNN ensembler")
+parser.add_argument("-s", "--samples", help="Number of synthetic val-ensemble samples",
+                    required=False, type=int, dest="samples", default=20000)
+parser.add_argument("-q", "--queries", help="Number of synthetic test samples",
+                    required=False, type=int, dest="queries", default=5000)
+parser.add_argument("-a", "--architectures", help="Number of synthetic architectures",
+                    required=False, type=int, dest="architectures", default=9)
+parser.add_argument("-c", "--classes", help="Number of synthetic classes",
+                    required=False, type=int, dest="classes", default=4)
+parser.add_argument("-j", "--jobs", help="Number of query threads",
+                    required=False, type=int, dest="jobs", default=os.cpu_count())
+args = parser.parse_args()
+
+#-----------------------------------------------------#
+#                    Configurations                   #
+#-----------------------------------------------------#
+# Initialize configuration dictionary
+config = {}
+# Path to result directory
+config["path_results"] = "results"
+# Synthetic data configurations
+config["n_samples"] = args.samples
+config["n_queries"] = args.queries
+config["n_architectures"] = args.architectures
+config["n_classes"] = args.classes
+# Index configurations
+config["n_jobs"] = args.jobs
+config["n_probe"] = [1, 4, 8, 16, 32]
+
+#-----------------------------------------------------#
+#               Synthetic Softmax Data                #
+#-----------------------------------------------------#
+def create_data(n_samples, n_architectures, n_classes, seed=0):
+    rng = np.random.default_rng(seed)
+    # Create ground truth and noisy softmax outputs favoring the true class
+    labels = rng.integers(0, n_classes, n_samples)
+    data = rng.dirichlet(np.ones(n_classes), size=(n_samples, n_architectures))
+    data[np.arange(n_samples), :, labels] += 0.5
+    data /= data.sum(axis=2, keepdims=True)
+    # Return prediction cube and labels
+    return PredictionCube(data), labels
+
+#-----------------------------------------------------#
+#                  Measure Index Setup                #
+#-----------------------------------------------------#
+def measure(mode, n_probe, n_jobs, path_model):
+    # Build and store index
+    model = ELM_kNearestNeighbors(n_classes=config["n_classes"], mode=mode,
+                                  n_probe=n_probe, n_jobs=n_jobs)
+    timer_start = time.perf_counter()
+    model.training(train_x, train_y)
+    timer_fit = time.perf_counter() - timer_start
+    model.dump(path_model)
+    # Measure loading time
+    timer_start = time.perf_counter()
+    model = ELM_kNearestNeighbors(n_classes=config["n_classes"], n_jobs=n_jobs)
+    model.load(path_model)
+    timer_load = time.perf_counter() - timer_start
+    # Measure query throughput
+    timer_start = time.perf_counter()
+    pred = model.prediction(test_x)
+    timer_pred = time.perf_counter() - timer_start
+    # Return measurements and predictions
+    return {"fit_s": timer_fit, "load_s": timer_load,
+            "queries_per_s": len(test_x) / timer_pred}, model, pred
+
+#-----------------------------------------------------#
+#                     Main Runner                     #
+#-----------------------------------------------------#
+train_x, train_y = create_data(config["n_samples"], config["n_architectures"],
+                               config["n_classes"])
+test_x, test_y = create_data(config["n_queries"], config["n_architectures"],
+                             config["n_classes"], seed=1)
+if not os.path.exists(config["path_results"]) : os.mkdir(config["path_results"])
+path_model = os.path.join(config["path_results"], "benchmark.k_neighbors.index.npz")
+
+# Measure exact search for single and multiple threads
+results = {"exact": {}, "ivf": {}}
+for n_jobs in sorted(set([1, config["n_jobs"]])):
+    res, model, pred_exact = measure("exact", None, n_jobs, path_model)
+    results["exact"]["jobs_" + str(n_jobs)] = res
+    print("exact", "jobs:", n_jobs, "-", res)
+
+# Measure approximate search and its recall against the exact search
+for n_probe in config["n_probe"]:
+    res, model, pred = measure("ivf", n_probe, config["n_jobs"], path_model)
+    res["recall"] = model.model.recall(test_x.flatten(), model.n_neighbors)
+    res["agreement"] = float(np.mean(np.argmax(pred, axis=-1) == \
+                                     np.argmax(pred_exact, axis=-1)))
+    results["ivf"]["probe_" + str(n_probe)] = res
+    print("ivf", "n_probe:", n_probe, "-", res)
+os.remove(path_model)
+
+# Store benchmark results as JSON to disk
+path_bench = os.path.join(config["path_results"], "benchmark.k_neighbors.json")
+with open(path_bench, "w") as file:
+    json.dump({"config": config, "results": results}, file, indent=2)
@@ -0,0 +1,113 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import argparse
+import os
+import time
+import json
+import numpy as np
+# Internal libraries/scripts
+from ensmic.ensemble import ensembler_dict, ensembler, PredictionCube
+
+#-----------------------------------------------------#
+#                      Argparser                      #
+#-----------------------------------------------------#
+parser = argparse.ArgumentParser(description="Benchmark: Single-sample prediction latency of all ensemblers")
+parser.add_argument("-s", "--samples", help="Number of synthetic val-ensemble samples for training",
+                    required=False, type=int, dest="samples", default=1000)
+parser.add_argument("-a", "--architectures", help="Number of synthetic architectures",
+                    required=False, type=int, dest="architectures", default=9)
+parser.add_argument("-c", "--classes", help="Number of synthetic classes",
+                    required=False, type=int, dest="classes", default=4)
+parser.add_argument("-r", "--repetitions", help="Number of timed calls per ensembler",
+                    required=False, type=int, dest="repetitions", default=1000)
+args = parser.parse_args()
+
+#-----------------------------------------------------#
+#                    Configurations                   #
+#-----------------------------------------------------#
+# Initialize configuration dictionary
+config = {}
+# Path to result directory
+config["path_results"] = "results"
+# Synthetic data configurations
+config["n_samples"] = args.samples
+config["n_architectures"] = args.architectures
+config["n_classes"] = args.classes
+config["repetitions"] = args.repetitions
+# List of ensemble learning techniques
+config["ensembler_list"] = ensembler
+
+#-----------------------------------------------------#
+#               Synthetic Softmax Data                #
+#-----------------------------------------------------#
+def create_data(n_samples, n_architectures, n_classes, seed=0):
+    rng = np.random.default_rng(seed)
+    # Create ground truth and noisy softmax outputs favoring the true class
+    labels = rng.integers(0, n_classes, n_samples)
+    data = rng.dirichlet(np.ones(n_classes), size=(n_samples, n_architectures))
+    data[np.arange(n_samples), :, labels] += 0.5
+    data /= data.sum(axis=2, keepdims=True)
+    # Return prediction cube and labels
+    return PredictionCube(data), labels
+
+#-----------------------------------------------------#
+#                  Latency Measurement                #
+#-----------------------------------------------------#
+def measure(function, sample, repetitions):
+    # Warm up (lazy initialization, caches)
+    function(sample)
+    # Measure average latency per call in microseconds
+    timer_start = time.perf_counter()
+    for i in range(0, repetitions) : function(sample)
+    timer_end = time.perf_counter()
+    return (timer_end - timer_start) / repetitions * 1e6
+
+#-----------------------------------------------------#
+#                     Main Runner                     #
+#-----------------------------------------------------#
+cube, labels = create_data(config["n_samples"], config["n_architectures"],
+                           config["n_classes"])
+# Obtain a single sample as raw array and as legacy flat DataFrame
+sample = cube.data[0]
+sample_df = cube.subset(slice(0, 1)).to_dataframe()
+
+# Measure latency for all ensemble learning techniques
+results = {}
+for ensembler in config["ensembler_list"]:
+    model = ensembler_dict[ensembler](n_classes=config["n_classes"])
+    model.training(cube, labels)
+    results[ensembler] = {
+        "predict_one_us": measure(model.predict_one, sample,
+                                  config["repetitions"]),
+        "prediction_dataframe_us": measure(model.prediction, sample_df,
+                                           config["repetitions"]),
+    }
+    print(ensembler, "-", "predict_one: %.1f us" % results[ensembler]["predict_one_us"],
+          "|", "prediction(DataFrame): %.1f us" % results[ensembler]["prediction_dataframe_us"])
+
+# Store benchmark results as JSON to disk
+if not os.path.exists(config["path_results"]) : os.mkdir(config["path_results"])
+path_bench = os.path.join(config["path_results"], "benchmark.predict_latency.json")
+with open(path_bench, "w") as file:
+    json.dump({"config": config, "results": results}, file, indent=2)
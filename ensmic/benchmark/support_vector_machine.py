@@ -0,0 +1,115 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import argparse
+import os
+import time
+import json
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score, log_loss
+# Internal libraries/scripts
+from ensmic.ensemble import PredictionCube
+from ensmic.ensemble.support_vector_machine import ELM_SupportVectorMachine
+
+#-----------------------------------------------------#
+#                      Argparser                      #
+#-----------------------------------------------------#
+parser = argparse.ArgumentParser(description="Benchmark: Exact vs approximate Support Vector Machine ensembler")
+parser.add_argument("-d", "--datasets", help="Comma-separated datasets of the stacking phase: ['covid', 'isic', 'chmnist', 'drd']",
+                    required=False, type=str, dest="datasets", default="covid,isic,chmnist,drd")
+parser.add_argument("-n", "--n_components", help="Number of components for kernel approximation",
+                    required=False, type=int, dest="n_components", default=300)
+args = parser.parse_args()
+
+#-----------------------------------------------------#
+#                    Configurations                   #
+#-----------------------------------------------------#
+# Initialize configuration dictionary
+config = {}
+# Path to result directory
+config["path_results"] = "results"
+# Datasets of the stacking phase
+config["datasets"] = args.datasets.split(",")
+# Approximation configurations
+config["n_components"] = args.n_components
+config["modes"] = ["exact", "nystroem", "rff"]
+
+#-----------------------------------------------------#
+#                 Stacking Phase Data                 #
+#-----------------------------------------------------#
+def load_data(path_phase, subset):
+    # Load prediction cube of the baseline phase
+    cube = PredictionCube.load(os.path.join(path_phase, "phase_baseline.inference." + \
+                                            subset + "." + "cube" + ".npz"))
+    # Load ground truth aligned to the sample order of the cube
+    gt = pd.read_csv(os.path.join(path_phase, "phase_baseline.inference." + \
+                                  subset + "." + "set_y" + ".csv"),
+                     header=0, index_col="index")
+    labels = gt.loc[list(cube.samples), "Ground_Truth"].to_numpy()
+    # Return prediction cube and labels
+    return cube, labels
+
+#-----------------------------------------------------#
+#                     Main Runner                     #
+#-----------------------------------------------------#
+results = {}
+for ds in config["datasets"]:
+    # Identify phase results directory
+    path_phase = os.path.join(config["path_results"], "phase_stacking" + "." + ds)
+    if not os.path.exists(path_phase):
+        print("Skipping dataset (stacking phase not prepared):", ds)
+        continue
+    # Load val-ensemble for training and test set for evaluation
+    train_x, train_y = load_data(path_phase, "val-ensemble")
+    test_x, test_y = load_data(path_phase, "test")
+    n_classes = train_x.n_classes
+    # Measure fit/predict time and quality for each mode
+    results[ds] = {}
+    for mode in config["modes"]:
+        model = ELM_SupportVectorMachine(n_classes=n_classes, mode=mode,
+                                         n_components=config["n_components"])
+        # Measure training and inference time
+        timer_start = time.perf_counter()
+        model.training(train_x, train_y)
+        timer_fit = time.perf_counter() - timer_start
+        timer_start = time.perf_counter()
+        pred = model.prediction(test_x)
+        timer_pred = time.perf_counter() - timer_start
+        # Evaluate predictive quality on test set
+        results[ds][mode] = {
+            "fit_s": timer_fit,
+            "predict_s": timer_pred,
+            "f1": f1_score(test_y, np.argmax(pred, axis=-1), average="macro"),
+            "log_loss": log_loss(test_y, pred, labels=np.arange(n_classes)),
+        }
+        print(ds, mode, "-", "fit: %.3f s" % timer_fit,
+              "|", "predict: %.3f s" % timer_pred,
+              "|", "F1: %.4f" % results[ds][mode]["f1"],
+              "|", "LogLoss: %.4f" % results[ds][mode]["log_loss"])
+
+# Store benchmark results as JSON to disk
+if not os.path.exists(config["path_results"]) : os.mkdir(config["path_results"])
+path_bench = os.path.join(config["path_results"], "benchmark.support_vector_machine.json")
+with open(path_bench, "w") as file:
+    json.dump({"config": config, "results": results}, file, indent=2)
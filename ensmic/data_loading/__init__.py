@@ -18,5 +18,8 @@
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
 #==============================================================================#
 from ensmic.data_loading.io_inference import IO_Inference
+from ensmic.data_loading.inference_index import Inference_Index
 from ensmic.data_loading.architectures import architecture_list, architecture_params
-from ensmic.data_loading.sampling import sampling_to_disk, load_sampling
\ No newline at end of file
+from ensmic.data_loading.sampling import sampling_to_disk, load_sampling, \
+                                       load_ground_truth, kfold_to_disk, \
+                                       load_kfold
\ No newline at end of file
@@ -0,0 +1,159 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import os
+import io
+import json
+import zipfile
+import numpy as np
+# Internal libraries/scripts
+from ensmic.data_loading.io_inference import IO_Inference, inference_backends, \
+                                             build_index, lookup_index
+from ensmic.utils.memmap import memmap_archive
+
+#-----------------------------------------------------#
+#              Directory Inference Index              #
+#-----------------------------------------------------#
+""" Consolidated index over the inference files of all subdirectories.
+
+The predictions of every source (e.g. each architecture directory containing an
+"inference.test.npz") are stored as one float32 cube (samples, sources,
+classes) together with a hash index of the sample identifiers. Thus, the
+predictions of all sources for a sample are obtained with a single O(1) lookup
+in one memory-mapped file instead of opening every inference file. Samples
+missing in a source are NaN.
+
+The modification times of the source files are stored, thus a stale index can
+be detected and rebuilt.
+
+Methods:
+    __init__                Object creation function
+    build:                  Build index from sources {name: path}
+    build_directory:        Build index from all subdirectories of a directory
+    is_stale:               Check if a source changed after building
+    query:                  Predictions of all sources for a sample
+    legend:                 Class legend
+"""
+class Inference_Index():
+    #---------------------------------------------#
+    #                Initialization               #
+    #---------------------------------------------#
+    def __init__(self, path):
+        # Store path to index file
+        self.path_index = path
+        # Initialize cache for memory-mapped lookups
+        self.cache = {}
+
+    #---------------------------------------------#
+    #                 Index Building              #
+    #---------------------------------------------#
+    def build(self, sources):
+        # Load predictions of all sources
+        arrays = {name: IO_Inference(None, path).load_arrays() \
+                  for name, path in sources.items()}
+        names = list(arrays.keys())
+        # Obtain union of samples (in order of appearance)
+        samples = list(dict.fromkeys(s for name in names for s in arrays[name][0]))
+        rows = {sample: i for i, sample in enumerate(samples)}
+        legend = arrays[names[0]][2] if len(names) > 0 else []
+        # Scatter predictions of each source into the cube
+        cube = np.full((len(samples), len(names), len(legend)), np.nan,
+                       dtype=np.float32)
+        for j, name in enumerate(names):
+            source_samples, preds, _ = arrays[name]
+            cube[[rows[s] for s in source_samples], j, :] = preds
+        # Identify modification times of sources for staleness detection
+        meta = {"sources": names, "legend": legend,
+                "paths": {name: os.path.abspath(sources[name]) for name in names},
+                "mtimes": {name: os.path.getmtime(sources[name]) for name in names}}
+        # Write index archive (atomic replacement)
+        path_tmp = self.path_index + ".tmp"
+        with zipfile.ZipFile(path_tmp, "w") as archive:
+            archive.writestr("meta.json", json.dumps(meta, indent=2))
+            with io.BytesIO() as file:
+                encoded = np.asarray([s.encode("utf-8") for s in samples],
+                                     dtype=np.bytes_)
+                np.lib.format.write_array(file, encoded, allow_pickle=False)
+                archive.writestr("samples.npy", file.getvalue(),
+                                 compress_type=zipfile.ZIP_DEFLATED)
+            members = {"preds": cube}
+            members.update({"index_" + k: v for k, v in build_index(samples).items()})
+            for key, array in members.items():
+                with archive.open(key + ".npy", "w", force_zip64=True) as file:
+                    np.lib.format.write_array(file, array, allow_pickle=False)
+        os.replace(path_tmp, self.path_index)
+        self.cache = {}
+
+    def build_directory(self, path_dir, subset):
+        # Collect inference file of subset in each subdirectory
+        sources = {}
+        for name in sorted(os.listdir(path_dir)):
+            for backend in inference_backends.values():
+                path_inf = os.path.join(path_dir, name,
+                                        "inference." + subset + backend.extension)
+                if os.path.isfile(path_inf) and name not in sources:
+                    sources[name] = path_inf
+        # Build index from all identified sources
+        self.build(sources)
+
+    #---------------------------------------------#
+    #              Staleness Detection            #
+    #---------------------------------------------#
+    def is_stale(self):
+        # Index is stale if missing or a source was modified/removed
+        if not os.path.exists(self.path_index) : return True
+        meta = self.load_meta()
+        for name, path in meta["paths"].items():
+            if not os.path.exists(path) : return True
+            if os.path.getmtime(path) != meta["mtimes"][name] : return True
+        return False
+
+    #---------------------------------------------#
+    #                   Lookups                   #
+    #---------------------------------------------#
+    def load_meta(self):
+        with zipfile.ZipFile(self.path_index, "r") as archive:
+            return json.loads(archive.read("meta.json"))
+
+    def open(self):
+        # Open memory maps of index and prediction cube only once
+        if len(self.cache) == 0:
+            self.cache["meta"] = self.load_meta()
+            self.cache["preds"] = memmap_archive(self.path_index, "preds.npy")
+            self.cache["index"] = {key: memmap_archive(self.path_index,
+                                                       "index_" + key + ".npy") \
+                                   for key in ["offsets", "fingerprints", "rows"]}
+        return self.cache
+
+    def query(self, sample):
+        # Return predictions of all sources containing the sample
+        cache = self.open()
+        row = lookup_index(cache["index"], sample)
+        preds = cache["preds"][row].astype(np.float64)
+        return {name: preds[j].tolist() \
+                for j, name in enumerate(cache["meta"]["sources"]) \
+                if not np.isnan(preds[j]).any()}
+
+    def legend(self):
+        # Return class legend
+        return self.open()["meta"]["legend"]
@@ -21,18 +21,39 @@
 #-----------------------------------------------------#
 # External libraries
 import os
+import io
 import json
+import hashlib
+import shutil
+import tempfile
+import zipfile
 import numpy as np
+# Internal libraries/scripts
+from ensmic.utils.memmap import memmap_archive
 
 #-----------------------------------------------------#
 #               Inference IO Interface                #
 #-----------------------------------------------------#
 """ Class to handle all kinds of input/output functionality for inference.
 
+The storage format is selected via the file extension of the path (".json" or
+".npz", see inference_backends). If the given file does not exist on loading,
+a file with the same name but the extension of another backend is loaded
+instead. Thus, scripts requesting "inference.test.json" transparently read
+"inference.test.npz" and existing JSON results remain readable.
+
+NPZ files contain a persisted sample-id -> row hash index next to the
+memory-mapped prediction matrix. Thus, load_inference(index=sample) and
+load_inference(index="legend") only touch a few pages of the file instead of
+parsing it completely. The opened memory maps are cached in the interface.
+
 Methods:
     __init__                Object creation function
     load_inference:         Load already stored predictions
+    load_arrays:            Load stored predictions as (samples, preds, legend)
     store_inference:        Store a prediction to disk
+    store_inference_stream: Store predictions chunk by chunk to disk
+    open_writer:            Open append-mode writer for resumable inference
 """
 class IO_Inference():
     #---------------------------------------------#
@@ -43,28 +64,371 @@ class IO_Inference():
         self.path_inf = path
         # Store class dictionary
         self.class_list = class_names
+        # Initialize cache for memory-mapped lookups
+        self.cache = {}
 
     #---------------------------------------------#
     #              Inference Loading              #
     #---------------------------------------------#
     def load_inference(self, index=None, with_legend=False):
-        # Load inference JSON
-        with open(self.path_inf, "r") as file:
-            inference = json.load(file)
+        path = resolve_path(self.path_inf)
+        # Look up legend or a single sample via storage backend
+        if index is not None:
+            return get_backend(path).load_entry(path, index, self.cache)
+        # Load inference via storage backend
+        inference = get_backend(path).load(path)
         # Remove legend
-        if index is None and not with_legend: del inference["legend"]
-        # Return either complete dictionary or inference for a single sample
-        if index is not None : return inference[index]
-        else : return inference
+        if not with_legend: del inference["legend"]
+        # Return complete dictionary
+        return inference
+
+    def load_arrays(self):
+        # Load sample list, prediction matrix and legend via storage backend
+        path = resolve_path(self.path_inf)
+        return get_backend(path).load_arrays(path)
 
     #---------------------------------------------#
     #              Inference Storage              #
     #---------------------------------------------#
     def store_inference(self, samples, preds):
-        # Create a new inference JSON object
-        data = {"legend": self.class_list}
-        # Append predictions to inference JSON
-        data.update(dict(zip(samples, preds.tolist())))
-        # Store inference JSON to disk
-        with open(self.path_inf, "w") as file:
-            json.dump(data, file, indent=2)
+        # Store all predictions as a single chunk
+        self.store_inference_stream([(samples, np.asarray(preds))])
+
+    #---------------------------------------------#
+    #         Inference Storage (Streaming)       #
+    #---------------------------------------------#
+    def store_inference_stream(self, chunks):
+        """ Store an iterable of (samples, preds) chunks to disk.
+
+        The resulting file is identical to store_inference, but only a single
+        chunk is held in memory at any time. The file is written to a temporary
+        file first and renamed afterwards, thus readers never observe a partial
+        file.
+        """
+        backend = get_backend(self.path_inf)
+        path_tmp = self.path_inf + ".tmp"
+        backend.store_stream(path_tmp, self.class_list, chunks)
+        os.replace(path_tmp, self.path_inf)
+
+    #---------------------------------------------#
+    #        Inference Storage (Append-Mode)      #
+    #---------------------------------------------#
+    def open_writer(self):
+        # Open (or recover) append-mode writer for the inference file
+        return Inference_Writer(self.path_inf, self.class_list)
+
+#-----------------------------------------------------#
+#          Append-Mode Crash-Safe Inference Writer    #
+#-----------------------------------------------------#
+""" Writer which appends predictions batch by batch with atomic commits.
+
+Each appended batch is written into journal files next to the inference file
+and committed by atomically replacing a small commit record:
+    <path>.journal.preds    Raw predictions (one row per sample) in the precision
+                            of the target backend (JSON: float64, NPZ: float32).
+    <path>.journal.samples  One JSON-encoded sample identifier per line.
+    <path>.journal.json     Number of committed samples and journal sizes.
+
+On opening, the journal is truncated to the last commit, thus a crash during
+an append only loses the uncommitted batch. done() exposes the committed
+samples for resuming. finalize() streams the journal chunk by chunk into the
+inference file (in the backend of its extension) and removes the journal.
+
+Methods:
+    __init__                Open or recover the journal
+    done:                   Set of already committed samples
+    append:                 Append and commit predictions of a batch
+    finalize:               Write inference file and remove journal
+"""
+class Inference_Writer():
+    #---------------------------------------------#
+    #                Initialization               #
+    #---------------------------------------------#
+    def __init__(self, path, class_list, chunk_size=10000):
+        self.path_inf = path
+        self.class_list = class_list
+        self.chunk_size = chunk_size
+        self.path_preds = path + ".journal.preds"
+        self.path_samples = path + ".journal.samples"
+        self.path_commit = path + ".journal.json"
+        # Recover journal of a previous run or start a new one
+        if os.path.exists(self.path_commit):
+            with open(self.path_commit, "r") as file:
+                self.commit = json.load(file)
+        else:
+            self.commit = {"n_samples": 0, "n_classes": None,
+                           "samples_bytes": 0,
+                           "dtype": np.dtype(get_backend(path).dtype).str}
+        self.dtype = np.dtype(self.commit.get("dtype", "<f4"))
+        # Discard uncommitted data of an interrupted append
+        n_classes = self.commit["n_classes"] or 0
+        for path_journal, size in [(self.path_preds, self.commit["n_samples"] * \
+                                    n_classes * self.dtype.itemsize),
+                                   (self.path_samples, self.commit["samples_bytes"])]:
+            with open(path_journal, "ab") as file:
+                file.truncate(size)
+
+    #---------------------------------------------#
+    #              Committed Samples              #
+    #---------------------------------------------#
+    def done(self):
+        # Return set of samples which have been committed already
+        with open(self.path_samples, "r") as file:
+            return set(json.loads(line) for line in file)
+
+    #---------------------------------------------#
+    #               Append & Commit               #
+    #---------------------------------------------#
+    def append(self, samples, preds):
+        preds = np.ascontiguousarray(preds, dtype=self.dtype)
+        if len(samples) == 0 : return
+        # Verify consistent number of classes
+        if self.commit["n_classes"] is None:
+            self.commit["n_classes"] = int(preds.shape[-1])
+        if preds.shape != (len(samples), self.commit["n_classes"]):
+            raise ValueError("Predictions do not match shape (samples, classes): " + \
+                             str(preds.shape))
+        # Append batch to journal and flush it to disk
+        encoded = "".join(json.dumps(sample) + "\n" for sample in samples)
+        encoded = encoded.encode("utf-8")
+        for path_journal, data in [(self.path_preds, preds.tobytes()),
+                                   (self.path_samples, encoded)]:
+            with open(path_journal, "ab") as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+        # Commit batch by atomically replacing the commit record
+        self.commit["n_samples"] += len(samples)
+        self.commit["samples_bytes"] += len(encoded)
+        with open(self.path_commit + ".tmp", "w") as file:
+            json.dump(self.commit, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(self.path_commit + ".tmp", self.path_commit)
+
+    #---------------------------------------------#
+    #                  Finalize                   #
+    #---------------------------------------------#
+    def finalize(self):
+        # Stream committed journal chunk by chunk into the inference file
+        n_classes = self.commit["n_classes"]
+        if n_classes is None:
+            n_classes = len(self.class_list) if self.class_list is not None else 0
+        def chunks():
+            with open(self.path_samples, "r") as file_samples, \
+                 open(self.path_preds, "rb") as file_preds:
+                while True:
+                    samples = [json.loads(line) for _, line in \
+                               zip(range(self.chunk_size), file_samples)]
+                    if len(samples) == 0 : break
+                    preds = np.frombuffer(file_preds.read(len(samples) * \
+                                                          n_classes * \
+                                                          self.dtype.itemsize),
+                                          dtype=self.dtype)
+                    yield samples, preds.reshape(len(samples), n_classes)
+        IO_Inference(self.class_list, self.path_inf).store_inference_stream(chunks())
+        # Remove journal (commit record last)
+        for path_journal in [self.path_preds, self.path_samples, self.path_commit]:
+            if os.path.exists(path_journal) : os.remove(path_journal)
+
+#-----------------------------------------------------#
+#                  JSON Storage Backend               #
+#-----------------------------------------------------#
+class JSON_Backend():
+    """ Human-readable {"legend": [...], sample: [probs]} JSON file. """
+    extension = ".json"
+    dtype = np.float64
+
+    @staticmethod
+    def load(path):
+        # Load inference JSON
+        with open(path, "r") as file:
+            return json.load(file)
+
+    @staticmethod
+    def load_entry(path, index, cache):
+        # JSON offers no random access, thus parse the complete file once
+        if "inference" not in cache or cache["path"] != path:
+            cache.clear()
+            cache.update({"path": path, "inference": JSON_Backend.load(path)})
+        return cache["inference"][index]
+
+    @staticmethod
+    def load_arrays(path):
+        inference = JSON_Backend.load(path)
+        legend = inference.pop("legend")
+        samples = list(inference.keys())
+        preds = np.asarray(list(inference.values()), dtype=np.float64)
+        return samples, preds, legend
+
+    @staticmethod
+    def store_stream(path, class_list, chunks):
+        # Encode a JSON value with the indentation of a top-level entry
+        def encode(value):
+            return json.dumps(value, indent=2).replace("\n", "\n  ")
+        # Write inference JSON entry by entry
+        with open(path, "w") as file:
+            file.write("{\n  \"legend\": " + encode(class_list))
+            for samples, preds in chunks:
+                for sample, pred in zip(samples, preds.tolist()):
+                    file.write(",\n  " + json.dumps(sample) + ": " + encode(pred))
+            file.write("\n}")
+
+#-----------------------------------------------------#
+#               Columnar Storage Backend              #
+#-----------------------------------------------------#
+class NPZ_Backend():
+    """ Binary columnar NumPy archive with the members:
+
+        preds.npy           Predictions as float32 matrix (samples, classes),
+                            uncompressed for a single contiguous read.
+        samples.npy         Sample identifiers (UTF-8 bytes, compressed).
+        legend.json         Class legend.
+        index_*.npy         Hash index of the sample identifiers (uncompressed,
+                            see build_index).
+    """
+    extension = ".npz"
+    dtype = np.float32
+
+    @staticmethod
+    def load(path):
+        # Convert columnar arrays into the dictionary of the JSON format
+        samples, preds, legend = NPZ_Backend.load_arrays(path)
+        inference = {"legend": legend}
+        inference.update(zip(samples, preds.tolist()))
+        return inference
+
+    @staticmethod
+    def load_arrays(path):
+        with zipfile.ZipFile(path, "r") as archive:
+            legend = json.loads(archive.read("legend.json"))
+            with archive.open("samples.npy", "r") as file:
+                samples = np.lib.format.read_array(file, allow_pickle=False)
+            with archive.open("preds.npy", "r") as file:
+                preds = np.lib.format.read_array(file, allow_pickle=False)
+        # Return sample list, prediction matrix and legend
+        samples = [sample.decode("utf-8") for sample in samples.tolist()]
+        return samples, preds, legend
+
+    @staticmethod
+    def load_entry(path, index, cache):
+        # Open memory maps of hash index and predictions only once
+        if cache.get("path") != path:
+            cache.clear()
+            cache["path"] = path
+            with zipfile.ZipFile(path, "r") as archive:
+                cache["legend"] = json.loads(archive.read("legend.json"))
+                members = archive.namelist()
+            cache["preds"] = memmap_archive(path, "preds.npy")
+            # Build index in memory for archives without a persisted index
+            if "index_offsets.npy" in members:
+                cache["index"] = {key: memmap_archive(path, "index_" + key + ".npy") \
+                                  for key in ["offsets", "fingerprints", "rows"]}
+            else:
+                cache["index"] = build_index(NPZ_Backend.load_arrays(path)[0])
+        # Return legend or predictions of a single sample
+        if index == "legend" : return cache["legend"]
+        row = lookup_index(cache["index"], index)
+        return cache["preds"][row].astype(np.float64).tolist()
+
+    @staticmethod
+    def store_stream(path, class_list, chunks):
+        # Spool predictions chunk by chunk into a raw float32 buffer
+        samples = []
+        n_classes = None
+        with tempfile.TemporaryFile() as buffer:
+            for chunk_samples, preds in chunks:
+                preds = np.ascontiguousarray(preds, dtype=np.float32)
+                n_classes = preds.shape[-1]
+                buffer.write(preds.tobytes())
+                samples.extend(chunk_samples)
+            if n_classes is None:
+                n_classes = len(class_list) if class_list is not None else 0
+            buffer.seek(0)
+            # Write archive with uncompressed predictions and compressed ids
+            with zipfile.ZipFile(path, "w") as archive:
+                archive.writestr("legend.json", json.dumps(class_list))
+                encoded = np.asarray([str(s).encode("utf-8") for s in samples],
+                                     dtype=np.bytes_)
+                if len(samples) == 0 : encoded = np.zeros(0, dtype="S1")
+                with io.BytesIO() as file:
+                    np.lib.format.write_array(file, encoded, allow_pickle=False)
+                    archive.writestr("samples.npy", file.getvalue(),
+                                     compress_type=zipfile.ZIP_DEFLATED)
+                with archive.open("preds.npy", "w", force_zip64=True) as file:
+                    header = {"descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+                              "fortran_order": False,
+                              "shape": (len(samples), n_classes)}
+                    np.lib.format.write_array_header_2_0(file, header)
+                    shutil.copyfileobj(buffer, file)
+                # Persist hash index for random access by sample identifier
+                for key, array in build_index(samples).items():
+                    with archive.open("index_" + key + ".npy", "w",
+                                      force_zip64=True) as file:
+                        np.lib.format.write_array(file, array, allow_pickle=False)
+
+#-----------------------------------------------------#
+#                 Backend Registration                #
+#-----------------------------------------------------#
+# Storage backends by name (selected via file extension)
+inference_backends = {"json": JSON_Backend, "npz": NPZ_Backend}
+
+def get_backend(path):
+    # Identify backend by file extension (JSON as default)
+    for backend in inference_backends.values():
+        if path.endswith(backend.extension) : return backend
+    return JSON_Backend
+
+def resolve_path(path):
+    # Fall back to a file of another backend if requested file is missing
+    if os.path.exists(path) : return path
+    stem = path
+    for backend in inference_backends.values():
+        if path.endswith(backend.extension):
+            stem = path[:-len(backend.extension)]
+    for backend in inference_backends.values():
+        if os.path.exists(stem + backend.extension):
+            return stem + backend.extension
+    return path
+
+#-----------------------------------------------------#
+#                Sample Identifier Index              #
+#-----------------------------------------------------#
+def fingerprint(sample):
+    # Stable 64-bit hash of a sample identifier
+    digest = hashlib.blake2b(str(sample).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+def build_index(samples):
+    """ Hash index mapping sample identifiers to rows.
+
+    The fingerprints are grouped into a power of two of buckets (two to four
+    samples per bucket) in CSR layout. A lookup hashes the identifier and
+    compares it with the few fingerprints of its bucket, thus costs O(1).
+
+    Returns:
+        index (dict):           Arrays "offsets" (buckets+1), "fingerprints"
+                                and "rows" (sorted by bucket).
+    """
+    n_samples = len(samples)
+    dtype = np.uint32 if n_samples < 2**32 else np.uint64
+    n_buckets = 1 << (n_samples // 4).bit_length()
+    fingerprints = np.fromiter((fingerprint(s) for s in samples),
+                               dtype=np.uint64, count=n_samples)
+    buckets = (fingerprints & np.uint64(n_buckets - 1)).astype(np.int64)
+    # Sort rows by bucket and compute bucket boundaries
+    rows = np.argsort(buckets, kind="stable")
+    offsets = np.zeros(n_buckets + 1, dtype=dtype)
+    offsets[1:] = np.cumsum(np.bincount(buckets, minlength=n_buckets))
+    return {"offsets": offsets, "fingerprints": fingerprints[rows],
+            "rows": rows.astype(dtype)}
+
+def lookup_index(index, sample):
+    # Identify bucket of the sample identifier
+    value = fingerprint(sample)
+    bucket = value & (len(index["offsets"]) - 2)
+    start, end = int(index["offsets"][bucket]), int(index["offsets"][bucket+1])
+    # Compare fingerprints within the bucket
+    hits = np.flatnonzero(index["fingerprints"][start:end] == np.uint64(value))
+    if len(hits) == 0 : raise KeyError(sample)
+    return int(index["rows"][start + hits[0]])
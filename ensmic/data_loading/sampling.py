@@ -21,16 +21,108 @@
 #-----------------------------------------------------#
 # External libraries
 import os
+import io
 import json
+import hashlib
+import zipfile
+import numpy as np
 # AUCMEDI libraries
 from aucmedi import input_interface
 
+#-----------------------------------------------------#
+#               Compact Sampling Storage              #
+#-----------------------------------------------------#
+""" Each subset is stored in a compact format "<seed>.<subset>.npz" which is used
+by load_sampling and load_ground_truth (optionally also exported as JSON with
+{sample: one-hot list} for external tools):
+    samples.txt     Newline-separated sample identifiers (utf-8).
+    labels.npy      Class index per sample (int8).
+    legend.json     List of class names.
+
+Parsed compact files are kept in a process-level cache keyed by the file hash.
+The hash is only computed if the file status (path, mtime, size) changed since
+the last call and the image format is identified once per image directory,
+thus repeated load_sampling() calls on the same subset are free.
+"""
+# Image formats for identifying the image format of the image directory
+image_formats = ["jpeg", "jpg", "tif", "tiff", "png", "bmp", "gif", "npy",
+                 "nii", "gz", "dcm"]
+# Process-level cache of parsed sampling files (file hash -> sampling)
+sampling_cache = {}
+# Process-level cache of file status (path -> ((mtime, size), file hash))
+status_cache = {}
+# Process-level cache of image formats (image directory -> format)
+format_cache = {}
+
+def store_compact(path, samples, labels_ohe, class_names):
+    # Compact format only supports single-label one-hot encodings
+    labels_ohe = np.asarray(labels_ohe)
+    if len(class_names) > 127 or labels_ohe.ndim != 2 or \
+       not np.all(labels_ohe.sum(axis=1) == 1) : return False
+    labels = np.argmax(labels_ohe, axis=1).astype(np.int8)
+    # Write archive atomically
+    buffer = io.BytesIO()
+    np.lib.format.write_array(buffer, labels, allow_pickle=False)
+    with zipfile.ZipFile(path + ".tmp", "w", zipfile.ZIP_STORED) as archive:
+        archive.writestr("samples.txt", "\n".join(map(str, samples)))
+        archive.writestr("labels.npy", buffer.getvalue())
+        archive.writestr("legend.json", json.dumps(list(class_names)))
+    os.replace(path + ".tmp", path)
+    return True
+
+def load_compact(path):
+    # Fast pre-check: unchanged file status of an already parsed file
+    path = os.path.abspath(path)
+    status = os.stat(path)
+    status = (status.st_mtime_ns, status.st_size)
+    if path in status_cache and status_cache[path][0] == status and \
+       status_cache[path][1] in sampling_cache:
+        return sampling_cache[status_cache[path][1]]
+    # Read file once for hashing and parsing
+    with open(path, "rb") as file : content = file.read()
+    key = hashlib.blake2b(content, digest_size=16).hexdigest()
+    status_cache[path] = (status, key)
+    if key in sampling_cache : return sampling_cache[key]
+    # Parse archive
+    with zipfile.ZipFile(io.BytesIO(content), "r") as archive:
+        samples = archive.read("samples.txt").decode("utf-8")
+        samples = samples.split("\n") if samples else []
+        labels = np.load(io.BytesIO(archive.read("labels.npy")),
+                         allow_pickle=False)
+        class_names = json.loads(archive.read("legend.json"))
+    # Materialize one-hot encoding (read-only as it is shared via the cache)
+    labels_ohe = np.eye(len(class_names), dtype=int)[labels]
+    labels_ohe.setflags(write=False)
+    sampling_cache[key] = (samples, labels_ohe, class_names)
+    return sampling_cache[key]
+
+def identify_format(path_images):
+    # Return image format if already identified for the directory
+    path_images = os.path.abspath(path_images)
+    if path_images in format_cache : return format_cache[path_images]
+    # Peek into image directory for identifying the image format
+    with os.scandir(path_images) as entries:
+        for entry in entries:
+            format = entry.name.split(".")[-1]
+            if format.lower() in image_formats:
+                format_cache[path_images] = format
+                return format
+    raise Exception("Unknown image format.", path_images)
+
 #-----------------------------------------------------#
 #               Store Sampling to disk                #
 #-----------------------------------------------------#
-def sampling_to_disk(sample_sets, setnames, class_names, path_data, seed):
+def sampling_to_disk(sample_sets, setnames, class_names, path_data, seed,
+                     export_json=False):
     # Create each subset
     for i, set in enumerate(setnames):
+        # Write compact sampling to disk
+        path_compact = os.path.join(path_data, str(seed) + "." + set + ".npz")
+        compact = store_compact(path_compact, sample_sets[i][0].tolist(),
+                                sample_sets[i][1], class_names)
+        # Export JSON if requested or compact format is not applicable
+        if not export_json and compact : continue
+        if not compact and os.path.exists(path_compact) : os.remove(path_compact)
         # Parse sampling to JSON
         sampling = {"legend": class_names}
         sampling.update(dict(zip(sample_sets[i][0].tolist(),
@@ -47,8 +139,80 @@ def load_sampling(path_input, subset, seed):
     # Initialize pathes
     path_images = os.path.join(path_input, seed + ".images")
     path_json = os.path.join(path_input, seed + "." + subset + ".json")
-    # Run AUCMEDI JSON loader
-    ds = input_interface(interface="json", path_imagedir=path_images,
-                         path_data=path_json, training=True, ohe=True)
+    path_compact = os.path.join(path_input, seed + "." + subset + ".npz")
+    # Convert JSON sampling to compact format if missing or outdated
+    if not os.path.exists(path_compact) or (os.path.exists(path_json) and \
+       os.path.getmtime(path_compact) < os.path.getmtime(path_json)):
+        # Run AUCMEDI JSON loader
+        ds = input_interface(interface="json", path_imagedir=path_images,
+                             path_data=path_json, training=True, ohe=True)
+        # Fall back to JSON sampling if compact format is not applicable
+        if not store_compact(path_compact, ds[0], ds[1], ds[3]) : return ds
+    # Load compact sampling (cached)
+    (samples, labels_ohe, class_names) = load_compact(path_compact)
+    image_format = identify_format(path_images)
     # Return dataset
-    return ds
+    return (list(samples), labels_ohe, len(class_names), list(class_names),
+            image_format)
+
+#-----------------------------------------------------#
+#             Load Ground Truth from disk             #
+#-----------------------------------------------------#
+def load_ground_truth(path_input, subset, seed):
+    """ Ground truth dictionary {"legend": class_names, sample: one-hot list}. """
+    path_json = os.path.join(path_input, seed + "." + subset + ".json")
+    path_compact = os.path.join(path_input, seed + "." + subset + ".npz")
+    # Load JSON if no (up-to-date) compact sampling exists
+    if not os.path.exists(path_compact) or (os.path.exists(path_json) and \
+       os.path.getmtime(path_compact) < os.path.getmtime(path_json)):
+        with open(path_json, "r") as json_reader:
+            return json.load(json_reader)
+    # Build ground truth dictionary from compact sampling (cached)
+    (samples, labels_ohe, class_names) = load_compact(path_compact)
+    gt_map = {"legend": list(class_names)}
+    gt_map.update(zip(samples, labels_ohe.tolist()))
+    return gt_map
+
+#-----------------------------------------------------#
+#           Store k-fold Fold Assignment to disk      #
+#-----------------------------------------------------#
+""" The k-fold split is stored once as per-sample fold assignment
+"<seed>.cv.npz" on top of the concatenated base subsets (e.g. train-model &
+val-model). Fold views are materialized on demand by load_kfold().
+"""
+def kfold_to_disk(folds, base_subsets, path_data, seed):
+    # Write fold assignment & base subsets atomically
+    path_cv = os.path.join(path_data, str(seed) + ".cv.npz")
+    with open(path_cv + ".tmp", "wb") as file:
+        np.savez(file, folds=np.asarray(folds, dtype=np.int8),
+                 subsets=np.asarray(base_subsets, dtype=str))
+    os.replace(path_cv + ".tmp", path_cv)
+
+#-----------------------------------------------------#
+#            Load k-fold Fold View from disk          #
+#-----------------------------------------------------#
+def load_kfold(path_input, seed, fold):
+    # Load fold assignment
+    path_cv = os.path.join(path_input, seed + ".cv.npz")
+    with np.load(path_cv, allow_pickle=False) as archive:
+        folds = archive["folds"]
+        base_subsets = archive["subsets"].tolist()
+    # Load & concatenate base subsets (cached)
+    x_ds, y_ds = [], []
+    for subset in base_subsets:
+        (x, y, nclasses, class_names, image_format) = load_sampling(path_input,
+                                                                    subset,
+                                                                    seed)
+        x_ds.extend(x)
+        y_ds.append(y)
+    y_ds = np.concatenate(y_ds, axis=0)
+    if len(x_ds) != len(folds):
+        raise ValueError("Fold assignment does not match base subsets: " + \
+                         str(len(folds)) + " != " + str(len(x_ds)))
+    # Materialize training & validation view of fold
+    mask_val = folds == fold
+    x_train = [s for s, m in zip(x_ds, mask_val) if not m]
+    x_val = [s for s, m in zip(x_ds, mask_val) if m]
+    # Return fold view
+    return (x_train, y_ds[~mask_val], x_val, y_ds[mask_val], nclasses,
+            class_names, image_format)
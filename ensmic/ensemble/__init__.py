@@ -16,36 +16,64 @@
 #  You should have received a copy of the GNU General Public License           #
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
 #==============================================================================#
-# Mean Approaches
-from ensmic.ensemble.mean_unweighted import ELM_MeanUnweighted
-from ensmic.ensemble.mean_weighted import ELM_MeanWeighted
-# Majority Voting Approaches
-from ensmic.ensemble.majorityvote_hard import ELM_MajorityVote_Hard
-from ensmic.ensemble.majorityvote_soft import ELM_MajorityVote_Soft
-# Machine Learning Approaches
-from ensmic.ensemble.decision_tree import ELM_DecisionTree
-from ensmic.ensemble.logistic_regression import ELM_LogisticRegression
-from ensmic.ensemble.k_neighbors import ELM_kNearestNeighbors
-from ensmic.ensemble.naive_bayes import ELM_NaiveBayes
-from ensmic.ensemble.support_vector_machine import ELM_SupportVectorMachine
-from ensmic.ensemble.gaussian_process import ELM_GaussianProcess
-# Other Approaches
-from ensmic.ensemble.global_argmax import ELM_GlobalArgmax
-from ensmic.ensemble.best_model import ELM_BestModel
+# Lazy Ensembler Registry
+from ensmic.ensemble.registry import Ensembler_Registry
 
-# Ensembler Dictionary
-ensembler_dict = {"BestModel":ELM_BestModel,
-                  "MeanUnweighted":ELM_MeanUnweighted,
-                  "MeanWeighted":ELM_MeanWeighted,
-                  "MajorityVoting_Hard":ELM_MajorityVote_Hard,
-                  "MajorityVoting_Soft":ELM_MajorityVote_Soft,
-                  "GlobalArgmax":ELM_GlobalArgmax,
-                  "DecisionTree":ELM_DecisionTree,
-                  "LogisticRegression":ELM_LogisticRegression,
-                  "k-NearestNeighbors":ELM_kNearestNeighbors,
-                  "NaiveBayes":ELM_NaiveBayes,
-                  "SupportVectorMachine":ELM_SupportVectorMachine,
-                  "GaussianProcess":ELM_GaussianProcess,
-                  }
-# List of implemented Ensemblers
-ensembler = list(ensembler_dict.keys())
+# Import paths of all Ensemble Learning Methods and further public classes
+lazy_imports = {
+    # Prediction Cube
+    "PredictionCube": "ensmic.ensemble.prediction_cube",
+    # Mean Approaches
+    "ELM_MeanUnweighted": "ensmic.ensemble.mean_unweighted",
+    "ELM_MeanWeighted": "ensmic.ensemble.mean_weighted",
+    # Majority Voting Approaches
+    "ELM_MajorityVote_Hard": "ensmic.ensemble.majorityvote_hard",
+    "ELM_MajorityVote_Soft": "ensmic.ensemble.majorityvote_soft",
+    # Machine Learning Approaches
+    "ELM_DecisionTree": "ensmic.ensemble.decision_tree",
+    "ELM_LogisticRegression": "ensmic.ensemble.logistic_regression",
+    "ELM_kNearestNeighbors": "ensmic.ensemble.k_neighbors",
+    "ELM_NaiveBayes": "ensmic.ensemble.naive_bayes",
+    "ELM_SupportVectorMachine": "ensmic.ensemble.support_vector_machine",
+    "ELM_GaussianProcess": "ensmic.ensemble.gaussian_process",
+    # Other Approaches
+    "ELM_GlobalArgmax": "ensmic.ensemble.global_argmax",
+    "ELM_BestModel": "ensmic.ensemble.best_model",
+    "ELM_GreedySelection": "ensmic.ensemble.greedy_selection",
+    # Fused Engine for running all Ensemblers in one pass
+    "Ensemble_Engine": "ensmic.ensemble.engine",
+    # Confidence-gated Cascade with early exit
+    "Cascade_Ensemble": "ensmic.ensemble.cascade",
+}
+
+# Ensembler Dictionary (classes are imported on first access)
+ensembler_classes = {"BestModel":"ELM_BestModel",
+                     "MeanUnweighted":"ELM_MeanUnweighted",
+                     "MeanWeighted":"ELM_MeanWeighted",
+                     "MajorityVoting_Hard":"ELM_MajorityVote_Hard",
+                     "MajorityVoting_Soft":"ELM_MajorityVote_Soft",
+                     "GlobalArgmax":"ELM_GlobalArgmax",
+                     "DecisionTree":"ELM_DecisionTree",
+                     "LogisticRegression":"ELM_LogisticRegression",
+                     "k-NearestNeighbors":"ELM_kNearestNeighbors",
+                     "NaiveBayes":"ELM_NaiveBayes",
+                     "SupportVectorMachine":"ELM_SupportVectorMachine",
+                     "GaussianProcess":"ELM_GaussianProcess",
+                     }
+ensembler_dict = Ensembler_Registry({name: lazy_imports[cls] + ":" + cls \
+                                     for name, cls in ensembler_classes.items()})
+# List of implemented Ensemblers (default set of all pipeline runs)
+ensembler = list(ensembler_classes.keys())
+
+# Opt-in Ensemblers (accessible via ensembler_dict, not part of default runs)
+ensembler_dict.register("GreedySelection", lazy_imports["ELM_GreedySelection"] + \
+                        ":ELM_GreedySelection")
+
+# Resolve public classes on first attribute access
+def __getattr__(name):
+    if name in lazy_imports:
+        import importlib
+        value = getattr(importlib.import_module(lazy_imports[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module " + __name__ + " has no attribute " + name)
@@ -21,6 +21,9 @@
 #-----------------------------------------------------#
 # External libraries
 from abc import ABC, abstractmethod
+import numpy as np
+# Internal libraries/scripts
+from ensmic.ensemble.prediction_cube import PredictionCube
 
 #-----------------------------------------------------#
 #      Abstract Interface for an Ensemble class       #
@@ -33,6 +36,21 @@ Methods:
     prediction:             Utilize Ensemble Learning Method for test dataset.
     dump:                   Save (fitted) model to disk.
     load:                   Load (fitted) model from disk.
+    update:                 Incrementally fold new samples into a fitted model.
+    predict_batch:          Predict raw array (samples, architectures, classes).
+    predict_one:            Predict raw array of a single sample (architectures, classes).
+    predict_stream:         Predict an iterable of data chunks (generator).
+
+The array-based prediction functions bypass pandas and are intended for
+low-latency online usage. The architecture order of the input array has to be
+identical to the order used for training. By default, they wrap the array into
+a PredictionCube and call prediction, but ELMs can override them with pure
+NumPy implementations.
+
+The update function is optional and only supported by ELMs which can fold in new
+labeled validation samples without access to the previous ones (e.g. running
+counts or warm-started optimization). Thus, large validation sets can also be
+fed chunk by chunk. By default, it raises a NotImplementedError.
 """
 class Abstract_Ensemble(ABC):
     @abstractmethod
@@ -54,3 +72,22 @@ class Abstract_Ensemble(ABC):
     @abstractmethod
     def load(self, path):
         pass
+
+    def update(self, train_x, train_y):
+        # Incremental learning is not supported by default
+        raise NotImplementedError(type(self).__name__ + \
+                                  " does not support incremental updates")
+
+    def predict_batch(self, data):
+        # Wrap raw array into prediction cube and run default prediction
+        cube = PredictionCube(np.asarray(data, dtype=np.float64))
+        return self.prediction(cube)
+
+    def predict_one(self, data):
+        # Predict single sample as batch of size one
+        return self.predict_batch(np.asarray(data, dtype=np.float64)[None])[0]
+
+    def predict_stream(self, chunks):
+        # Predict chunk by chunk to keep memory bounded by the chunk size
+        for chunk in chunks:
+            yield self.prediction(chunk)
@@ -22,11 +22,11 @@
 #-----------------------------------------------------#
 # External libraries
 import numpy as np
-import pandas as pd
-from sklearn.metrics import f1_score
-import pickle
 # Internal libraries/scripts
 from ensmic.ensemble.abstract_elm import Abstract_Ensemble
+from ensmic.ensemble.prediction_cube import as_cube, as_labels
+from ensmic.utils.metrics import macro_f1_from_counts
+from ensmic.ensemble.model_format import store_model, load_model, is_model_file, load_pickle
 
 #-----------------------------------------------------#
 #                   ELM: Best Model                   #
@@ -46,24 +46,38 @@ class ELM_BestModel(Abstract_Ensemble):
     #---------------------------------------------#
     def __init__(self, n_classes):
         # Initialize class variables
+        self.n_classes = n_classes
         self.scoring = {}
+        self.counts = None
 
     #---------------------------------------------#
     #                  Training                   #
     #---------------------------------------------#
     def training(self, train_x, train_y):
-        # Split data columns into multi level structure based on architecutre
-        train_x.columns = train_x.columns.str.split('_', expand=True)
-        # Identify prediction for each architecutre
-        data = train_x.groupby(level=0, axis=1).idxmax(axis=1)
-        data = data.apply(lambda entry: [tup[1][1] for tup in entry])
-        # Convert dataframe to integer
-        data = data.astype('int')
+        # Obtain prediction cube (samples, architectures, classes)
+        cube = as_cube(train_x)
+        train_y = as_labels(train_y)
         # Compute F1 for each architecture and cache scoring
-        predarch = data.to_dict(orient="list")
-        for arch in predarch.keys():
-            arch_f1 = f1_score(predarch[arch], train_y, average="macro")
-            self.scoring[arch] = arch_f1
+        arch_f1 = cube.macro_f1(train_y)
+        self.scoring = dict(zip(cube.architectures, arch_f1.tolist()))
+        # Cache additive F1 counts for incremental updates
+        self.counts = cube.f1_counts(train_y).copy()
+
+    #---------------------------------------------#
+    #              Incremental Update             #
+    #---------------------------------------------#
+    def update(self, train_x, train_y):
+        # Obtain prediction cube (samples, architectures, classes)
+        cube = as_cube(train_x)
+        train_y = as_labels(train_y)
+        if self.counts is None:
+            raise ValueError("Incremental update requires F1 counts of a training")
+        if list(cube.architectures) != list(self.scoring.keys()):
+            raise ValueError("Architectures differ from the ones used for training")
+        # Add F1 counts of new samples and update scoring
+        self.counts = self.counts + cube.f1_counts(train_y)
+        arch_f1 = macro_f1_from_counts(self.counts)
+        self.scoring = dict(zip(cube.architectures, arch_f1.tolist()))
 
     #---------------------------------------------#
     #                  Prediction                 #
@@ -72,22 +86,41 @@ class ELM_BestModel(Abstract_Ensemble):
         # Identify best model
         best_model = max(self.scoring, key=self.scoring.get)
         # Obtain prediction probabilities of best model
-        pred = data.loc[:, data.columns.str.startswith(best_model)]
-        # Transform prediction to Numpy and return result
-        return pred.to_numpy()
+        cube = as_cube(data)
+        pred = cube.data[:, cube.architectures.index(best_model), :]
+        # Return prediction
+        return pred
+
+    #---------------------------------------------#
+    #         Low-Latency Array Prediction        #
+    #---------------------------------------------#
+    def predict_batch(self, data):
+        # Reshape raw array to (samples, architectures, classes)
+        data = np.asarray(data, dtype=np.float64)
+        data = data.reshape(len(data), -1, self.n_classes)
+        # Identify position of best model in the architecture order of training
+        best_model = max(self.scoring, key=self.scoring.get)
+        index = list(self.scoring.keys()).index(best_model)
+        # Return prediction probabilities of best model
+        return data[:, index, :]
 
     #---------------------------------------------#
     #              Dump Model to Disk             #
     #---------------------------------------------#
     def dump(self, path):
-        # Dump scoring to disk via pickle
-        with open(path, "wb") as pickle_writer:
-            pickle.dump(self.scoring, pickle_writer)
+        # Dump scoring to disk via model container
+        arrays = {"f1_counts": self.counts} if self.counts is not None else {}
+        store_model(path, "ELM_BestModel", params={"scoring": self.scoring},
+                    arrays=arrays)
 
     #---------------------------------------------#
     #             Load Model from Disk            #
     #---------------------------------------------#
     def load(self, path):
-        # Load scoring from disk via pickle
-        with open(path, "rb") as pickle_reader:
-            self.scoring = pickle.load(pickle_reader)
\ No newline at end of file
+        # Load scoring from disk via model container
+        if is_model_file(path):
+            params, arrays, _ = load_model(path, "ELM_BestModel")
+            self.scoring = params["scoring"]
+            self.counts = arrays.get("f1_counts", None)
+        # Support legacy dumps via pickle
+        else : self.scoring = load_pickle(path)
\ No newline at end of file
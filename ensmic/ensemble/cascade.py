@@ -0,0 +1,224 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import numpy as np
+# Internal libraries/scripts
+from ensmic.ensemble.prediction_cube import as_cube, as_labels
+from ensmic.ensemble.model_format import store_model, load_model
+from ensmic.utils.metrics import compute_macro_f1
+
+#-----------------------------------------------------#
+#          Confidence-gated Cascade Ensemble          #
+#-----------------------------------------------------#
+""" Cascade ensemble which runs architectures stage by stage with early exit.
+
+The architectures are run in the given order (cheap ones first). After each
+stage, the mean of all predictions obtained so far is pooled. If the gating
+score of the pooled prediction passes the threshold of the stage, the sample
+exits the cascade and the remaining architectures are not run for it. The last
+stage always accepts.
+
+The thresholds are calibrated on the val-ensemble stage after stage, each on
+the samples which did not exit at an earlier stage: for each stage, the lowest
+threshold is selected for which the errors of the cascade so far exceed the
+errors of the complete ensemble by at most a fraction of `tolerance` of all
+val-ensemble samples. Thus, the end-to-end error rate of the cascade on the
+val-ensemble is at most the one of the complete ensemble plus `tolerance`.
+
+Criteria:
+    "confidence"            Highest pooled class probability.
+    "margin"                Difference between the two highest probabilities.
+
+Methods:
+    __init__                Initialize cascade with an architecture order.
+    calibrate:              Calibrate stage thresholds on val-ensemble.
+    simulate:               Offline cascade on precomputed predictions.
+    run:                    Online cascade which only runs required models.
+    dump:                   Save (calibrated) cascade to disk.
+    load:                   Load (calibrated) cascade from disk.
+"""
+class Cascade_Ensemble():
+    #---------------------------------------------#
+    #                Initialization               #
+    #---------------------------------------------#
+    def __init__(self, architectures, costs=None, criterion="confidence",
+                 tolerance=0.01):
+        # Verify gating criterion
+        if criterion not in ["confidence", "margin"]:
+            raise ValueError("Unknown gating criterion: " + str(criterion))
+        # Initialize class variables
+        self.architectures = list(architectures)
+        if costs is None : costs = np.ones(len(self.architectures))
+        self.costs = np.asarray(costs, dtype=np.float64)
+        self.criterion = criterion
+        self.tolerance = tolerance
+        self.thresholds = None
+
+    #---------------------------------------------#
+    #                Gating Score                 #
+    #---------------------------------------------#
+    def gate(self, pooled):
+        # Compute gating score of pooled predictions with shape (..., classes)
+        if self.criterion == "confidence" : return np.max(pooled, axis=-1)
+        top = np.partition(pooled, -2, axis=-1)
+        return top[..., -1] - top[..., -2]
+
+    def pool(self, cube):
+        # Pooled prediction after each stage (samples, stages, classes)
+        cube = as_cube(cube)
+        index = [cube.architectures.index(a) for a in self.architectures]
+        pooled = np.cumsum(cube.data[:, index, :], axis=1)
+        pooled /= np.arange(1, len(index) + 1)[None, :, None]
+        return pooled
+
+    #---------------------------------------------#
+    #                 Calibration                 #
+    #---------------------------------------------#
+    def calibrate(self, cube, labels):
+        labels = as_labels(labels)
+        pooled = self.pool(cube)
+        scores = self.gate(pooled)
+        errors = np.argmax(pooled, axis=-1) != labels[:, None]
+        # Errors of the complete ensemble as reference
+        reference = errors[:, -1]
+        # End-to-end budget of additional errors and errors spent so far
+        budget = self.tolerance * len(labels)
+        spent = 0
+        # Select lowest threshold of each stage on the remaining samples
+        remaining = np.arange(len(labels))
+        self.thresholds = []
+        for s in range(0, len(self.architectures) - 1):
+            order = remaining[np.argsort(-scores[remaining, s], kind="stable")]
+            sorted_scores = scores[order, s]
+            # Additional errors when accepting the k most confident samples
+            excess = np.cumsum(errors[order, s].astype(np.int64) - \
+                               reference[order])
+            valid = spent + excess <= budget
+            # Only cut between distinct scores (ties are accepted together)
+            valid[:-1] &= sorted_scores[:-1] > sorted_scores[1:]
+            # Largest accepted prefix (accept nothing without a valid cut)
+            valid_index = np.flatnonzero(valid)
+            if len(valid_index) == 0:
+                self.thresholds.append(np.inf)
+                continue
+            k = valid_index[-1]
+            self.thresholds.append(float(sorted_scores[k]))
+            # Only samples which did not exit reach the next stage
+            spent += excess[k]
+            remaining = order[k+1:]
+        # Last stage always accepts
+        self.thresholds.append(-np.inf)
+
+    #---------------------------------------------#
+    #              Offline Simulation             #
+    #---------------------------------------------#
+    def simulate(self, cube, labels=None):
+        """ Simulate the cascade on precomputed predictions of all architectures.
+
+        Returns:
+            results (dict):         Pooled predictions at exit ("prediction"),
+                                    exit stage and cost of each sample, mean cost,
+                                    fraction of samples exiting at each stage and
+                                    macro F1 (if labels are provided).
+        """
+        pooled = self.pool(cube)
+        accept = self.gate(pooled) >= np.asarray(self.thresholds)[None, :]
+        # Identify first accepting stage of each sample
+        exit_stage = np.argmax(accept, axis=1)
+        prediction = pooled[np.arange(len(pooled)), exit_stage, :]
+        cost = np.cumsum(self.costs)[exit_stage]
+        results = {"prediction": prediction,
+                   "exit_stage": exit_stage,
+                   "cost": cost,
+                   "mean_cost": float(cost.mean()),
+                   "exit_rate": (np.bincount(exit_stage,
+                                             minlength=len(self.architectures)) \
+                                 / len(exit_stage)).tolist()}
+        if labels is not None:
+            results["f1"] = float(compute_macro_f1(as_labels(labels),
+                                                   np.argmax(prediction, axis=-1),
+                                                   pooled.shape[2])[0])
+        return results
+
+    #---------------------------------------------#
+    #               Online Inference              #
+    #---------------------------------------------#
+    def run(self, samples, predict_function):
+        """ Run the cascade and only compute required predictions.
+
+        Arguments:
+            samples (list):             Sample identifiers.
+            predict_function (callable):Called as predict_function(architecture,
+                                        samples) and returning the predictions
+                                        of the architecture with shape
+                                        (samples, classes).
+
+        Returns:
+            prediction (numpy.ndarray): Pooled predictions at exit.
+            exit_stage (numpy.ndarray): Exit stage of each sample.
+        """
+        samples = np.asarray(samples)
+        exit_stage = np.full(len(samples), -1, dtype=np.int64)
+        prediction, running_sum = None, None
+        remaining = np.arange(len(samples))
+        for s, architecture in enumerate(self.architectures):
+            # Run architecture only on samples which did not exit yet
+            pred = np.asarray(predict_function(architecture,
+                                               samples[remaining].tolist()),
+                              dtype=np.float64)
+            if running_sum is None:
+                running_sum = np.zeros((len(samples), pred.shape[1]))
+                prediction = np.zeros((len(samples), pred.shape[1]))
+            running_sum[remaining] += pred
+            pooled = running_sum[remaining] / (s + 1)
+            # Accept samples passing the threshold of the current stage
+            accept = self.gate(pooled) >= self.thresholds[s]
+            prediction[remaining[accept]] = pooled[accept]
+            exit_stage[remaining[accept]] = s
+            remaining = remaining[~accept]
+            if len(remaining) == 0 : break
+        # Return predictions and exit stages
+        return prediction, exit_stage
+
+    #---------------------------------------------#
+    #             Dump Cascade to Disk            #
+    #---------------------------------------------#
+    def dump(self, path):
+        # Dump calibrated cascade to disk via model container
+        params = {"architectures": self.architectures,
+                  "criterion": self.criterion, "tolerance": self.tolerance}
+        arrays = {"costs": self.costs,
+                  "thresholds": np.asarray(self.thresholds, dtype=np.float64)}
+        store_model(path, "Cascade_Ensemble", params=params, arrays=arrays)
+
+    #---------------------------------------------#
+    #            Load Cascade from Disk           #
+    #---------------------------------------------#
+    def load(self, path):
+        # Load calibrated cascade from disk via model container
+        params, arrays, _ = load_model(path, "Cascade_Ensemble")
+        self.architectures = params["architectures"]
+        self.criterion = params["criterion"]
+        self.tolerance = params["tolerance"]
+        self.costs = np.array(arrays["costs"])
+        self.thresholds = arrays["thresholds"].tolist()
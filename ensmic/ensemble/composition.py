@@ -0,0 +1,173 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import numpy as np
+from sklearn.model_selection import StratifiedKFold
+# Internal libraries/scripts
+from ensmic.ensemble.engine import Ensemble_Engine
+from ensmic.ensemble.prediction_cube import PredictionCube, as_cube, as_labels
+from ensmic.utils.metrics import compute_macro_f1
+
+#-----------------------------------------------------#
+#            Budgeted Ensemble Composition            #
+#-----------------------------------------------------#
+""" Search for the best scoring composition of architectures and Ensemble
+Learning Method under an inference cost budget (e.g. latency or FLOPs).
+
+The costs of the architectures are additive (all selected architectures have
+to be run for each image), thus the subset search is a knapsack problem. It is
+solved approximately via beam search on the val-ensemble predictions: subsets
+are grown one architecture at a time, all extensions within the budget are
+scored at once by the macro F1 of the pooled prediction and only the best
+subsets of each size are kept.
+
+The surviving subsets are afterwards combined with every Ensemble Learning
+Method and scored via cross-validation on the val-ensemble, since learning
+based ensemblers would be overestimated on their own training data.
+
+Functions:
+    search_subsets:         Beam search over architecture subsets under budget.
+    evaluate_compositions:  Cross-validated score of each subset & ensembler.
+    pareto_front:           Identify compositions not dominated in cost & score.
+"""
+#-----------------------------------------------------#
+#            Beam Search over Architectures           #
+#-----------------------------------------------------#
+def search_subsets(cube, labels, costs, budget, beam_width=8):
+    """ Beam search for well performing architecture subsets within a budget.
+
+    Arguments:
+        cube (PredictionCube):      Val-ensemble predictions.
+        labels (numpy.ndarray):     Ground truth classes with shape (samples,).
+        costs (numpy.ndarray):      Cost of each architecture in cube order.
+        budget (float):             Maximum summed cost of a subset.
+        beam_width (int):           Number of subsets kept for each size.
+
+    Returns:
+        subsets (list):             Tuples (architecture indices, cost, score)
+                                    of all subsets which survived a beam step.
+    """
+    cube = as_cube(cube)
+    labels = as_labels(labels)
+    costs = np.asarray(costs, dtype=np.float64)
+    data = cube.data
+    n_samples, n_arch, n_classes = data.shape
+    # Start beam with the empty subset
+    beam = [((), np.zeros((n_samples, n_classes)), 0.0)]
+    subsets = []
+    for size in range(1, n_arch + 1):
+        expansions = {}
+        for selected, running_sum, cost in beam:
+            # Identify affordable architectures which are not selected yet
+            cand = [a for a in range(0, n_arch) if a not in selected and \
+                    cost + costs[a] <= budget and \
+                    tuple(sorted(selected + (a,))) not in expansions]
+            if len(cand) == 0 : continue
+            # Score all extensions of the current subset at once
+            pooled = running_sum[:, None, :] + data[:, cand, :]
+            scores = compute_macro_f1(labels, np.argmax(pooled, axis=-1),
+                                      n_classes)
+            for a, score in zip(cand, scores):
+                key = tuple(sorted(selected + (a,)))
+                expansions[key] = (float(score), cost + costs[a])
+        if len(expansions) == 0 : break
+        # Keep best subsets of current size (cheaper subsets on ties)
+        ranking = sorted(expansions.items(),
+                         key=lambda x: (-x[1][0], x[1][1]))[:beam_width]
+        beam = [(key, data[:, key, :].sum(axis=1), cost) \
+                for key, (score, cost) in ranking]
+        subsets.extend([(key, cost, score) \
+                        for key, (score, cost) in ranking])
+    # Return all surviving subsets
+    return subsets
+
+#-----------------------------------------------------#
+#         Cross-validated Composition Scoring         #
+#-----------------------------------------------------#
+def evaluate_compositions(cube, labels, subsets, ensembler_list,
+                          ensembler_params=None, n_folds=3, n_workers=1):
+    """ Score each combination of architecture subset and ensembler.
+
+    The ensemblers are fitted on the training folds and predict the held-out
+    fold. The macro F1 is computed on all out-of-fold predictions.
+
+    Returns:
+        results (list):             Dictionaries with the keys "architectures",
+                                    "ensembler", "score" and "latency_ms" (mean
+                                    prediction time per sample of the ensembler).
+    """
+    cube = as_cube(cube)
+    labels = as_labels(labels)
+    n_classes = cube.n_classes
+    folds = list(StratifiedKFold(n_splits=n_folds, shuffle=True,
+                                 random_state=0).split(cube.data, labels))
+    results = []
+    for selected in subsets:
+        # Restrict prediction cube to architectures of the subset
+        sub = PredictionCube(cube.data[:, list(selected), :], cube.samples,
+                             [cube.architectures[a] for a in selected],
+                             cube.class_list)
+        # Compute out-of-fold predictions of all ensemblers
+        preds = np.full((cube.n_samples, len(ensembler_list), n_classes),
+                        np.nan, dtype=np.float64)
+        timer = np.zeros(len(ensembler_list))
+        for train_index, test_index in folds:
+            engine = Ensemble_Engine(ensembler_list, n_classes=n_classes,
+                                     ensembler_params=ensembler_params,
+                                     n_workers=n_workers)
+            engine.training(sub.subset(train_index), labels[train_index])
+            timer_fit = dict(engine.timer_cache)
+            pred = engine.prediction(sub.subset(test_index))
+            for e, ensembler in enumerate(pred.architectures):
+                i = ensembler_list.index(ensembler)
+                preds[test_index, i, :] = pred.data[:, e, :]
+                timer[i] += engine.timer_cache[ensembler] - timer_fit[ensembler]
+        # Score ensemblers which succeeded on all folds
+        valid = [i for i in range(0, len(ensembler_list)) \
+                 if not np.isnan(preds[:, i, :]).any()]
+        scores = compute_macro_f1(labels, np.argmax(preds[:, valid, :], axis=-1),
+                                  n_classes)
+        for i, score in zip(valid, scores):
+            results.append({"architectures": list(sub.architectures),
+                            "ensembler": ensembler_list[i],
+                            "score": float(score),
+                            "latency_ms": timer[i] / cube.n_samples * 1e3})
+    # Return scored compositions
+    return results
+
+#-----------------------------------------------------#
+#                     Pareto Front                    #
+#-----------------------------------------------------#
+def pareto_front(costs, scores):
+    """ Boolean mask of all points which are not dominated by a cheaper or
+        equally expensive point with a higher or equal score. """
+    costs = np.asarray(costs, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+    mask = np.zeros(len(costs), dtype=bool)
+    best = -np.inf
+    # Sweep from cheap to expensive (better score first on equal costs)
+    for i in np.lexsort((-scores, costs)):
+        if scores[i] > best:
+            mask[i] = True
+            best = scores[i]
+    return mask
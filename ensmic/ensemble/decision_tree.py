@@ -22,16 +22,22 @@
 #-----------------------------------------------------#
 # External libraries
 import numpy as np
-import pickle
 from sklearn.tree import DecisionTreeClassifier
 # Internal libraries/scripts
 from ensmic.ensemble.abstract_elm import Abstract_Ensemble
+from ensmic.ensemble.prediction_cube import as_matrix, as_labels
+from ensmic.ensemble.model_format import store_model, load_model, is_model_file, load_pickle
 
 #-----------------------------------------------------#
 #                 ELM: Decision Tree                  #
 #-----------------------------------------------------#
 """ Ensemble Learning approach via Decision Tree.
 
+After fitting, the tree structure is exported into plain NumPy arrays (children,
+split features, thresholds and leaf values). Prediction traverses these arrays
+level by level for all samples at once, thus a loaded (memory-mapped) tree can
+be used without rebuilding the scikit-learn estimator.
+
 Methods:
     __init__                Initialize Ensemble Learning Method.
     training:               Fit Ensemble Learning Method on validate-ensemble.
@@ -43,40 +49,95 @@ class ELM_DecisionTree(Abstract_Ensemble):
     #---------------------------------------------#
     #                Initialization               #
     #---------------------------------------------#
-    def __init__(self, n_classes):
+    def __init__(self, n_classes, max_depth=None, min_samples_leaf=1,
+                 criterion="gini"):
         # Initialize model
-        self.model = DecisionTreeClassifier(random_state=0)
+        self.model = DecisionTreeClassifier(random_state=0,
+                                            max_depth=max_depth,
+                                            min_samples_leaf=min_samples_leaf,
+                                            criterion=criterion)
+        self.tree = None
 
     #---------------------------------------------#
     #                  Training                   #
     #---------------------------------------------#
     def training(self, train_x, train_y):
-        # Transform Y array to be NumPy 1D array
-        train_y = np.ravel(train_y, order="C")
+        # Transform X to 2D feature matrix and Y to NumPy 1D array
+        train_x = as_matrix(train_x)
+        train_y = as_labels(train_y)
         # Fit model to val-ensemble
         self.model = self.model.fit(train_x, train_y)
+        # Export tree structure into arrays
+        self.tree = self.export_tree(self.model)
 
     #---------------------------------------------#
     #                  Prediction                 #
     #---------------------------------------------#
     def prediction(self, data):
-        # Compute prediction probabilities via fitted model
-        pred = self.model.predict_proba(data)
-        # Return results as NumPy array
-        return pred
+        # Compute prediction probabilities via tree arrays
+        return self.predict_batch(as_matrix(data))
+
+    #---------------------------------------------#
+    #         Low-Latency Array Prediction        #
+    #---------------------------------------------#
+    def predict_batch(self, data):
+        # Reshape raw array to (samples, architectures*classes) as float32
+        matrix = np.ascontiguousarray(data, dtype=np.float32)
+        matrix = matrix.reshape(len(matrix), -1)
+        # Obtain leaf values via traversal of the tree arrays
+        pred = self.tree["value"][self.apply_tree(matrix)]
+        # Return normalized class probabilities
+        normalizer = pred.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        return pred / normalizer
+
+    #---------------------------------------------#
+    #                Tree Structure               #
+    #---------------------------------------------#
+    @staticmethod
+    def export_tree(model):
+        # Obtain node arrays of a fitted scikit-learn tree
+        tree = model.tree_
+        return {"children_left": np.asarray(tree.children_left, dtype=np.int64),
+                "children_right": np.asarray(tree.children_right, dtype=np.int64),
+                "feature": np.asarray(tree.feature, dtype=np.int64),
+                "threshold": np.asarray(tree.threshold, dtype=np.float64),
+                "value": np.asarray(tree.value[:, 0, :model.n_classes_],
+                                    dtype=np.float64),
+                "classes": np.asarray(model.classes_)}
+
+    def apply_tree(self, matrix):
+        # Start all samples at the root node
+        left = self.tree["children_left"]
+        right = self.tree["children_right"]
+        nodes = np.zeros(len(matrix), dtype=np.int64)
+        active = np.arange(len(matrix))
+        # Descend one level per iteration until all samples reached a leaf
+        while active.size > 0:
+            current = nodes[active]
+            inner = left[current] != -1
+            active, current = active[inner], current[inner]
+            go_left = matrix[active, self.tree["feature"][current]] <= \
+                      self.tree["threshold"][current]
+            nodes[active] = np.where(go_left, left[current], right[current])
+        # Return leaf node of each sample
+        return nodes
 
     #---------------------------------------------#
     #              Dump Model to Disk             #
     #---------------------------------------------#
     def dump(self, path):
-        # Dump model to disk via pickle
-        with open(path, "wb") as pickle_writer:
-            pickle.dump(self.model, pickle_writer)
+        # Dump tree arrays to disk via model container
+        store_model(path, "ELM_DecisionTree", arrays=self.tree)
 
     #---------------------------------------------#
     #             Load Model from Disk            #
     #---------------------------------------------#
     def load(self, path):
-        # Load model from disk via pickle
-        with open(path, "rb") as pickle_reader:
-            self.model = pickle.load(pickle_reader)
\ No newline at end of file
+        # Load tree arrays from disk via model container
+        if is_model_file(path):
+            _, self.tree, _ = load_model(path, "ELM_DecisionTree")
+        # Support legacy dumps via pickle
+        else:
+            self.model = load_pickle(path)
+            self.tree = self.export_tree(self.model)
\ No newline at end of file
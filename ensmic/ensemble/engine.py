@@ -0,0 +1,285 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import os
+import time
+import shutil
+import tempfile
+import numpy as np
+# Internal libraries/scripts
+from ensmic.ensemble import ensembler_dict
+from ensmic.ensemble.prediction_cube import PredictionCube, as_cube, as_labels
+from ensmic.utils.memmap import memmap_archive
+from ensmic.utils.parallel import process_pool
+
+#-----------------------------------------------------#
+#             Fused Ensemble Learning Engine          #
+#-----------------------------------------------------#
+""" Engine for running multiple Ensemble Learning Methods in one pass.
+
+The input data is converted only once into a PredictionCube and all shared
+intermediates (argmax votes, class sums, macro F1 per architecture) are
+computed once before being fanned out to every ensembler. The predictions of
+all ensemblers are collected into a single PredictionCube with the shape
+(samples, ensemblers, classes), which can be written to disk in one go.
+
+Ensemblers which raise an exception are reported and skipped, while their
+error messages are recorded in the errors dictionary. Optional
+hyperparameters can be passed for each ensembler via a dictionary, e.g.
+{"GaussianProcess": {"mode": "nystroem"}}.
+
+With n_workers > 1, the ensemblers are dispatched to a forked process pool.
+The input cube is shared zero-copy with the workers (training: at fork time,
+streaming prediction: as memory-mapped chunk file) and the BLAS/OpenMP threads
+of each worker are capped. Thus, the wall-clock time approaches the one of the
+slowest ensembler. Per-ensembler timings are measured inside the workers.
+
+Methods:
+    __init__                Initialize engine with a list of ensemblers.
+    training:               Fit all ensemblers on validate-ensemble.
+    update:                 Incrementally fold new samples into all ensemblers.
+    prediction:             Compute predictions of all ensemblers for test dataset.
+    predict_stream:         Compute predictions of all ensemblers chunk by chunk.
+    dump:                   Save all (fitted) models to disk.
+"""
+class Ensemble_Engine():
+    #---------------------------------------------#
+    #                Initialization               #
+    #---------------------------------------------#
+    def __init__(self, ensembler_list, n_classes, ensembler_params=None,
+                 n_workers=1):
+        # Store class variables
+        self.ensembler_list = ensembler_list
+        self.n_classes = n_classes
+        if ensembler_params is None : ensembler_params = {}
+        self.ensembler_params = ensembler_params
+        self.n_workers = min(n_workers, max(1, len(ensembler_list)))
+        # Initialize cache for fitted models and time measurements
+        self.models = {}
+        self.timer_cache = {}
+        self.failed = set()
+        self.errors = {}
+
+    #---------------------------------------------#
+    #                  Training                   #
+    #---------------------------------------------#
+    def training(self, train_x, train_y):
+        # Convert data into prediction cube & labels only once
+        cube = as_cube(train_x)
+        train_y = as_labels(train_y)
+        # Compute shared intermediates once
+        cube.votes()
+        cube.class_sum()
+        cube.macro_f1(train_y)
+        # Fit each ensembler on the shared data (in parallel)
+        if self.n_workers == 1:
+            results = map(fit_ensembler,
+                          [(self, ensembler, cube, train_y) \
+                           for ensembler in self.ensembler_list])
+            self.collect_training(results)
+        else:
+            with process_pool(self.n_workers, initializer=share_state,
+                              initargs=(self, cube, train_y)) as pool:
+                results = pool.imap_unordered(fit_shared_ensembler,
+                                              self.ensembler_list)
+                self.collect_training(results)
+
+    def collect_training(self, results):
+        # Store fitted models and time measurements in ensembler order
+        results = sorted(results, key=lambda r: self.ensembler_list.index(r[0]))
+        for ensembler, model, timer, error in results:
+            if error is not None:
+                print(ensembler, "-", "An exception occurred:", error)
+                self.errors[ensembler] = error
+                continue
+            self.timer_cache[ensembler] = timer
+            self.models[ensembler] = model
+
+    #---------------------------------------------#
+    #              Incremental Update             #
+    #---------------------------------------------#
+    def update(self, train_x, train_y):
+        # Convert data into prediction cube & labels only once
+        cube = as_cube(train_x)
+        train_y = as_labels(train_y)
+        # Update each fitted ensembler which supports incremental learning
+        for ensembler, model in self.models.items():
+            try:
+                timer_start = time.time()
+                model.update(cube, train_y)
+                self.timer_cache[ensembler] += time.time() - timer_start
+            except NotImplementedError as e:
+                print(ensembler, "-", "Skipping update:", str(e))
+            except Exception as e:
+                print(ensembler, "-", "An exception occurred:", str(e))
+
+    #---------------------------------------------#
+    #                  Prediction                 #
+    #---------------------------------------------#
+    def prediction(self, data):
+        # Convert data into prediction cube only once
+        cube = as_cube(data)
+        # Compute shared intermediates once
+        cube.votes()
+        cube.class_sum()
+        # Allocate result cube (samples, ensemblers, classes)
+        ensemblers = list(self.models.keys())
+        preds = np.empty((cube.n_samples, len(ensemblers), self.n_classes),
+                         dtype=np.float64)
+        # Compute predictions of each fitted ensembler
+        verified = []
+        for ensembler in ensemblers:
+            try:
+                timer_start = time.time()
+                preds[:, len(verified), :] = self.models[ensembler].prediction(cube)
+                self.timer_cache[ensembler] += time.time() - timer_start
+                verified.append(ensembler)
+            except Exception as e:
+                print(ensembler, "-", "An exception occurred:", str(e))
+                self.errors[ensembler] = str(e)
+        # Return predictions of all ensemblers as prediction cube
+        return PredictionCube(preds[:, :len(verified), :], cube.samples,
+                              verified, cube.class_list)
+
+    #---------------------------------------------#
+    #             Streaming Prediction            #
+    #---------------------------------------------#
+    def predict_stream(self, chunks):
+        """ Generator yielding a PredictionCube (chunk, ensemblers, classes).
+
+        All fitted ensemblers are included in each chunk to keep a fixed shape.
+        If an ensembler fails on a chunk, its predictions are filled with NaN
+        and it is recorded in the failed set.
+        """
+        ensemblers = list(self.models.keys())
+        # Fork process pool sharing the fitted models and the chunk file path
+        pool = None
+        if self.n_workers > 1:
+            path_shared = tempfile.mkdtemp(prefix="ensmic.engine.",
+                                           dir="/dev/shm" if \
+                                           os.path.isdir("/dev/shm") else None)
+            path_chunk = os.path.join(path_shared, "chunk.npz")
+            pool = process_pool(self.n_workers, initializer=share_state,
+                                initargs=(self, None, None, path_chunk))
+        try:
+            for chunk in chunks:
+                # Convert chunk into prediction cube and compute shared intermediates
+                cube = as_cube(chunk)
+                cube.votes()
+                cube.class_sum()
+                preds = np.full((cube.n_samples, len(ensemblers), self.n_classes),
+                                np.nan, dtype=np.float64)
+                # Compute predictions of each fitted ensembler (in parallel)
+                active = [e for e in ensemblers if e not in self.failed]
+                if pool is None:
+                    results = map(predict_ensembler,
+                                  [(self, e, cube) for e in active])
+                else:
+                    # Share chunk via memory-mapped file, send only the names
+                    share_chunk(cube, path_chunk)
+                    results = pool.imap_unordered(predict_shared_ensembler,
+                                                  active)
+                for ensembler, pred, timer, error in results:
+                    if error is not None:
+                        print(ensembler, "-", "An exception occurred:", error)
+                        self.errors[ensembler] = error
+                        self.failed.add(ensembler)
+                        continue
+                    preds[:, ensemblers.index(ensembler), :] = pred
+                    self.timer_cache[ensembler] += timer
+                # Yield predictions of current chunk
+                yield PredictionCube(preds, cube.samples, ensemblers,
+                                     cube.class_list)
+        finally:
+            if pool is not None:
+                pool.terminate()
+                shutil.rmtree(path_shared, ignore_errors=True)
+
+    #---------------------------------------------#
+    #             Dump Models to Disk             #
+    #---------------------------------------------#
+    def dump(self, path_function):
+        # Dump each fitted model to the path provided for the ensembler
+        for ensembler, model in self.models.items():
+            model.dump(path_function(ensembler))
+
+#-----------------------------------------------------#
+#                Ensembler Job Functions              #
+#-----------------------------------------------------#
+# State shared with forked workers (engine, training cube, training labels,
+# path to the memory-mapped prediction chunk)
+worker_state = {}
+
+def share_state(engine, cube, labels, path_chunk=None):
+    worker_state["engine"] = engine
+    worker_state["cube"] = cube
+    worker_state["labels"] = labels
+    worker_state["path_chunk"] = path_chunk
+
+def share_chunk(cube, path_chunk):
+    # Write chunk & shared intermediates uncompressed and replace atomically
+    with open(path_chunk + ".tmp", "wb") as file:
+        np.savez(file, data=cube.data, votes=cube.votes(),
+                 class_sum=cube.class_sum(),
+                 architectures=np.asarray(cube.architectures, dtype=str),
+                 class_list=np.asarray(cube.class_list, dtype=str))
+    os.replace(path_chunk + ".tmp", path_chunk)
+
+def load_chunk(path_chunk):
+    # Memory-map chunk & shared intermediates (pages shared across workers)
+    with np.load(path_chunk, allow_pickle=False) as archive:
+        architectures = archive["architectures"].tolist()
+        class_list = archive["class_list"].tolist()
+    cube = PredictionCube(memmap_archive(path_chunk, "data.npy"),
+                          architectures=architectures, class_list=class_list)
+    for name in ["votes", "class_sum"]:
+        cube.cache[name] = memmap_archive(path_chunk, name + ".npy")
+    return cube
+
+def fit_ensembler(job):
+    engine, ensembler, cube, train_y = job
+    try:
+        timer_start = time.time()
+        params = engine.ensembler_params.get(ensembler, {})
+        model = ensembler_dict[ensembler](n_classes=engine.n_classes, **params)
+        model.training(cube, train_y)
+        return ensembler, model, time.time() - timer_start, None
+    except Exception as e:
+        return ensembler, None, None, str(e)
+
+def fit_shared_ensembler(ensembler):
+    return fit_ensembler((worker_state["engine"], ensembler,
+                          worker_state["cube"], worker_state["labels"]))
+
+def predict_ensembler(job):
+    engine, ensembler, cube = job
+    try:
+        timer_start = time.time()
+        pred = engine.models[ensembler].prediction(cube)
+        return ensembler, pred, time.time() - timer_start, None
+    except Exception as e:
+        return ensembler, None, None, str(e)
+
+def predict_shared_ensembler(ensembler):
+    cube = load_chunk(worker_state["path_chunk"])
+    return predict_ensembler((worker_state["engine"], ensembler, cube))
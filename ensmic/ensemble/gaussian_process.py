@@ -22,16 +22,39 @@
 #-----------------------------------------------------#
 # External libraries
 import numpy as np
-import pickle
+from sklearn import config_context
 from sklearn.gaussian_process import GaussianProcessClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
 # Internal libraries/scripts
 from ensmic.ensemble.abstract_elm import Abstract_Ensemble
+from ensmic.ensemble.prediction_cube import as_matrix, as_labels
+from ensmic.ensemble.kernel_approximation import create_feature_map, \
+                                               export_feature_map, apply_feature_map
+from ensmic.utils.softmax import softmax
+from ensmic.ensemble.model_format import store_model, load_model, is_model_file, load_pickle
 
 #-----------------------------------------------------#
 #                ELM: Gaussian Process                #
 #-----------------------------------------------------#
 """ Ensemble Learning approach via Gaussian Process.
 
+The exact Gaussian Process scales cubic with the number of val-ensemble samples.
+Therefore, an approximate mode can be selected which maps the data via an RBF
+kernel approximation into an explicit feature space and fits a multinomial
+logistic regression on top of it. Training then scales linear in the number
+of samples. The number of components controls the accuracy/time tradeoff.
+
+Fitted approximate models are exported into arrays (feature map, coefficients,
+intercepts) and stored via the array-based model container. The exact mode is
+still stored as pickle fallback, because sklearn's Laplace approximation
+(fitted kernels, cached latent function) has no stable array representation.
+
+Modes:
+    "exact"                 GaussianProcessClassifier (one-vs-rest).
+    "nystroem"              Nystroem inducing points + logistic regression.
+    "rff"                   Random Fourier features + logistic regression.
+
 Methods:
     __init__                Initialize Ensemble Learning Method.
     training:               Fit Ensemble Learning Method on validate-ensemble.
@@ -43,41 +66,111 @@ class ELM_GaussianProcess(Abstract_Ensemble):
     #---------------------------------------------#
     #                Initialization               #
     #---------------------------------------------#
-    def __init__(self, n_classes):
+    def __init__(self, n_classes, mode="exact", n_components=300, gamma=None):
+        # Verify and store approximation configuration
+        if mode not in ["exact", "nystroem", "rff"]:
+            raise ValueError("Unknown Gaussian Process mode: " + str(mode))
+        self.mode = mode
+        self.n_components = n_components
+        self.gamma = gamma
+        self.arrays = None
         # Initialize model
-        self.model = GaussianProcessClassifier(random_state=0,
-                                               multi_class="one_vs_rest")
+        if mode == "exact":
+            self.model = GaussianProcessClassifier(random_state=0,
+                                                   multi_class="one_vs_rest")
+        else : self.model = None
 
     #---------------------------------------------#
     #                  Training                   #
     #---------------------------------------------#
     def training(self, train_x, train_y):
-        # Transform Y array to be NumPy 1D array
-        train_y = np.ravel(train_y, order="C")
+        # Transform X to 2D feature matrix and Y to NumPy 1D array
+        train_x = as_matrix(train_x)
+        train_y = as_labels(train_y)
+        # Initialize approximate model based on training data
+        if self.mode != "exact" : self.model = self.create_approximation(train_x)
         # Fit model to val-ensemble
         self.model = self.model.fit(train_x, train_y)
+        # Export fitted approximate model into arrays
+        if self.mode != "exact" : self.arrays = self.export_approximation()
+
+    #---------------------------------------------#
+    #            Kernel Approximation             #
+    #---------------------------------------------#
+    def create_approximation(self, train_x):
+        # Create explicit RBF feature map based on training data
+        feature_map = create_feature_map(train_x, self.mode, self.n_components,
+                                         self.gamma)
+        # Return pipeline of feature map and linear classifier
+        return make_pipeline(feature_map,
+                             LogisticRegression(random_state=0, max_iter=1000))
+
+    def export_approximation(self):
+        # Export feature map and logistic regression of the fitted pipeline
+        feature_map, classifier = self.model[0], self.model[-1]
+        arrays = export_feature_map(feature_map)
+        arrays.update({"coef": classifier.coef_,
+                       "intercept": classifier.intercept_,
+                       "classes": classifier.classes_})
+        return arrays
+
+    def predict_approximation(self, matrix):
+        # Map data into feature space & compute logistic regression scores
+        features = apply_feature_map(self.arrays, matrix)
+        scores = features @ self.arrays["coef"].T + self.arrays["intercept"]
+        # Binary case: sigmoid of the single decision function
+        if scores.shape[1] == 1 : scores = np.hstack([np.zeros_like(scores), scores])
+        return softmax(scores, axis=-1)
 
     #---------------------------------------------#
     #                  Prediction                 #
     #---------------------------------------------#
     def prediction(self, data):
-        # Compute prediction probabilities via fitted model
-        pred = self.model.predict_proba(data)
+        # Compute prediction probabilities via exported arrays or fitted model
+        if self.mode != "exact" : return self.predict_approximation(as_matrix(data))
+        pred = self.model.predict_proba(as_matrix(data))
         # Return results as NumPy array
         return pred
 
+    #---------------------------------------------#
+    #         Low-Latency Array Prediction        #
+    #---------------------------------------------#
+    def predict_batch(self, data):
+        # Reshape raw array to (samples, architectures*classes)
+        matrix = np.asarray(data, dtype=np.float64).reshape(len(data), -1)
+        if self.mode != "exact" : return self.predict_approximation(matrix)
+        # Compute prediction probabilities without finiteness validation
+        with config_context(assume_finite=True):
+            return self.model.predict_proba(matrix)
+
     #---------------------------------------------#
     #              Dump Model to Disk             #
     #---------------------------------------------#
     def dump(self, path):
-        # Dump model to disk via pickle
-        with open(path, "wb") as pickle_writer:
-            pickle.dump(self.model, pickle_writer)
+        # Dump configuration and exported arrays (approximate) or pickled
+        # kernel model (exact) via model container
+        params = {"mode": self.mode, "n_components": self.n_components,
+                  "gamma": self.gamma}
+        if self.mode != "exact":
+            store_model(path, "ELM_GaussianProcess", params=params,
+                        arrays=self.arrays)
+        else:
+            store_model(path, "ELM_GaussianProcess", params=params,
+                        fallback=self.model)
 
     #---------------------------------------------#
     #             Load Model from Disk            #
     #---------------------------------------------#
     def load(self, path):
-        # Load model from disk via pickle
-        with open(path, "rb") as pickle_reader:
-            self.model = pickle.load(pickle_reader)
\ No newline at end of file
+        # Load configuration and arrays or pickled kernel model via container
+        if is_model_file(path):
+            params, arrays, self.model = load_model(path, "ELM_GaussianProcess")
+            self.arrays = arrays if arrays else None
+            self.mode = params["mode"]
+            self.n_components = params["n_components"]
+            self.gamma = params["gamma"]
+            # Export arrays of approximate models stored as pickle fallback
+            if self.mode != "exact" and self.arrays is None:
+                self.arrays = self.export_approximation()
+        # Support legacy dumps via pickle
+        else : self.model = load_pickle(path)
\ No newline at end of file
@@ -23,7 +23,7 @@
 import numpy as np
 # Internal libraries/scripts
 from ensmic.ensemble.abstract_elm import Abstract_Ensemble
-from ensmic.utils.metrics import safe_division
+from ensmic.ensemble.prediction_cube import as_cube
 
 #-----------------------------------------------------#
 #                  ELM: Global Argmax                 #
@@ -52,25 +52,39 @@ class ELM_GlobalArgmax(Abstract_Ensemble):
         # No training required for this method, therefore skip
         pass
 
+    #---------------------------------------------#
+    #              Incremental Update             #
+    #---------------------------------------------#
+    def update(self, train_x, train_y):
+        # No training required for this method, therefore skip
+        pass
+
     #---------------------------------------------#
     #                  Prediction                 #
     #---------------------------------------------#
     def prediction(self, data):
-        # Select global argmax for each sample
-        argmax_col = data.idxmax(axis=1)
-        argmax_prob = data.max(axis=1)
+        # Compute prediction on flat matrix (samples, architectures*classes)
+        return self.predict_batch(as_cube(data).flatten())
+
+    #---------------------------------------------#
+    #         Low-Latency Array Prediction        #
+    #---------------------------------------------#
+    def predict_batch(self, data):
+        # Reshape raw array to (samples, architectures*classes)
+        matrix = np.asarray(data, dtype=np.float64)
+        matrix = matrix.reshape(len(matrix), -1)
+        n_samples = matrix.shape[0]
+        # Select global argmax for each sample over architectures x classes
+        argmax_col = matrix.argmax(axis=1)
+        argmax_prob = matrix[np.arange(n_samples), argmax_col]
         # Transform column argmax into correct class integer
-        pred_class = [int(p[-1]) for p in argmax_col]
-        # Create empty probability array
-        pred_prob = np.zeros(shape=(len(pred_class), self.n_classes))
-        # Fill probability array
-        for i, c in enumerate(pred_class):
-            # Copy argmax probability
-            pred_prob[i][c] = argmax_prob[i]
-            # Compute equally distributed remaining probability for other classes
-            class_list = [(x) for x in range(0, self.n_classes) if x!=c]
-            prob_remaining = safe_division(1 - argmax_prob[i], self.n_classes-1)
-            for j in class_list: pred_prob[i][j] = prob_remaining
+        pred_class = argmax_col % self.n_classes
+        # Compute equally distributed remaining probability for other classes
+        prob_remaining = (1 - argmax_prob) / (self.n_classes - 1) \
+                         if self.n_classes > 1 else np.zeros_like(argmax_prob)
+        pred_prob = np.repeat(prob_remaining[:, None], self.n_classes, axis=1)
+        # Copy argmax probability
+        pred_prob[np.arange(n_samples), pred_class] = argmax_prob
         # Return predicted results
         return pred_prob
 
@@ -0,0 +1,182 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   REFERENCE PAPER:                  #
+#                        2004.                        #
+#    Ensemble selection from libraries of models.     #
+#  Caruana, Niculescu-Mizil, Crew and Ksikes. ICML.   #
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import numpy as np
+# Internal libraries/scripts
+from ensmic.ensemble.abstract_elm import Abstract_Ensemble
+from ensmic.ensemble.prediction_cube import as_cube, as_labels
+from ensmic.ensemble.model_format import store_model, load_model
+from ensmic.utils.metrics import compute_macro_f1
+
+#-----------------------------------------------------#
+#              ELM: Greedy Ensemble Selection         #
+#-----------------------------------------------------#
+""" Ensemble Learning approach via greedy Ensemble Selection.
+
+Starting from an empty ensemble, the architecture which improves the score of
+the averaged prediction the most is added in each iteration (forward selection
+with replacement). The ensemble of the best scoring iteration is returned, thus
+architectures which are never selected receive a weight of zero and do not have
+to be run at deployment.
+
+Metrics:
+    "f1"                    Macro F1 of the averaged prediction.
+    "logloss"               Negative log-loss of the averaged prediction.
+
+Methods:
+    __init__                Initialize Ensemble Learning Method.
+    training:               Fit Ensemble Learning Method on validate-ensemble.
+    prediction:             Utilize Ensemble Learning Method for test dataset.
+    selection:              Obtain selected architectures with their weights.
+    dump:                   Save (fitted) model to disk.
+    load:                   Load (fitted) model from disk.
+"""
+class ELM_GreedySelection(Abstract_Ensemble):
+    #---------------------------------------------#
+    #                Initialization               #
+    #---------------------------------------------#
+    def __init__(self, n_classes, n_iterations=25, metric="f1"):
+        # Verify metric
+        if metric not in ["f1", "logloss"]:
+            raise ValueError("Unknown selection metric: " + str(metric))
+        # Initialize class variables
+        self.n_classes = n_classes
+        self.n_iterations = n_iterations
+        self.metric = metric
+        self.architectures = None
+        self.weights = None
+        self.scores = None
+
+    #---------------------------------------------#
+    #                  Training                   #
+    #---------------------------------------------#
+    def training(self, train_x, train_y):
+        # Obtain prediction cube (samples, architectures, classes)
+        cube = as_cube(train_x)
+        train_y = as_labels(train_y)
+        # Run forward selection with replacement
+        counts, self.scores = greedy_selection(cube.data, train_y,
+                                               self.n_iterations, self.metric)
+        # Store architecture order and weights
+        self.architectures = list(cube.architectures)
+        self.weights = (counts / counts.sum()).tolist()
+
+    #---------------------------------------------#
+    #                  Prediction                 #
+    #---------------------------------------------#
+    def prediction(self, data):
+        # Obtain prediction cube (samples, architectures, classes)
+        cube = as_cube(data)
+        # Compute weighted mean of the selected architectures
+        return self.predict_batch(cube.data)
+
+    #---------------------------------------------#
+    #         Low-Latency Array Prediction        #
+    #---------------------------------------------#
+    def predict_batch(self, data):
+        # Reshape raw array to (samples, architectures, classes)
+        data = np.asarray(data, dtype=np.float64)
+        data = data.reshape(len(data), -1, self.n_classes)
+        # Only access architectures with a non-zero weight
+        weights = np.asarray(self.weights, dtype=np.float64)
+        selected = np.flatnonzero(weights)
+        pred = np.empty((data.shape[0], data.shape[2]), dtype=np.float64)
+        np.einsum("nac,a->nc", data[:, selected, :], weights[selected], out=pred)
+        # Return prediction
+        return pred
+
+    #---------------------------------------------#
+    #              Selected Ensemble              #
+    #---------------------------------------------#
+    def selection(self):
+        # Return selected architectures with their weights
+        return {arch: w for arch, w in zip(self.architectures, self.weights) \
+                if w > 0}
+
+    #---------------------------------------------#
+    #              Dump Model to Disk             #
+    #---------------------------------------------#
+    def dump(self, path):
+        # Dump selection to disk via model container
+        params = {"metric": self.metric, "n_iterations": self.n_iterations,
+                  "architectures": self.architectures}
+        arrays = {"weights": np.asarray(self.weights, dtype=np.float64),
+                  "scores": np.asarray(self.scores, dtype=np.float64)}
+        store_model(path, "ELM_GreedySelection", params=params, arrays=arrays)
+
+    #---------------------------------------------#
+    #             Load Model from Disk            #
+    #---------------------------------------------#
+    def load(self, path):
+        # Load selection from disk via model container
+        params, arrays, _ = load_model(path, "ELM_GreedySelection")
+        self.metric = params["metric"]
+        self.n_iterations = params["n_iterations"]
+        self.architectures = params["architectures"]
+        self.weights = arrays["weights"].tolist()
+        self.scores = arrays["scores"].tolist()
+
+#-----------------------------------------------------#
+#          Forward Selection with Replacement         #
+#-----------------------------------------------------#
+def greedy_selection(data, labels, n_iterations, metric="f1", eps=1e-12):
+    """ Greedy ensemble selection on a (samples, architectures, classes) array.
+
+    In each iteration, all candidate architectures are scored at once by adding
+    them to the running sum of the selected predictions.
+
+    Returns:
+        counts (numpy.ndarray):     Selection count of each architecture in the
+                                    best scoring iteration with shape (architectures,).
+        scores (list):              Score of each iteration.
+    """
+    n_samples, n_arch, n_classes = data.shape
+    labels = np.asarray(labels)
+    running_sum = np.zeros((n_samples, n_classes), dtype=np.float64)
+    counts = np.zeros(n_arch, dtype=np.int64)
+    best_counts, best_score, scores = None, -np.inf, []
+    for i in range(0, n_iterations):
+        # Score each candidate ensemble (samples, candidates, classes)
+        candidates = running_sum[:, None, :] + data
+        if metric == "f1":
+            cand_scores = compute_macro_f1(labels, np.argmax(candidates, axis=-1),
+                                           n_classes)
+        else:
+            prob_true = candidates[np.arange(n_samples), :, labels] / (i + 1)
+            cand_scores = np.mean(np.log(prob_true + eps), axis=0)
+        # Add best candidate (lowest index on ties) to the ensemble
+        best = int(np.argmax(cand_scores))
+        running_sum += data[:, best, :]
+        counts[best] += 1
+        scores.append(float(cand_scores[best]))
+        # Keep smallest ensemble of the best scoring iteration
+        if cand_scores[best] > best_score:
+            best_score = cand_scores[best]
+            best_counts = counts.copy()
+    # Return selection counts and score path
+    return best_counts, scores
@@ -0,0 +1,298 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import os
+import json
+import math
+import itertools
+import numpy as np
+from sklearn.model_selection import StratifiedKFold
+# Internal libraries/scripts
+from ensmic.ensemble import ensembler_dict
+from ensmic.ensemble.prediction_cube import as_cube, as_labels
+from ensmic.utils.metrics import compute_macro_f1
+from ensmic.utils.parallel import process_pool
+
+#-----------------------------------------------------#
+#                    Search Spaces                    #
+#-----------------------------------------------------#
+# Hyperparameter grids of the learning based Ensemble Learning Methods
+search_spaces = {
+    "DecisionTree": {"max_depth": [None, 4, 8, 16],
+                     "min_samples_leaf": [1, 5, 20],
+                     "criterion": ["gini", "entropy"]},
+    "k-NearestNeighbors": {"n_neighbors": [1, 3, 5, 9, 15, 25, 51]},
+    "SupportVectorMachine": {"C": [0.1, 1.0, 10.0, 100.0],
+                             "gamma": [None, 0.1, 1.0, 10.0]},
+    "LogisticRegression": {"C": [0.01, 0.1, 1.0, 10.0, 100.0]},
+}
+
+# Constraints of configurations on the training budget (number of samples)
+feasibility_rules = {
+    "k-NearestNeighbors": lambda params, resource: \
+                          params.get("n_neighbors", 5) <= resource,
+}
+
+#-----------------------------------------------------#
+#             Budgeted Hyperparameter Search          #
+#-----------------------------------------------------#
+""" Hyperparameter search via successive halving or Hyperband.
+
+All configurations of a rung are evaluated with a small training budget (number
+of training samples per fold) on cached cross-validation folds of the stacking
+matrix. Only the best 1/eta configurations are promoted to the next rung with
+an eta times larger budget, until the complete training folds are used. Thus,
+weak configurations are stopped early. Hyperband runs multiple successive
+halving brackets with different trade-offs between the number of configurations
+and the initial budget.
+
+The budget of a rung is a prefix of each training fold, which is reordered such
+that every prefix contains all classes in their fold proportions. Configurations
+which are infeasible for the budget of a rung (e.g. more neighbors than training
+samples) are not scored but deferred to the next rung.
+
+Scores are the macro F1 averaged over all folds. Evaluations are memoized and
+the configurations of a rung are evaluated in parallel on a forked process pool
+which shares the prediction cube and folds zero-copy.
+
+Methods:
+    __init__                Initialize search for an ensembler.
+    run:                    Run search and return best configuration.
+    successive_halving:     Run a single successive halving bracket.
+    evaluate:               Score a list of configurations with a budget.
+"""
+class Hyperparameter_Search():
+    #---------------------------------------------#
+    #                Initialization               #
+    #---------------------------------------------#
+    def __init__(self, ensembler, n_classes, space=None, base_params=None,
+                 mode="hyperband", eta=3, min_resource=None, n_workers=1,
+                 seed=0):
+        # Verify search mode
+        if mode not in ["halving", "hyperband"]:
+            raise ValueError("Unknown search mode: " + str(mode))
+        # Store class variables
+        self.ensembler = ensembler
+        self.n_classes = n_classes
+        if space is None : space = search_spaces[ensembler]
+        self.configs = [dict(zip(space.keys(), values)) \
+                        for values in itertools.product(*space.values())]
+        if base_params is None : base_params = {}
+        self.base_params = base_params
+        self.mode = mode
+        self.eta = eta
+        self.min_resource = min_resource
+        self.n_workers = n_workers
+        self.rng = np.random.default_rng(seed)
+        # Initialize cache of evaluated (configuration, budget) pairs
+        self.history = {}
+
+    #---------------------------------------------#
+    #                  Run Search                 #
+    #---------------------------------------------#
+    def run(self, cube, labels, folds):
+        cube = as_cube(cube)
+        labels = as_labels(labels)
+        # Reorder training folds so that each budgeted prefix is stratified
+        folds = [(stratified_order(train, labels), test) for train, test in folds]
+        # Budget is bounded by the smallest training fold
+        max_resource = min(len(train) for train, _ in folds)
+        min_resource = self.min_resource
+        if min_resource is None:
+            min_resource = max(10 * self.n_classes, max_resource // 27)
+        min_resource = min(min_resource, max_resource)
+        s_max = int(math.floor(math.log(max_resource / min_resource, self.eta) \
+                               + 1e-9))
+        # Fork process pool sharing cube, labels and folds with the workers
+        pool = None
+        if self.n_workers > 1:
+            pool = process_pool(self.n_workers, initializer=share_state,
+                                initargs=(self, cube, labels, folds))
+        try:
+            share_state(self, cube, labels, folds)
+            # Successive halving: all configurations start with minimal budget
+            if self.mode == "halving":
+                brackets = [(self.configs, s_max)]
+            # Hyperband: sample fewer configurations for larger initial budgets
+            else:
+                brackets = []
+                for s in range(s_max, -1, -1):
+                    n = int(math.ceil((s_max + 1) / (s + 1) * self.eta**s))
+                    n = min(n, len(self.configs))
+                    index = self.rng.choice(len(self.configs), n, replace=False)
+                    brackets.append(([self.configs[i] for i in index], s))
+            for configs, s in brackets:
+                self.successive_halving(configs, s, max_resource, pool)
+        finally:
+            if pool is not None : pool.terminate()
+        # Select best configuration evaluated with the complete budget
+        final = [(score, key) for (key, resource), score in self.history.items() \
+                 if resource == max_resource]
+        if len(final) == 0:
+            raise ValueError("No configuration is feasible for the training " + \
+                             "budget of " + str(max_resource) + " samples")
+        score, key = max(final, key=lambda x: x[0])
+        # Return best configuration with its score
+        return {"params": dict(json.loads(key)), "score": score,
+                "evaluations": len(self.history)}
+
+    #---------------------------------------------#
+    #              Successive Halving             #
+    #---------------------------------------------#
+    def successive_halving(self, configs, s, max_resource, pool):
+        for i in range(0, s + 1):
+            # Budget of current rung (complete training folds in last rung)
+            resource = int(max_resource * self.eta**(i - s))
+            # Defer configurations which are infeasible for the budget
+            feasible = [c for c in configs if self.is_feasible(c, resource)]
+            deferred = [c for c in configs if not self.is_feasible(c, resource)]
+            scores = self.evaluate(feasible, resource, pool)
+            # Promote best 1/eta feasible configurations to the next rung
+            n_keep = max(1, len(feasible) // self.eta)
+            order = np.argsort(-np.asarray(scores), kind="stable")
+            configs = [feasible[j] for j in order[:n_keep]] + deferred
+
+    def is_feasible(self, config, resource):
+        # Check constraints of the ensembler on the training budget
+        if self.ensembler not in feasibility_rules : return True
+        params = dict(self.base_params, **config)
+        return feasibility_rules[self.ensembler](params, resource)
+
+    #---------------------------------------------#
+    #           Evaluation of Configurations      #
+    #---------------------------------------------#
+    def evaluate(self, configs, resource, pool):
+        # Identify configurations which have not been evaluated yet
+        keys = [json.dumps(config, sort_keys=True) for config in configs]
+        jobs = list({key: (key, resource) for key in keys \
+                     if (key, resource) not in self.history}.values())
+        # Evaluate configurations on all folds (in parallel)
+        if pool is None : results = map(evaluate_config, jobs)
+        else : results = pool.imap_unordered(evaluate_config, jobs)
+        for key, score in results:
+            self.history[(key, resource)] = score
+        # Return scores in configuration order
+        return [self.history[(key, resource)] for key in keys]
+
+#-----------------------------------------------------#
+#                 Cross-validation Folds              #
+#-----------------------------------------------------#
+def create_folds(labels, n_folds=3, seed=0):
+    """ Stratified folds with shuffled training indices.
+
+    Training indices are shuffled once, thus a prefix of each training fold is
+    a random subsample which is used as reduced budget by the search.
+    """
+    labels = as_labels(labels)
+    rng = np.random.default_rng(seed)
+    cv = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    return [(rng.permutation(train), test) \
+            for train, test in cv.split(np.zeros(len(labels)), labels)]
+
+def stratified_order(train, labels):
+    """ Reorder training indices such that every prefix is stratified.
+
+    The samples of each class are spread evenly (keeping their order), starting
+    with one sample of each class. Thus, a prefix with at least as many samples
+    as classes contains every class of the fold.
+    """
+    classes, inverse, counts = np.unique(labels[train], return_inverse=True,
+                                         return_counts=True)
+    # Rank of each sample within its class
+    rank = np.empty(len(train), dtype=np.float64)
+    for c in range(0, len(classes)):
+        rank[inverse == c] = np.arange(counts[c])
+    # Sort by relative position within class (stable for ties)
+    return train[np.argsort(rank / counts[inverse], kind="stable")]
+
+def store_folds(path, folds):
+    # Store fold indices as NumPy archive
+    arrays = {}
+    for k, (train, test) in enumerate(folds):
+        arrays["train_" + str(k)] = train
+        arrays["test_" + str(k)] = test
+    np.savez(path, **arrays)
+
+def load_folds(path, n_samples, n_folds):
+    # Load cached folds if they match the dataset (otherwise return None)
+    if not os.path.exists(path) : return None
+    with np.load(path) as archive:
+        if len(archive.files) != 2 * n_folds : return None
+        folds = [(archive["train_" + str(k)], archive["test_" + str(k)]) \
+                 for k in range(0, n_folds)]
+    if sum(len(test) for _, test in folds) != n_samples : return None
+    return folds
+
+#-----------------------------------------------------#
+#             Persisted Best Configurations           #
+#-----------------------------------------------------#
+def load_hyperparameters(path):
+    # Load best configuration of each ensembler (empty if not searched yet)
+    if not os.path.exists(path) : return {}
+    with open(path, "r") as file:
+        results = json.load(file)
+    return {ensembler: results[ensembler]["params"] for ensembler in results}
+
+def store_hyperparameters(path, ensembler, result):
+    # Merge search result of ensembler into JSON file (atomic replacement)
+    results = {}
+    if os.path.exists(path):
+        with open(path, "r") as file:
+            results = json.load(file)
+    results[ensembler] = result
+    with open(path + ".tmp", "w") as file:
+        json.dump(results, file, indent=2)
+    os.replace(path + ".tmp", path)
+
+#-----------------------------------------------------#
+#                 Search Job Functions                #
+#-----------------------------------------------------#
+# State shared with forked workers (search, cube, labels, folds)
+worker_state = {}
+
+def share_state(search, cube, labels, folds):
+    worker_state["search"] = search
+    worker_state["cube"] = cube
+    worker_state["labels"] = labels
+    worker_state["folds"] = folds
+
+def evaluate_config(job):
+    key, resource = job
+    search = worker_state["search"]
+    cube, labels = worker_state["cube"], worker_state["labels"]
+    params = dict(search.base_params, **json.loads(key))
+    scores = []
+    try:
+        for train, test in worker_state["folds"]:
+            # Fit on budgeted prefix of training fold and score held-out fold
+            train = train[:resource]
+            model = ensembler_dict[search.ensembler](n_classes=search.n_classes,
+                                                     **params)
+            model.training(cube.subset(train), labels[train])
+            pred = np.argmax(model.prediction(cube.subset(test)), axis=-1)
+            scores.append(compute_macro_f1(labels[test], pred,
+                                           search.n_classes)[0])
+    except Exception as e:
+        print(search.ensembler, "-", "Configuration failed:", key, str(e))
+        return key, -np.inf
+    return key, float(np.mean(scores))
@@ -21,16 +21,21 @@
 #-----------------------------------------------------#
 # External libraries
 import numpy as np
-import pickle
-from sklearn.neighbors import KNeighborsClassifier
 # Internal libraries/scripts
 from ensmic.ensemble.abstract_elm import Abstract_Ensemble
+from ensmic.ensemble.prediction_cube import as_matrix, as_labels
+from ensmic.ensemble.knn_index import kNN_Index
+from ensmic.ensemble.model_format import store_model, load_model, is_model_file, load_pickle
 
 #-----------------------------------------------------#
 #               ELM: k-Nearest Neighbors              #
 #-----------------------------------------------------#
 """ Ensemble Learning approach via k-Nearest Neighbors.
 
+The neighbor search is performed via a persistent kNN_Index, which is stored in
+the memory-mappable model container format. Besides the exact search, an approximate
+inverted file search (mode="ivf") can be selected for large val-ensemble sets.
+
 Methods:
     __init__                Initialize Ensemble Learning Method.
     training:               Fit Ensemble Learning Method on validate-ensemble.
@@ -42,40 +47,81 @@ class ELM_kNearestNeighbors(Abstract_Ensemble):
     #---------------------------------------------#
     #                Initialization               #
     #---------------------------------------------#
-    def __init__(self, n_classes):
-        # Initialize model
-        self.model = KNeighborsClassifier(n_neighbors=5)
+    def __init__(self, n_classes, n_neighbors=5, mode="exact", n_lists=None,
+                 n_probe=8, n_jobs=1):
+        # Store class variables
+        self.n_classes = n_classes
+        self.n_neighbors = n_neighbors
+        # Initialize index
+        self.model = kNN_Index(mode=mode, n_lists=n_lists, n_probe=n_probe,
+                               n_jobs=n_jobs)
 
     #---------------------------------------------#
     #                  Training                   #
     #---------------------------------------------#
     def training(self, train_x, train_y):
-        # Transform Y array to be NumPy 1D array
-        train_y = np.ravel(train_y, order="C")
-        # Fit model to val-ensemble
-        self.model = self.model.fit(train_x, train_y)
+        # Transform X to 2D feature matrix and Y to NumPy 1D array
+        train_x = as_matrix(train_x)
+        train_y = as_labels(train_y)
+        # Build index on val-ensemble
+        self.model = self.model.build(train_x, train_y)
+
+    #---------------------------------------------#
+    #              Incremental Update             #
+    #---------------------------------------------#
+    def update(self, train_x, train_y):
+        # Transform X to 2D feature matrix and Y to NumPy 1D array
+        train_x = as_matrix(train_x)
+        train_y = as_labels(train_y)
+        # Append new samples to index
+        self.model = self.model.add(train_x, train_y)
 
     #---------------------------------------------#
     #                  Prediction                 #
     #---------------------------------------------#
     def prediction(self, data):
-        # Compute prediction probabilities via fitted model
-        pred = self.model.predict_proba(data)
-        # Return results as NumPy array
-        return pred
+        # Compute prediction probabilities via neighbor votes
+        return self.predict_batch(as_matrix(data))
+
+    #---------------------------------------------#
+    #         Low-Latency Array Prediction        #
+    #---------------------------------------------#
+    def predict_batch(self, data):
+        # Reshape raw array to (samples, architectures*classes)
+        matrix = np.asarray(data, dtype=np.float64).reshape(len(data), -1)
+        # Identify nearest neighbors and their labels
+        neighbors = self.model.query(matrix, self.n_neighbors)
+        valid = neighbors >= 0
+        labels = np.asarray(self.model.labels)[np.where(valid, neighbors, 0)]
+        # Count uniform neighbor votes for each class
+        rows = np.arange(len(matrix))[:, None] * self.n_classes
+        counts = np.bincount((rows + labels).ravel(), weights=valid.ravel(),
+                             minlength=len(matrix) * self.n_classes)
+        counts = counts.reshape(len(matrix), self.n_classes)
+        # Return neighbor class frequencies as probabilities
+        return counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
 
     #---------------------------------------------#
     #              Dump Model to Disk             #
     #---------------------------------------------#
     def dump(self, path):
-        # Dump model to disk via pickle
-        with open(path, "wb") as pickle_writer:
-            pickle.dump(self.model, pickle_writer)
+        # Dump index to disk via model container
+        params, arrays = self.model.export()
+        params["n_neighbors"] = self.n_neighbors
+        store_model(path, "ELM_kNearestNeighbors", params=params, arrays=arrays)
 
     #---------------------------------------------#
     #             Load Model from Disk            #
     #---------------------------------------------#
     def load(self, path):
-        # Load model from disk via pickle
-        with open(path, "rb") as pickle_reader:
-            self.model = pickle.load(pickle_reader)
+        # Load memory-mapped index from disk via model container
+        if is_model_file(path):
+            params, arrays, _ = load_model(path, "ELM_kNearestNeighbors")
+            self.n_neighbors = params["n_neighbors"]
+            self.model = kNN_Index.from_export(params, arrays,
+                                               n_jobs=self.model.n_jobs)
+        # Convert a legacy pickled sklearn model into an index
+        else:
+            model = load_pickle(path)
+            self.n_neighbors = model.n_neighbors
+            self.model = self.model.build(model._fit_X, model.classes_[model._y])
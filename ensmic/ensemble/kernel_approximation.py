@@ -0,0 +1,89 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import numpy as np
+from sklearn.kernel_approximation import Nystroem, RBFSampler
+
+#-----------------------------------------------------#
+#           RBF Kernel Approximation Factory          #
+#-----------------------------------------------------#
+""" Create an explicit RBF feature map for kernel-based ensemblers.
+
+Mapping the val-ensemble into an explicit feature space allows fitting a linear
+model instead of a kernel machine. Training and inference then scale linear
+with the number of samples.
+
+Modes:
+    "nystroem"              Nystroem inducing points (data-dependent).
+    "rff"                   Random Fourier features (data-independent).
+
+If gamma is None, the bandwidth is estimated analog to sklearn's gamma="scale"
+via 1 / (n_features * X.var()).
+
+A fitted feature map can be exported into plain arrays (export_feature_map) and
+applied without sklearn objects (apply_feature_map). This allows storing the
+approximate models in the array-based model container.
+"""
+def create_feature_map(train_x, mode, n_components, gamma=None):
+    # Use RBF bandwidth heuristic analog to gamma="scale" if not provided
+    if gamma is None:
+        variance = train_x.var()
+        gamma = 1.0 / (train_x.shape[1] * variance) if variance > 0 else 1.0
+    # Create explicit feature map via kernel approximation
+    if mode == "nystroem":
+        # Limit inducing points to the number of available samples
+        n_components = min(n_components, len(train_x))
+        return Nystroem(kernel="rbf", gamma=gamma, n_components=n_components,
+                        random_state=0)
+    elif mode == "rff":
+        return RBFSampler(gamma=gamma, n_components=n_components,
+                          random_state=0)
+    else : raise ValueError("Unknown kernel approximation mode: " + str(mode))
+
+#-----------------------------------------------------#
+#          Array Export of fitted Feature Maps        #
+#-----------------------------------------------------#
+def export_feature_map(feature_map):
+    # Export Nystroem inducing points, normalization and bandwidth
+    if isinstance(feature_map, Nystroem):
+        return {"map_components": feature_map.components_,
+                "map_normalization": feature_map.normalization_,
+                "map_gamma": np.array([feature_map.gamma], dtype=np.float64)}
+    # Export random Fourier weights and offsets
+    return {"map_weights": feature_map.random_weights_,
+            "map_offset": feature_map.random_offset_}
+
+def apply_feature_map(arrays, matrix):
+    # Nystroem: RBF kernel to inducing points projected by normalization
+    if "map_components" in arrays:
+        components = arrays["map_components"]
+        distance = np.sum(matrix**2, axis=1)[:, None] - 2 * matrix @ components.T + \
+                   np.sum(components**2, axis=1)[None, :]
+        np.maximum(distance, 0, out=distance)
+        kernel = np.exp(-arrays["map_gamma"][0] * distance)
+        return kernel @ arrays["map_normalization"].T
+    # Random Fourier features: sqrt(2/n) * cos(X W + b)
+    projection = matrix @ arrays["map_weights"] + arrays["map_offset"]
+    np.cos(projection, out=projection)
+    projection *= np.sqrt(2.0 / projection.shape[1])
+    return projection
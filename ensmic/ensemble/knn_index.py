@@ -0,0 +1,269 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.cluster import KMeans
+# Internal libraries/scripts
+from ensmic.ensemble.model_format import store_model, load_model
+
+#-----------------------------------------------------#
+#              Nearest Neighbor Search Index          #
+#-----------------------------------------------------#
+""" Persistent nearest neighbor index for batched queries.
+
+The index stores the training matrix, labels and squared norms in the model
+container format, whose arrays are memory-mapped on loading. Thus, loading does not rebuild
+any search structure and is near-instant.
+
+Queries are processed in chunks (bounding the size of the distance matrix) and
+can be distributed on multiple threads, since the matrix products release the GIL.
+
+Modes:
+    "exact"                 Brute-force search over the complete matrix.
+    "ivf"                   Inverted file: The matrix is partitioned via k-means
+                            into n_lists clusters and a query only searches the
+                            n_probe clusters with the closest centroids.
+                            The recall of the approximate search can be measured
+                            against the exact search via recall().
+
+Methods:
+    __init__                Initialize index configuration.
+    build:                  Build index from training matrix and labels.
+    add:                    Append samples to the index.
+    query:                  Obtain indices of k nearest neighbors for a query batch.
+    recall:                 Measure recall@k of the approximate against the exact search.
+    export:                 Obtain index configuration and arrays.
+    from_export:            Create index from configuration and arrays.
+    store:                  Store index into the model container format.
+    load:                   Load index from disk (memory-mapped).
+"""
+class kNN_Index():
+    #---------------------------------------------#
+    #                Initialization               #
+    #---------------------------------------------#
+    def __init__(self, mode="exact", n_lists=None, n_probe=8, n_jobs=1,
+                 chunk_size=1024):
+        # Verify and store index configuration
+        if mode not in ["exact", "ivf"]:
+            raise ValueError("Unknown kNN index mode: " + str(mode))
+        self.mode = mode
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+        # Initialize index structures
+        self.matrix = None
+        self.labels = None
+        self.norms = None
+        self.centroids = None
+        self.offsets = None
+
+    #---------------------------------------------#
+    #                 Build Index                 #
+    #---------------------------------------------#
+    def build(self, matrix, labels):
+        matrix = np.ascontiguousarray(matrix, dtype=np.float64)
+        labels = np.asarray(labels, dtype=np.int64)
+        # Partition matrix into inverted lists for approximate search
+        if self.mode == "ivf":
+            if self.n_lists is None:
+                self.n_lists = max(1, int(np.sqrt(len(matrix))))
+            self.n_lists = min(self.n_lists, len(matrix))
+            kmeans = KMeans(n_clusters=self.n_lists, n_init=1, max_iter=20,
+                            random_state=0).fit(matrix)
+            # Sort samples by their list and store list boundaries
+            order = np.argsort(kmeans.labels_, kind="stable")
+            matrix = matrix[order]
+            labels = labels[order]
+            counts = np.bincount(kmeans.labels_, minlength=self.n_lists)
+            self.offsets = np.concatenate(([0], np.cumsum(counts)))
+            self.centroids = kmeans.cluster_centers_
+        # Store matrix, labels and squared norms
+        self.matrix = matrix
+        self.labels = labels
+        self.norms = np.einsum("ij,ij->i", matrix, matrix)
+        # Return fitted index
+        return self
+
+    #---------------------------------------------#
+    #              Append to Index                #
+    #---------------------------------------------#
+    def add(self, matrix, labels):
+        """ Append samples without rebuilding the search structure.
+
+        In the approximate mode, new samples are assigned to the closest
+        existing centroid (centroids are not refitted).
+        """
+        matrix = np.ascontiguousarray(matrix, dtype=np.float64)
+        labels = np.asarray(labels, dtype=np.int64)
+        norms = np.einsum("ij,ij->i", matrix, matrix)
+        matrix = np.concatenate((self.matrix, matrix), axis=0)
+        labels = np.concatenate((self.labels, labels))
+        norms = np.concatenate((self.norms, norms))
+        # Insert new samples into their closest inverted lists
+        if self.mode == "ivf":
+            lists_old = np.repeat(np.arange(self.n_lists), np.diff(self.offsets))
+            dist = self.distances(matrix[len(lists_old):], self.centroids,
+                                  np.einsum("ij,ij->i", self.centroids,
+                                            self.centroids))
+            lists = np.concatenate((lists_old, np.argmin(dist, axis=1)))
+            order = np.argsort(lists, kind="stable")
+            matrix, labels, norms = matrix[order], labels[order], norms[order]
+            counts = np.bincount(lists, minlength=self.n_lists)
+            self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        # Store extended matrix, labels and squared norms
+        self.matrix = matrix
+        self.labels = labels
+        self.norms = norms
+        # Return extended index
+        return self
+
+    #---------------------------------------------#
+    #                    Query                    #
+    #---------------------------------------------#
+    def query(self, data, k, exact=False):
+        """ Obtain indices of the k nearest neighbors with shape (N, k).
+
+        Neighbors are sorted by distance. In the approximate mode, queries with
+        less than k candidates are padded with the index -1.
+        """
+        data = np.ascontiguousarray(data, dtype=np.float64)
+        search = self.search_exact if exact or self.mode == "exact" \
+                 else self.search_ivf
+        # Split queries into chunks and search them (in parallel)
+        chunks = [data[i:i+self.chunk_size] \
+                  for i in range(0, len(data), self.chunk_size)]
+        if self.n_jobs == 1 or len(chunks) <= 1:
+            results = [search(chunk, k) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+                results = list(executor.map(lambda c: search(c, k), chunks))
+        # Return neighbor indices
+        if len(results) == 0 : return np.zeros((0, k), dtype=np.int64)
+        return np.concatenate(results, axis=0)
+
+    def search_exact(self, data, k):
+        # Compute squared euclidean distances to all training samples
+        dist = self.distances(data, self.matrix, self.norms)
+        # Identify and sort k nearest neighbors
+        return self.select(dist, np.arange(len(self.matrix)), k)
+
+    def search_ivf(self, data, k):
+        # Identify closest lists for each query
+        n_probe = min(self.n_probe, self.n_lists)
+        dist_centroids = self.distances(data, self.centroids,
+                                        np.einsum("ij,ij->i", self.centroids,
+                                                  self.centroids))
+        probes = np.argpartition(dist_centroids, n_probe-1, axis=1)[:, :n_probe]
+        # Initialize best candidates
+        best_dist = np.full((len(data), k), np.inf)
+        best_idx = np.full((len(data), k), -1, dtype=np.int64)
+        # Search each list for all queries probing it
+        for l in np.unique(probes):
+            queries = np.nonzero((probes == l).any(axis=1))[0]
+            start, end = self.offsets[l], self.offsets[l+1]
+            if start == end : continue
+            dist = self.distances(data[queries], self.matrix[start:end],
+                                  self.norms[start:end])
+            # Merge candidates of the list with current best candidates
+            dist = np.concatenate((best_dist[queries], dist), axis=1)
+            candidates = np.concatenate((best_idx[queries],
+                            np.broadcast_to(np.arange(start, end),
+                                            (len(queries), end-start))), axis=1)
+            top = np.argpartition(dist, k-1, axis=1)[:, :k]
+            best_dist[queries] = np.take_along_axis(dist, top, axis=1)
+            best_idx[queries] = np.take_along_axis(candidates, top, axis=1)
+        # Sort k nearest neighbors by distance
+        order = np.argsort(best_dist, axis=1, kind="stable")
+        return np.take_along_axis(best_idx, order, axis=1)
+
+    @staticmethod
+    def distances(data, matrix, norms):
+        # Squared euclidean distance via ||x||^2 - 2xy + ||y||^2
+        dist = data @ matrix.T
+        dist *= -2
+        dist += norms[None, :]
+        dist += np.einsum("ij,ij->i", data, data)[:, None]
+        return dist
+
+    @staticmethod
+    def select(dist, index, k):
+        # Obtain k smallest distances per row sorted by distance
+        k = min(k, dist.shape[1])
+        top = np.argpartition(dist, k-1, axis=1)[:, :k] \
+              if dist.shape[1] > k else \
+              np.broadcast_to(np.arange(k), (len(dist), k))
+        order = np.argsort(np.take_along_axis(dist, top, axis=1), axis=1,
+                           kind="stable")
+        return index[np.take_along_axis(top, order, axis=1)]
+
+    #---------------------------------------------#
+    #               Measure Recall                #
+    #---------------------------------------------#
+    def recall(self, data, k):
+        """ Fraction of exact k nearest neighbors found by the index search. """
+        approx = self.query(data, k)
+        exact = self.query(data, k, exact=True)
+        hits = sum(len(np.intersect1d(a[a >= 0], e)) for a, e in zip(approx, exact))
+        return hits / exact.size if exact.size > 0 else 1.0
+
+    #---------------------------------------------#
+    #            Export & Import Index            #
+    #---------------------------------------------#
+    def export(self):
+        # Gather index configuration and arrays
+        params = {"mode": self.mode, "n_lists": self.n_lists,
+                  "n_probe": self.n_probe}
+        arrays = {"matrix": self.matrix, "labels": self.labels,
+                  "norms": self.norms}
+        if self.mode == "ivf":
+            arrays["centroids"] = self.centroids
+            arrays["offsets"] = self.offsets
+        return params, arrays
+
+    @classmethod
+    def from_export(cls, params, arrays, n_jobs=1):
+        # Create index with configuration and assign arrays
+        index = cls(mode=params["mode"], n_lists=params["n_lists"],
+                    n_probe=params["n_probe"], n_jobs=n_jobs)
+        for member in ["matrix", "labels", "norms", "centroids", "offsets"]:
+            if member in arrays : setattr(index, member, arrays[member])
+        return index
+
+    #---------------------------------------------#
+    #              Store Index to Disk            #
+    #---------------------------------------------#
+    def store(self, path):
+        # Store index into the model container format
+        params, arrays = self.export()
+        store_model(path, "kNN_Index", params=params, arrays=arrays)
+
+    #---------------------------------------------#
+    #             Load Index from Disk            #
+    #---------------------------------------------#
+    @classmethod
+    def load(cls, path, mmap_mode="r", n_jobs=1):
+        # Load (memory-mapped) index from the model container format
+        params, arrays, _ = load_model(path, "kNN_Index", mmap_mode=mmap_mode)
+        return cls.from_export(params, arrays, n_jobs=n_jobs)
@@ -22,16 +22,29 @@
 #-----------------------------------------------------#
 # External libraries
 import numpy as np
-import pickle
+from scipy.optimize import minimize
 from sklearn.linear_model import LogisticRegression
 # Internal libraries/scripts
 from ensmic.ensemble.abstract_elm import Abstract_Ensemble
+from ensmic.ensemble.prediction_cube import as_matrix, as_labels
+from ensmic.utils.softmax import softmax
+from ensmic.ensemble.model_format import store_model, load_model, is_model_file, load_pickle
 
 #-----------------------------------------------------#
 #               ELM: Logistic Regression              #
 #-----------------------------------------------------#
 """ Ensemble Learning approach via Logistic Regression.
 
+Incremental updates keep a quadratic approximation (gradient & Hessian) of the
+log-loss of all samples seen so far. For new samples, this approximation plus
+the exact log-loss of the new samples is minimized via warm-started L-BFGS.
+Afterwards, the Hessian of the new samples is added to the approximation. Thus,
+an update costs O(new samples) and closely approximates a complete refit.
+The approximation of the training samples is computed lazily on the first
+update(), dump() or pickling of the model, thus plain fits without persistence
+do not pay for the (k*f)^2 Hessian. Until then, only a reference to the
+training data is kept.
+
 Methods:
     __init__                Initialize Ensemble Learning Method.
     training:               Fit Ensemble Learning Method on validate-ensemble.
@@ -43,42 +56,177 @@ class ELM_LogisticRegression(Abstract_Ensemble):
     #---------------------------------------------#
     #                Initialization               #
     #---------------------------------------------#
-    def __init__(self, n_classes):
+    def __init__(self, n_classes, C=1.0):
         # Initialize model
-        self.model = LogisticRegression(random_state=0,
+        self.model = LogisticRegression(random_state=0, C=C,
                                         solver="newton-cg",
                                         multi_class="multinomial")
+        self.gradient = None
+        self.hessian = None
+        self.train_data = None
 
     #---------------------------------------------#
     #                  Training                   #
     #---------------------------------------------#
     def training(self, train_x, train_y):
-        # Transform Y array to be NumPy 1D array
-        train_y = np.ravel(train_y, order="C")
+        # Transform X to 2D feature matrix and Y to NumPy 1D array
+        train_x = as_matrix(train_x)
+        train_y = as_labels(train_y)
         # Fit model to val-ensemble
         self.model = self.model.fit(train_x, train_y)
+        # Keep training data for a lazy log-loss approximation on first update
+        self.gradient, self.hessian = None, None
+        self.train_data = (train_x, train_y)
+
+    def __getstate__(self):
+        # Transfer the log-loss approximation instead of the training data
+        self.approximate()
+        return self.__dict__.copy()
+
+    #---------------------------------------------#
+    #              Incremental Update             #
+    #---------------------------------------------#
+    def update(self, train_x, train_y):
+        # Transform X to 2D feature matrix and Y to NumPy 1D array
+        train_x = as_matrix(train_x)
+        train_y = as_labels(train_y)
+        # Compute quadratic approximation of the training log-loss on demand
+        self.approximate()
+        if self.hessian is None:
+            raise ValueError("Incremental update requires the Hessian of a training")
+        # Objective: L2 penalty + approximated previous loss + new log-loss
+        theta_ref = self.get_parameters()
+        penalty = self.penalty_mask() / self.model.C
+        def objective(theta):
+            delta = theta - theta_ref
+            h_delta = self.hessian @ delta
+            loss, grad, _ = self.loss_terms(train_x, train_y, theta)
+            loss += 0.5 * np.sum(penalty * theta**2) + \
+                    self.gradient @ delta + 0.5 * delta @ h_delta
+            grad += penalty * theta + self.gradient + h_delta
+            return loss, grad
+        # Run warm-started optimization and store coefficients
+        res = minimize(objective, theta_ref, jac=True, method="L-BFGS-B")
+        self.set_parameters(res.x)
+        # Extend quadratic approximation by the new samples
+        _, grad_new, probs = self.loss_terms(train_x, train_y, res.x)
+        self.gradient = self.gradient + self.hessian @ (res.x - theta_ref) + \
+                        grad_new
+        self.hessian = self.hessian + self.loss_hessian(train_x, probs)
+
+    #---------------------------------------------#
+    #            Log-Loss Approximation           #
+    #---------------------------------------------#
+    def approximate(self):
+        # Compute gradient & Hessian of the pending training log-loss once
+        if self.hessian is not None or self.train_data is None : return
+        theta = self.get_parameters()
+        _, self.gradient, probs = self.loss_terms(*self.train_data, theta)
+        self.hessian = self.loss_hessian(self.train_data[0], probs)
+        self.train_data = None
+
+    def get_parameters(self):
+        # Flatten coefficients and intercepts into (k, features+1)
+        return np.hstack([self.model.coef_,
+                          np.reshape(self.model.intercept_, (-1, 1))]).ravel()
+
+    def set_parameters(self, theta):
+        theta = theta.reshape(len(self.model.intercept_), -1)
+        self.model.coef_ = np.ascontiguousarray(theta[:, :-1])
+        self.model.intercept_ = np.ascontiguousarray(theta[:, -1])
+
+    def penalty_mask(self):
+        # L2 penalty only on coefficients (not on the intercepts)
+        mask = np.ones((len(self.model.intercept_), self.model.coef_.shape[1] + 1))
+        mask[:, -1] = 0.0
+        return mask.ravel()
+
+    def loss_terms(self, train_x, train_y, theta):
+        # Compute decision function for samples with intercept column
+        x1 = np.hstack([train_x, np.ones((len(train_x), 1))])
+        weights = theta.reshape(len(self.model.intercept_), -1)
+        scores = x1 @ weights.T
+        if not np.isin(train_y, self.model.classes_).all():
+            raise ValueError("Samples contain classes unseen in training")
+        y_index = np.searchsorted(self.model.classes_, train_y)
+        # Binary case: scores d represent softmax([-d, d])
+        if weights.shape[0] == 1:
+            probs = softmax(np.hstack([-scores, scores]), axis=-1)
+            grad_scores = 2 * (probs[:, 1:] - (y_index == 1)[:, None])
+        else:
+            probs = softmax(scores, axis=-1)
+            grad_scores = probs.copy()
+            grad_scores[np.arange(len(y_index)), y_index] -= 1
+        # Compute summed log-loss and its gradient
+        loss = -np.sum(np.log(probs[np.arange(len(y_index)), y_index] + 1e-300))
+        grad = (grad_scores.T @ x1).ravel()
+        return loss, grad, probs
+
+    def loss_hessian(self, train_x, probs):
+        # Compute summed Hessian of the log-loss via blockwise products
+        x1 = np.hstack([train_x, np.ones((len(train_x), 1))])
+        k, f = len(self.model.intercept_), x1.shape[1]
+        hessian = np.empty((k, f, k, f), dtype=np.float64)
+        for i in range(0, k):
+            for j in range(i, k):
+                # Curvature of sample scores (computed per block, not as N*k*k)
+                if k == 1 : curvature = 4 * probs[:, 1] * probs[:, 0]
+                elif i == j : curvature = probs[:, i] * (1 - probs[:, i])
+                else : curvature = -probs[:, i] * probs[:, j]
+                block = x1.T @ (curvature[:, None] * x1)
+                hessian[i, :, j, :] = block
+                hessian[j, :, i, :] = block.T
+        return hessian.reshape(k*f, k*f)
 
     #---------------------------------------------#
     #                  Prediction                 #
     #---------------------------------------------#
     def prediction(self, data):
         # Compute prediction probabilities via fitted model
-        pred = self.model.predict_proba(data)
+        pred = self.model.predict_proba(as_matrix(data))
         # Return results as NumPy array
         return pred
 
+    #---------------------------------------------#
+    #         Low-Latency Array Prediction        #
+    #---------------------------------------------#
+    def predict_batch(self, data):
+        # Reshape raw array to (samples, architectures*classes)
+        matrix = np.asarray(data, dtype=np.float64).reshape(len(data), -1)
+        # Compute multinomial decision function directly from coefficients
+        scores = matrix @ self.model.coef_.T + self.model.intercept_
+        if scores.shape[1] == 1 : scores = np.hstack([-scores, scores])
+        # Return class probabilities via softmax
+        return softmax(scores, axis=-1)
+
     #---------------------------------------------#
     #              Dump Model to Disk             #
     #---------------------------------------------#
     def dump(self, path):
-        # Dump model to disk via pickle
-        with open(path, "wb") as pickle_writer:
-            pickle.dump(self.model, pickle_writer)
+        # Dump coefficients to disk via model container
+        arrays = {"coef": self.model.coef_, "intercept": self.model.intercept_,
+                  "classes": self.model.classes_}
+        # Include log-loss approximation for incremental updates
+        self.approximate()
+        if self.hessian is not None:
+            arrays["gradient"] = self.gradient
+            arrays["hessian"] = self.hessian
+        store_model(path, "ELM_LogisticRegression", params={"C": self.model.C},
+                    arrays=arrays)
 
     #---------------------------------------------#
     #             Load Model from Disk            #
     #---------------------------------------------#
     def load(self, path):
-        # Load model from disk via pickle
-        with open(path, "rb") as pickle_reader:
-            self.model = pickle.load(pickle_reader)
\ No newline at end of file
+        # Load coefficients from disk via model container
+        if is_model_file(path):
+            params, arrays, _ = load_model(path, "ELM_LogisticRegression")
+            self.model.C = params.get("C", self.model.C)
+            self.gradient = arrays.get("gradient", None)
+            self.hessian = arrays.get("hessian", None)
+            self.model.coef_ = arrays["coef"]
+            self.model.intercept_ = arrays["intercept"]
+            self.model.classes_ = arrays["classes"]
+            self.model.n_features_in_ = arrays["coef"].shape[1]
+        # Support legacy dumps via pickle
+        else : self.model = load_pickle(path)
\ No newline at end of file
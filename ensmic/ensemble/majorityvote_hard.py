@@ -20,15 +20,25 @@
 #                   Library imports                   #
 #-----------------------------------------------------#
 # External libraries
-import pandas as pd
+import numpy as np
 # Internal libraries/scripts
 from ensmic.ensemble.abstract_elm import Abstract_Ensemble
+from ensmic.ensemble.prediction_cube import as_cube
+from ensmic.ensemble.model_format import store_model, load_model, is_model_file
 
 #-----------------------------------------------------#
 #              ELM: Majority Vote - Hard              #
 #-----------------------------------------------------#
 """ Ensemble Learning approach via Hard Majority Vote.
 
+Each architecture votes for its argmax class. Votes are counted via a single
+bincount over the (samples, architectures) argmax matrix, optionally weighted
+per architecture. The resulting vote shares always cover all n_classes.
+
+Tie-breaking modes:
+    "lowest"                Keep the plain vote shares (argmax picks lowest class).
+    "confidence"            Among tied classes, prefer the highest mean probability.
+
 Methods:
     __init__                Initialize Ensemble Learning Method.
     training:               Fit Ensemble Learning Method on validate-ensemble.
@@ -40,44 +50,142 @@ class ELM_MajorityVote_Hard(Abstract_Ensemble):
     #---------------------------------------------#
     #                Initialization               #
     #---------------------------------------------#
-    def __init__(self, n_classes):
-        # No hyperparameter adjustment required for this method, therefore skip
-        pass
+    def __init__(self, n_classes, weights=None, tie_break="lowest"):
+        # Store class variables
+        self.n_classes = n_classes
+        # Optional vote weights (list aligned to architectures or dictionary)
+        self.weights = weights
+        # Verify and store tie-breaking mode
+        if tie_break not in ["lowest", "confidence"]:
+            raise ValueError("Unknown tie-breaking mode: " + str(tie_break))
+        self.tie_break = tie_break
+        # Architecture order (cached on training for array-based prediction)
+        self.architectures = None
 
     #---------------------------------------------#
     #                  Training                   #
     #---------------------------------------------#
     def training(self, train_x, train_y):
-        # No training required for this method, therefore skip
+        # Cache architecture order for mapping of vote weights
+        self.architectures = as_cube(train_x).architectures
+
+    #---------------------------------------------#
+    #              Incremental Update             #
+    #---------------------------------------------#
+    def update(self, train_x, train_y):
+        # Architecture order is fixed by the initial training, therefore skip
         pass
 
     #---------------------------------------------#
     #                  Prediction                 #
     #---------------------------------------------#
     def prediction(self, data):
-        # Split data columns into multi level structure based on architecutre
-        data.columns = data.columns.str.split('_', expand=True)
-        # Identify argmax (vote) for each architecutre and cache n-architectures
-        data = data.groupby(level=0, axis=1).idxmax(axis=1)
-        n_architectures = len(data.columns)
-        data = data.apply(lambda entry: [tup[1] for tup in entry])
-        # Sum up votes of all architectures
-        data = data.apply(pd.Series.value_counts, axis=1).fillna(0)
-        # Compute Class Probabilities
-        pred = data.divide(n_architectures)
+        # Obtain prediction cube (samples, architectures, classes)
+        cube = as_cube(data)
+        # Identify argmax (vote) for each architecutre
+        votes = cube.votes()
+        # Obtain normalized vote weight for each architecture
+        arch_weights = self.vote_weights(cube.architectures)
+        # Sum up votes and resolve ties
+        return self.count_votes(votes, arch_weights, cube.data)
+
+    #---------------------------------------------#
+    #         Low-Latency Array Prediction        #
+    #---------------------------------------------#
+    def predict_batch(self, data):
+        # Reshape raw array to (samples, architectures, classes)
+        data = np.asarray(data, dtype=np.float64)
+        data = data.reshape(len(data), -1, self.n_classes)
+        # Identify argmax (vote) for each architecutre
+        votes = data.argmax(axis=2)
+        # Obtain normalized vote weight (dictionary requires named architectures)
+        architectures = self.architectures if self.architectures is not None \
+                        else ["A" + str(a) for a in range(0, data.shape[1])]
+        arch_weights = self.vote_weights(architectures)
+        # Sum up votes and resolve ties
+        return self.count_votes(votes, arch_weights, data)
+
+    #---------------------------------------------#
+    #                Vote Counting                #
+    #---------------------------------------------#
+    def count_votes(self, votes, arch_weights, probs):
+        n_samples = votes.shape[0]
+        # Sum up votes of all architectures via flat bincount
+        index = votes + np.arange(n_samples)[:, None] * self.n_classes
+        pred = np.bincount(index.ravel(),
+                           weights=np.broadcast_to(arch_weights, votes.shape).ravel(),
+                           minlength=n_samples * self.n_classes)
+        pred = pred.reshape(n_samples, self.n_classes)
+        # Resolve ties deterministically if requested
+        if self.tie_break == "confidence":
+            self.break_ties(pred, probs)
         # Return prediction
-        return pred.to_numpy()
+        return pred
+
+    #---------------------------------------------#
+    #                 Vote Weights                #
+    #---------------------------------------------#
+    def vote_weights(self, architectures):
+        # Use uniform votes if no weights are provided
+        if self.weights is None:
+            weights = np.ones(len(architectures), dtype=np.float64)
+        # Map dictionary weights onto architecture order
+        elif isinstance(self.weights, dict):
+            weights = np.asarray([self.weights[arch] for arch in architectures],
+                                 dtype=np.float64)
+        else : weights = np.asarray(self.weights, dtype=np.float64)
+        # Verify weights
+        if len(weights) != len(architectures) or np.any(weights < 0) or \
+           weights.sum() <= 0:
+            raise ValueError("Vote weights have to be non-negative and " + \
+                             "aligned to the architectures: " + str(architectures))
+        # Normalize weights to obtain class probabilities
+        return weights / weights.sum()
+
+    #---------------------------------------------#
+    #                 Tie-Breaking                #
+    #---------------------------------------------#
+    def break_ties(self, pred, probs, eps=1e-6):
+        # Identify samples with multiple classes sharing the maximum vote share
+        tied = np.isclose(pred, pred.max(axis=1, keepdims=True))
+        rows = np.flatnonzero(tied.sum(axis=1) > 1)
+        if len(rows) == 0 : return
+        # Select tied class with the highest mean probability across architectures
+        confidence = np.where(tied[rows], probs[rows].mean(axis=1), -np.inf)
+        winner = confidence.argmax(axis=1)
+        # Shift a negligible share of probability mass to the winning class
+        pred[rows] *= (1 - eps)
+        pred[rows, winner] += eps
 
     #---------------------------------------------#
     #              Dump Model to Disk             #
     #---------------------------------------------#
     def dump(self, path):
-        # No model infrastructure required for this method, therefore skip
-        pass
+        # Resolve vote weights onto the architecture order of training
+        arrays = {}
+        if self.architectures is not None:
+            arrays["weights"] = self.vote_weights(self.architectures)
+        elif self.weights is not None:
+            arrays["weights"] = np.asarray(self.weights, dtype=np.float64)
+        # Dump architecture order and weights to disk via model container
+        store_model(path, "ELM_MajorityVote_Hard",
+                    params={"tie_break": self.tie_break,
+                            "architectures": self.architectures},
+                    arrays=arrays)
 
     #---------------------------------------------#
     #             Load Model from Disk            #
     #---------------------------------------------#
     def load(self, path):
-        # No model infrastructure required for this method, therefore skip
-        pass
+        # Legacy dumps did not store any model, therefore skip
+        if not is_model_file(path) : return
+        # Load architecture order and weights from disk via model container
+        params, arrays, _ = load_model(path, "ELM_MajorityVote_Hard")
+        self.tie_break = params["tie_break"]
+        self.architectures = params["architectures"]
+        if "weights" not in arrays : self.weights = None
+        # Map weights onto architecture names to keep prediction() order-invariant
+        elif self.architectures is not None:
+            self.weights = dict(zip(self.architectures,
+                                    arrays["weights"].tolist()))
+        else : self.weights = arrays["weights"].tolist()
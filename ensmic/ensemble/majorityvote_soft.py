@@ -20,9 +20,10 @@
 #                   Library imports                   #
 #-----------------------------------------------------#
 # External libraries
-import pandas as pd
+import numpy as np
 # Internal libraries/scripts
 from ensmic.ensemble.abstract_elm import Abstract_Ensemble
+from ensmic.ensemble.prediction_cube import as_cube
 from ensmic.utils.softmax import softmax
 
 #-----------------------------------------------------#
@@ -42,8 +43,8 @@ class ELM_MajorityVote_Soft(Abstract_Ensemble):
     #                Initialization               #
     #---------------------------------------------#
     def __init__(self, n_classes):
-        # No hyperparameter adjustment required for this method, therefore skip
-        pass
+        # Store class variables
+        self.n_classes = n_classes
 
     #---------------------------------------------#
     #                  Training                   #
@@ -52,18 +53,35 @@ class ELM_MajorityVote_Soft(Abstract_Ensemble):
         # No training required for this method, therefore skip
         pass
 
+    #---------------------------------------------#
+    #              Incremental Update             #
+    #---------------------------------------------#
+    def update(self, train_x, train_y):
+        # No training required for this method, therefore skip
+        pass
+
     #---------------------------------------------#
     #                  Prediction                 #
     #---------------------------------------------#
     def prediction(self, data):
-        # Split data columns into multi level structure based on architecutre
-        data.columns = data.columns.str.split('_', expand=True)
+        # Obtain prediction cube (samples, architectures, classes)
+        cube = as_cube(data)
         # Sum up all predicted probabilities from all architecutres
-        data = data.groupby(level=1, axis=1).sum()
-        # Compute softmax on probability sums
-        pred = data.apply(softmax, axis=1)
+        prob_sum = cube.class_sum()
+        # Compute softmax on probability sums for each sample
+        pred = softmax(prob_sum, axis=-1)
         # Return prediction
-        return pred.to_numpy()
+        return pred
+
+    #---------------------------------------------#
+    #         Low-Latency Array Prediction        #
+    #---------------------------------------------#
+    def predict_batch(self, data):
+        # Reshape raw array to (samples, architectures, classes)
+        data = np.asarray(data, dtype=np.float64)
+        data = data.reshape(len(data), -1, self.n_classes)
+        # Compute softmax on probability sums for each sample
+        return softmax(data.sum(axis=1), axis=-1)
 
     #---------------------------------------------#
     #              Dump Model to Disk             #
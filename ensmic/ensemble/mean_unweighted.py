@@ -23,6 +23,7 @@
 import numpy as np
 # Internal libraries/scripts
 from ensmic.ensemble.abstract_elm import Abstract_Ensemble
+from ensmic.ensemble.prediction_cube import as_cube
 
 #-----------------------------------------------------#
 #                      ELM: Mean                      #
@@ -41,8 +42,8 @@ class ELM_MeanUnweighted(Abstract_Ensemble):
     #                Initialization               #
     #---------------------------------------------#
     def __init__(self, n_classes):
-        # No hyperparameter adjustment required for this method, therefore skip
-        pass
+        # Store class variables
+        self.n_classes = n_classes
 
     #---------------------------------------------#
     #                  Training                   #
@@ -51,16 +52,33 @@ class ELM_MeanUnweighted(Abstract_Ensemble):
         # No training required for this method, therefore skip
         pass
 
+    #---------------------------------------------#
+    #              Incremental Update             #
+    #---------------------------------------------#
+    def update(self, train_x, train_y):
+        # No training required for this method, therefore skip
+        pass
+
     #---------------------------------------------#
     #                  Prediction                 #
     #---------------------------------------------#
     def prediction(self, data):
-        # Split data columns into multi level structure based on architecutre
-        data.columns = data.columns.str.split('_', expand=True)
+        # Obtain prediction cube (samples, architectures, classes)
+        cube = as_cube(data)
+        # Compute average class probability (mean) across all architectures
+        pred = cube.class_sum() / cube.n_architectures
+        # Return prediction
+        return pred
+
+    #---------------------------------------------#
+    #         Low-Latency Array Prediction        #
+    #---------------------------------------------#
+    def predict_batch(self, data):
+        # Reshape raw array to (samples, architectures, classes)
+        data = np.asarray(data, dtype=np.float64)
+        data = data.reshape(len(data), -1, self.n_classes)
         # Compute average class probability (mean) across all architectures
-        pred = data.groupby(level=1, axis=1).mean()
-        # Transform prediction to Numpy and return result
-        return pred.to_numpy()
+        return data.mean(axis=1)
 
     #---------------------------------------------#
     #              Dump Model to Disk             #
@@ -27,17 +27,24 @@
 #-----------------------------------------------------#
 # External libraries
 import numpy as np
-import pandas as pd
-from sklearn.metrics import f1_score
-import pickle
+from scipy.optimize import minimize
 # Internal libraries/scripts
 from ensmic.ensemble.abstract_elm import Abstract_Ensemble
+from ensmic.ensemble.prediction_cube import as_cube, as_labels
+from ensmic.utils.metrics import macro_f1_from_counts
+from ensmic.ensemble.model_format import store_model, load_model, is_model_file, load_pickle
 
 #-----------------------------------------------------#
 #                  ELM: Weighted Mean                 #
 #-----------------------------------------------------#
 """ Ensemble Learning approach via weighted Mean.
 
+Weight modes:
+    "f1"                    Weight each architecture by its macro F1 score.
+    "logloss"               Learn weights on the simplex by minimizing the
+                            log-loss of the pooled prediction. The optimized
+                            logits are cached and used as warm start on refit.
+
 Methods:
     __init__                Initialize Ensemble Learning Method.
     training:               Fit Ensemble Learning Method on validate-ensemble.
@@ -49,60 +56,133 @@ class ELM_MeanWeighted(Abstract_Ensemble):
     #---------------------------------------------#
     #                Initialization               #
     #---------------------------------------------#
-    def __init__(self, n_classes):
+    def __init__(self, n_classes, mode="f1"):
+        # Verify weight mode
+        if mode not in ["f1", "logloss"]:
+            raise ValueError("Unknown weight mode: " + str(mode))
         # Initialize class variables
+        self.n_classes = n_classes
+        self.mode = mode
         self.weights = None
+        self.logits = None
+        self.counts = None
 
     #---------------------------------------------#
     #                  Training                   #
     #---------------------------------------------#
     def training(self, train_x, train_y):
-        # Split data columns into multi level structure based on architecutre
-        train_x.columns = train_x.columns.str.split('_', expand=True)
-        # Identify prediction for each architecutre
-        data = train_x.groupby(level=0, axis=1).idxmax(axis=1)
-        data = data.apply(lambda entry: [tup[1][1] for tup in entry])
-        # Convert dataframe to integer
-        data = data.astype('int')
-        # Compute F1/weights for each architecture
-        predarch = data.to_dict(orient="list")
-        weights = []
-        for arch in predarch.keys():
-            arch_f1 = f1_score(predarch[arch], train_y, average="macro")
-            weights.append(arch_f1)
+        # Obtain prediction cube (samples, architectures, classes)
+        cube = as_cube(train_x)
+        train_y = as_labels(train_y)
+        # Learn weights via log-loss minimization on the simplex
+        if self.mode == "logloss":
+            self.weights = self.fit_logloss(cube, train_y).tolist()
+            return
+        # Compute F1/weights for all architectures at once
+        weights = cube.macro_f1(train_y)
         # Store weights in cache
-        self.weights = weights
+        self.weights = weights.tolist()
+        # Cache additive F1 counts for incremental updates
+        self.counts = cube.f1_counts(train_y).copy()
+
+    #---------------------------------------------#
+    #              Incremental Update             #
+    #---------------------------------------------#
+    def update(self, train_x, train_y):
+        # Log-loss weights require the complete val-ensemble set
+        if self.mode == "logloss":
+            raise NotImplementedError("ELM_MeanWeighted does not support " + \
+                                      "incremental updates in logloss mode")
+        if self.counts is None:
+            raise ValueError("Incremental update requires F1 counts of a training")
+        # Obtain prediction cube (samples, architectures, classes)
+        cube = as_cube(train_x)
+        train_y = as_labels(train_y)
+        # Add F1 counts of new samples and update weights
+        self.counts = self.counts + cube.f1_counts(train_y)
+        self.weights = macro_f1_from_counts(self.counts).tolist()
+
+    #---------------------------------------------#
+    #           Log-Loss Weight Fitting           #
+    #---------------------------------------------#
+    def fit_logloss(self, cube, train_y, eps=1e-12):
+        # Cache probability of the true class for each architecture (N, A)
+        prob_true = cube.data[np.arange(cube.n_samples), :, train_y]
+        # Define log-loss and gradient w.r.t. softmax logits of the weights
+        def objective(logits):
+            weights = np.exp(logits - logits.max())
+            weights /= weights.sum()
+            pooled = prob_true @ weights + eps
+            loss = -np.mean(np.log(pooled))
+            grad_w = -(prob_true / pooled[:, None]).mean(axis=0)
+            grad = weights * (grad_w - weights @ grad_w)
+            return loss, grad
+        # Warm start from cached logits if architectures are unchanged
+        if self.logits is not None and len(self.logits) == cube.n_architectures:
+            x0 = np.asarray(self.logits, dtype=np.float64)
+        else : x0 = np.zeros(cube.n_architectures, dtype=np.float64)
+        # Run optimization and cache resulting logits
+        res = minimize(objective, x0, jac=True, method="L-BFGS-B")
+        self.logits = res.x.tolist()
+        # Return weights on the simplex
+        weights = np.exp(res.x - res.x.max())
+        return weights / weights.sum()
 
     #---------------------------------------------#
     #                  Prediction                 #
     #---------------------------------------------#
     def prediction(self, data):
-        # Split data columns into multi level structure based on architecutre
-        data.columns = data.columns.str.split('_', expand=True)
-        # Compute average class probability (mean) across all architectures
-        pred = data.groupby(level=1, axis=1).apply(np.average,
-                                                   axis=1,
-                                                   weights=self.weights)
-        # Transform prediction to Pandas and clean format
-        pred = pd.DataFrame(data=pred, columns=["index"])
-        pred = pred.transpose().apply(pd.Series.explode)
-        # Convert pandas dataframe to float64
-        pred = pred.astype("float64")
-        # Transform prediction to Numpy and return result
-        return pred.to_numpy()
+        # Obtain prediction cube (samples, architectures, classes)
+        cube = as_cube(data)
+        # Compute weighted class probability (mean) across all architectures
+        return self.predict_batch(cube.data)
+
+    #---------------------------------------------#
+    #         Low-Latency Array Prediction        #
+    #---------------------------------------------#
+    def predict_batch(self, data):
+        # Reshape raw array to (samples, architectures, classes)
+        data = np.asarray(data, dtype=np.float64)
+        data = data.reshape(len(data), -1, self.n_classes)
+        # Normalize weights to obtain a weighted mean
+        weights = np.asarray(self.weights, dtype=np.float64)
+        weights = weights / weights.sum()
+        # Compute weighted class probability (mean) across all architectures
+        pred = np.empty((data.shape[0], data.shape[2]), dtype=np.float64)
+        np.einsum("nac,a->nc", data, weights, out=pred)
+        # Return prediction
+        return pred
 
     #---------------------------------------------#
     #              Dump Model to Disk             #
     #---------------------------------------------#
     def dump(self, path):
-        # Dump weights to disk via pickle
-        with open(path, "wb") as pickle_writer:
-            pickle.dump(self.weights, pickle_writer)
+        # Dump weights and cached logits to disk via model container
+        arrays = {"weights": np.asarray(self.weights, dtype=np.float64)}
+        if self.logits is not None:
+            arrays["logits"] = np.asarray(self.logits, dtype=np.float64)
+        if self.counts is not None : arrays["f1_counts"] = self.counts
+        store_model(path, "ELM_MeanWeighted", params={"mode": self.mode},
+                    arrays=arrays)
 
     #---------------------------------------------#
     #             Load Model from Disk            #
     #---------------------------------------------#
     def load(self, path):
-        # Load weights from disk via pickle
-        with open(path, "rb") as pickle_reader:
-            self.weights = pickle.load(pickle_reader)
+        # Load weights from disk via model container
+        if is_model_file(path):
+            params, arrays, _ = load_model(path, "ELM_MeanWeighted")
+            self.mode = params["mode"]
+            self.weights = arrays["weights"].tolist()
+            if "logits" in arrays : self.logits = arrays["logits"].tolist()
+            self.counts = arrays.get("f1_counts", None)
+            return
+        # Support legacy dumps via pickle
+        model = load_pickle(path)
+        # Support legacy dumps which only contain the weight list
+        if isinstance(model, list):
+            self.weights = model
+            return
+        self.mode = model["mode"]
+        self.weights = model["weights"]
+        self.logits = model["logits"]
@@ -0,0 +1,146 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import json
+import pickle
+import hashlib
+import zipfile
+import numpy as np
+# Internal libraries/scripts
+from ensmic.utils.memmap import memmap_archive
+
+#-----------------------------------------------------#
+#                Ensembler Model Format               #
+#-----------------------------------------------------#
+""" Versioned container format for fitted Ensemble Learning Methods.
+
+A model file is an uncompressed zip archive with the members:
+    header.json             Schema version, ensembler class, hyperparameters,
+                            array shapes/dtypes and a SHA-256 checksum.
+    <name>.npy              NumPy arrays (coefficients, weights, trees, neighbors).
+    fallback.pkl            Optional pickled object for models which cannot be
+                            represented by arrays (e.g. kernel machines).
+
+The arrays can be loaded with mmap_mode="r", so multiple worker processes
+serving the same model share the underlying pages. On loading, only the header
+(schema, ensembler, array shapes/dtypes) is verified by default, because
+hashing every array would read all pages. The full checksum can be verified
+via verify=True, e.g. once at deployment time.
+
+Functions:
+    store_model             Store hyperparameters, arrays and fallback object.
+    load_model              Load and verify hyperparameters, arrays and fallback.
+    is_model_file           Check if a file uses the container format.
+    load_pickle             Load a legacy pickled model.
+"""
+# Current version of the container schema
+schema_version = 1
+
+#---------------------------------------------#
+#                 Store Model                 #
+#---------------------------------------------#
+def store_model(path, ensembler, params=None, arrays=None, fallback=None):
+    if params is None : params = {}
+    if arrays is None : arrays = {}
+    arrays = {name: np.ascontiguousarray(array) \
+              for name, array in arrays.items()}
+    fallback = pickle.dumps(fallback) if fallback is not None else None
+    # Create header with array description and checksum
+    header = {"schema_version": schema_version,
+              "ensembler": ensembler,
+              "params": params,
+              "arrays": {name: {"dtype": np.lib.format.dtype_to_descr(array.dtype),
+                                "shape": list(array.shape)} \
+                         for name, array in arrays.items()},
+              "fallback": fallback is not None,
+              "checksum": compute_checksum(arrays, fallback)}
+    # Write header, arrays and fallback into an uncompressed archive
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+        archive.writestr("header.json", json.dumps(header, indent=2))
+        for name, array in arrays.items():
+            with archive.open(name + ".npy", "w", force_zip64=True) as file:
+                np.lib.format.write_array(file, array, allow_pickle=False)
+        if fallback is not None : archive.writestr("fallback.pkl", fallback)
+
+#---------------------------------------------#
+#                  Load Model                 #
+#---------------------------------------------#
+def load_model(path, ensembler=None, mmap_mode="r", verify=False):
+    """ Load a model file and return the tuple (params, arrays, fallback). """
+    with zipfile.ZipFile(path, "r") as archive:
+        header = json.loads(archive.read("header.json"))
+        # Verify schema version and ensembler class
+        if header["schema_version"] > schema_version:
+            raise ValueError("Unsupported model schema version " + \
+                             str(header["schema_version"]) + ": " + str(path))
+        if ensembler is not None and header["ensembler"] != ensembler:
+            raise ValueError("Model file belongs to " + header["ensembler"] + \
+                             " instead of " + ensembler + ": " + str(path))
+        # Load arrays (memory-mapped if requested)
+        arrays = {}
+        for name in header["arrays"]:
+            if mmap_mode is not None:
+                arrays[name] = memmap_archive(path, name + ".npy", mmap_mode)
+            else:
+                with archive.open(name + ".npy", "r") as file:
+                    arrays[name] = np.lib.format.read_array(file,
+                                                            allow_pickle=False)
+        fallback = archive.read("fallback.pkl") if header["fallback"] else None
+    # Verify array descriptions against header
+    for name, array in arrays.items():
+        description = header["arrays"][name]
+        if np.lib.format.dtype_to_descr(array.dtype) != description["dtype"] or \
+           list(array.shape) != description["shape"]:
+            raise ValueError("Array " + name + " does not match header, " + \
+                             "model file is corrupted: " + str(path))
+    # Verify integrity of all bytes (optional, reads every page)
+    if verify and compute_checksum(arrays, fallback) != header["checksum"]:
+        raise ValueError("Checksum mismatch, model file is corrupted: " + str(path))
+    # Return hyperparameters, arrays and unpickled fallback object
+    if fallback is not None : fallback = pickle.loads(fallback)
+    return header["params"], arrays, fallback
+
+#---------------------------------------------#
+#                 Format Utils                #
+#---------------------------------------------#
+def compute_checksum(arrays, fallback=None):
+    # Hash array names, descriptions and raw bytes in sorted order
+    sha = hashlib.sha256()
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        sha.update(name.encode("utf-8"))
+        sha.update(str((array.dtype.str, array.shape)).encode("utf-8"))
+        if array.size > 0 : sha.update(array.reshape(-1).view(np.uint8))
+    if fallback is not None : sha.update(fallback)
+    return "sha256:" + sha.hexdigest()
+
+def is_model_file(path):
+    # Check for an archive containing a model header
+    if not zipfile.is_zipfile(path) : return False
+    with zipfile.ZipFile(path, "r") as archive:
+        return "header.json" in archive.namelist()
+
+def load_pickle(path):
+    # Load legacy model via pickle
+    with open(path, "rb") as pickle_reader:
+        return pickle.load(pickle_reader)
@@ -21,10 +21,12 @@
 #-----------------------------------------------------#
 # External libraries
 import numpy as np
-import pickle
 from sklearn.naive_bayes import ComplementNB
 # Internal libraries/scripts
 from ensmic.ensemble.abstract_elm import Abstract_Ensemble
+from ensmic.ensemble.prediction_cube import as_matrix, as_labels
+from ensmic.utils.softmax import softmax
+from ensmic.ensemble.model_format import store_model, load_model, is_model_file, load_pickle
 
 #-----------------------------------------------------#
 #                   ELM: Naive Bayes                  #
@@ -50,32 +52,70 @@ class ELM_NaiveBayes(Abstract_Ensemble):
     #                  Training                   #
     #---------------------------------------------#
     def training(self, train_x, train_y):
-        # Transform Y array to be NumPy 1D array
-        train_y = np.ravel(train_y, order="C")
+        # Transform X to 2D feature matrix and Y to NumPy 1D array
+        train_x = as_matrix(train_x)
+        train_y = as_labels(train_y)
         # Fit model to val-ensemble
         self.model = self.model.fit(train_x, train_y)
 
+    #---------------------------------------------#
+    #              Incremental Update             #
+    #---------------------------------------------#
+    def update(self, train_x, train_y):
+        # Transform X to 2D feature matrix and Y to NumPy 1D array
+        train_x = as_matrix(train_x)
+        train_y = as_labels(train_y)
+        # Add feature counts of new samples to fitted model
+        self.model = self.model.partial_fit(train_x, train_y)
+
     #---------------------------------------------#
     #                  Prediction                 #
     #---------------------------------------------#
     def prediction(self, data):
         # Compute prediction probabilities via fitted model
-        pred = self.model.predict_proba(data)
+        pred = self.model.predict_proba(as_matrix(data))
         # Return results as NumPy array
         return pred
 
+    #---------------------------------------------#
+    #         Low-Latency Array Prediction        #
+    #---------------------------------------------#
+    def predict_batch(self, data):
+        # Reshape raw array to (samples, architectures*classes)
+        matrix = np.asarray(data, dtype=np.float64).reshape(len(data), -1)
+        # Compute joint log likelihood directly from feature log probabilities
+        jll = matrix @ self.model.feature_log_prob_.T
+        if len(self.model.classes_) == 1 : jll += self.model.class_log_prior_
+        # Return normalized class probabilities
+        return softmax(jll, axis=-1)
+
     #---------------------------------------------#
     #              Dump Model to Disk             #
     #---------------------------------------------#
     def dump(self, path):
-        # Dump model to disk via pickle
-        with open(path, "wb") as pickle_writer:
-            pickle.dump(self.model, pickle_writer)
+        # Dump log probabilities to disk via model container
+        arrays = {"feature_log_prob": self.model.feature_log_prob_,
+                  "class_log_prior": self.model.class_log_prior_,
+                  "classes": self.model.classes_,
+                  "feature_count": self.model.feature_count_,
+                  "class_count": self.model.class_count_,
+                  "feature_all": self.model.feature_all_}
+        store_model(path, "ELM_NaiveBayes", arrays=arrays)
 
     #---------------------------------------------#
     #             Load Model from Disk            #
     #---------------------------------------------#
     def load(self, path):
-        # Load model from disk via pickle
-        with open(path, "rb") as pickle_reader:
-            self.model = pickle.load(pickle_reader)
+        # Load log probabilities from disk via model container
+        if is_model_file(path):
+            _, arrays, _ = load_model(path, "ELM_NaiveBayes")
+            self.model.feature_log_prob_ = arrays["feature_log_prob"]
+            self.model.class_log_prior_ = arrays["class_log_prior"]
+            self.model.classes_ = arrays["classes"]
+            self.model.n_features_in_ = arrays["feature_log_prob"].shape[1]
+            # Counts are required for incremental updates
+            self.model.feature_count_ = np.array(arrays["feature_count"])
+            self.model.class_count_ = np.array(arrays["class_count"])
+            self.model.feature_all_ = np.array(arrays["feature_all"])
+        # Support legacy dumps via pickle
+        else : self.model = load_pickle(path)
@@ -0,0 +1,283 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import zipfile
+import numpy as np
+import pandas as pd
+# Internal libraries/scripts
+from ensmic.utils.metrics import compute_f1_counts, macro_f1_from_counts
+from ensmic.utils.memmap import memmap_archive
+
+#-----------------------------------------------------#
+#            Prediction Cube for Ensembling           #
+#-----------------------------------------------------#
+""" Array-backed container for the predictions of multiple architectures.
+
+The predictions are stored as a contiguous float64 NumPy array with the shape
+(samples, architectures, classes). Sample ids, architecture names and the class
+legend are kept next to it, so that pooling functions can operate on a single
+axis instead of parsing "Arch_C<k>" column names.
+
+Intermediates which are required by multiple ensemblers (argmax votes, class
+sums, macro F1 per architecture) are computed once and cached on the cube.
+Therefore, the prediction array should be treated as immutable.
+
+Methods:
+    __init__                Initialize Prediction Cube from a 3D array.
+    from_inference:         Build Prediction Cube from IO_Inference dictionaries.
+    from_dataframe:         Build Prediction Cube from a flat "Arch_C<k>" DataFrame.
+    to_dataframe:           Convert Prediction Cube to a flat "Arch_C<k>" DataFrame.
+    flatten:                Obtain a 2D (samples, architectures*classes) matrix.
+    subset:                 Select a subset of samples.
+    iter_chunks:            Iterate over fixed-size sample chunks (views).
+    votes:                  Argmax class of each architecture (cached).
+    class_sum:              Class probability sums across architectures (cached).
+    f1_counts:              Additive F1 counts of each architecture (cached).
+    macro_f1:               Macro F1 of each architecture for given labels (cached).
+    store:                  Save Prediction Cube to disk (NumPy npz).
+    store_stream:           Save a stream of Prediction Cube chunks to disk.
+    load:                   Load Prediction Cube from disk (optionally memory-mapped).
+"""
+class PredictionCube():
+    #---------------------------------------------#
+    #                Initialization               #
+    #---------------------------------------------#
+    def __init__(self, data, samples=None, architectures=None, class_list=None):
+        # Store prediction array as contiguous float64 cube
+        self.data = np.ascontiguousarray(data, dtype=np.float64)
+        if self.data.ndim != 3:
+            raise ValueError("Prediction cube requires a 3D array with shape " + \
+                             "(samples, architectures, classes), got shape: " + \
+                             str(self.data.shape))
+        n_samples, n_architectures, n_classes = self.data.shape
+        # Store meta information or create default annotations
+        if samples is None : samples = np.arange(n_samples).astype(str)
+        if architectures is None:
+            architectures = ["A" + str(a) for a in range(0, n_architectures)]
+        if class_list is None:
+            class_list = ["C" + str(c) for c in range(0, n_classes)]
+        self.samples = np.asarray(samples)
+        self.architectures = list(architectures)
+        self.class_list = list(class_list)
+        # Verify consistency between annotation and array
+        if len(self.samples) != n_samples or \
+           len(self.architectures) != n_architectures or \
+           len(self.class_list) != n_classes:
+            raise ValueError("Annotation of prediction cube does not match " + \
+                             "array shape: " + str(self.data.shape))
+        # Initialize cache for shared intermediates
+        self.cache = {}
+
+    #---------------------------------------------#
+    #                 Properties                  #
+    #---------------------------------------------#
+    @property
+    def n_samples(self):
+        return self.data.shape[0]
+
+    @property
+    def n_architectures(self):
+        return self.data.shape[1]
+
+    @property
+    def n_classes(self):
+        return self.data.shape[2]
+
+    def __len__(self):
+        return self.n_samples
+
+    #---------------------------------------------#
+    #          Creation from IO_Inference         #
+    #---------------------------------------------#
+    @classmethod
+    def from_inference(cls, inference, class_list, samples=None):
+        """ Build a cube from a dictionary {architecture: {sample: [probs]}}.
+
+        If no sample list is provided, the samples of the first architecture
+        are used (in their stored order).
+        """
+        architectures = list(inference.keys())
+        if samples is None : samples = list(inference[architectures[0]].keys())
+        # Allocate cube and fill it architecture by architecture
+        data = np.empty((len(samples), len(architectures), len(class_list)),
+                        dtype=np.float64)
+        for a, arch in enumerate(architectures):
+            inf_arch = inference[arch]
+            data[:, a, :] = [inf_arch[sample] for sample in samples]
+        # Return prediction cube
+        return cls(data, samples, architectures, class_list)
+
+    #---------------------------------------------#
+    #     Conversion from/to flat DataFrames      #
+    #---------------------------------------------#
+    @classmethod
+    def from_dataframe(cls, df, class_list=None):
+        """ Build a cube from a flat DataFrame with "Arch_C<k>" columns.
+
+        The architecture is everything before the last underscore, therefore
+        architecture names are allowed to contain underscores themselves.
+        """
+        arch_map = {}
+        arch_idx = []
+        class_idx = []
+        # Parse column names into architecture and class index
+        for column in df.columns:
+            arch, _, class_str = str(column).rpartition("_")
+            if arch not in arch_map : arch_map[arch] = len(arch_map)
+            arch_idx.append(arch_map[arch])
+            class_idx.append(int(class_str.lstrip("C")))
+        n_classes = max(class_idx) + 1
+        # Scatter flat matrix into cube
+        data = np.zeros((len(df), len(arch_map), n_classes), dtype=np.float64)
+        data[:, arch_idx, class_idx] = df.to_numpy(dtype=np.float64)
+        # Return prediction cube
+        return cls(data, df.index.to_numpy(), list(arch_map.keys()), class_list)
+
+    def to_dataframe(self):
+        # Create "Arch_C<k>" column names in architecture-major order
+        colnames = [arch + "_C" + str(c) for arch in self.architectures \
+                                         for c in range(0, self.n_classes)]
+        # Return flat DataFrame indexed by samples
+        return pd.DataFrame(self.flatten(), index=self.samples, columns=colnames)
+
+    def flatten(self):
+        # Reshape cube into (samples, architectures*classes) matrix without copy
+        return self.data.reshape(self.n_samples, -1)
+
+    #---------------------------------------------#
+    #               Sample Selection              #
+    #---------------------------------------------#
+    def subset(self, index):
+        # Select samples via slice, integer index or boolean mask
+        return PredictionCube(self.data[index], self.samples[index],
+                              self.architectures, self.class_list)
+
+    def iter_chunks(self, chunk_size):
+        # Yield consecutive sample chunks as views on the prediction array
+        for start in range(0, self.n_samples, chunk_size):
+            yield self.subset(slice(start, start + chunk_size))
+
+    #---------------------------------------------#
+    #             Shared Intermediates            #
+    #---------------------------------------------#
+    def votes(self):
+        # Compute argmax class for each architecture (samples, architectures)
+        if "votes" not in self.cache:
+            self.cache["votes"] = self.data.argmax(axis=2)
+        return self.cache["votes"]
+
+    def class_sum(self):
+        # Compute sum of class probabilities across architectures
+        if "class_sum" not in self.cache:
+            self.cache["class_sum"] = self.data.sum(axis=1)
+        return self.cache["class_sum"]
+
+    def f1_counts(self, labels):
+        # Compute additive F1 counts for each architecture (cached per label array)
+        labels = as_labels(labels)
+        key = ("f1_counts", hash(labels.tobytes()))
+        if key not in self.cache:
+            self.cache[key] = compute_f1_counts(labels, self.votes(),
+                                                self.n_classes)
+        return self.cache[key]
+
+    def macro_f1(self, labels):
+        # Compute macro F1 for each architecture (cached per label array)
+        labels = as_labels(labels)
+        key = ("macro_f1", hash(labels.tobytes()))
+        if key not in self.cache:
+            self.cache[key] = macro_f1_from_counts(self.f1_counts(labels))
+        return self.cache[key]
+
+    #---------------------------------------------#
+    #                  Disk Storage               #
+    #---------------------------------------------#
+    def store(self, path):
+        # Store cube and annotation into an uncompressed NumPy archive
+        with open(path, "wb") as file:
+            np.savez(file, data=self.data,
+                     samples=self.samples.astype(str),
+                     architectures=np.asarray(self.architectures, dtype=str),
+                     class_list=np.asarray(self.class_list, dtype=str))
+
+    @staticmethod
+    def store_stream(path, chunks, samples, architectures, class_list):
+        """ Store a stream of cube chunks without holding the full cube in memory.
+
+        The chunks have to be ordered like the provided sample list. The result
+        is identical to store() and can be read via load().
+        """
+        shape = (len(samples), len(architectures), len(class_list))
+        header = {"descr": np.lib.format.dtype_to_descr(np.dtype(np.float64)),
+                  "fortran_order": False, "shape": shape}
+        with zipfile.ZipFile(path, "w") as archive:
+            # Write prediction array chunk by chunk into archive member
+            n_written = 0
+            with archive.open("data.npy", "w", force_zip64=True) as file:
+                np.lib.format.write_array_header_2_0(file, header)
+                for chunk in chunks:
+                    chunk = chunk.data if isinstance(chunk, PredictionCube) \
+                            else np.asarray(chunk)
+                    chunk = np.ascontiguousarray(chunk, dtype=np.float64)
+                    file.write(chunk.tobytes())
+                    n_written += len(chunk)
+            if n_written != shape[0]:
+                raise ValueError("Number of streamed samples (" + str(n_written) + \
+                                 ") does not match sample list: " + str(shape[0]))
+            # Write annotation into archive
+            annotation = {"samples": np.asarray(samples).astype(str),
+                          "architectures": np.asarray(architectures, dtype=str),
+                          "class_list": np.asarray(class_list, dtype=str)}
+            for name, array in annotation.items():
+                with archive.open(name + ".npy", "w") as file:
+                    np.lib.format.write_array(file, array, allow_pickle=False)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        # Load cube and annotation from NumPy archive
+        with np.load(path, allow_pickle=False) as archive:
+            if mmap_mode is None : data = archive["data"]
+            else : data = None
+            samples = archive["samples"]
+            architectures = archive["architectures"].tolist()
+            class_list = archive["class_list"].tolist()
+        # Memory-map prediction array from the uncompressed archive member
+        if data is None : data = memmap_archive(path, "data.npy", mmap_mode)
+        return cls(data, samples, architectures, class_list)
+
+#-----------------------------------------------------#
+#            Input Conversion for Ensemblers          #
+#-----------------------------------------------------#
+def as_cube(data):
+    """ Obtain a PredictionCube from either a cube or a flat DataFrame. """
+    if isinstance(data, PredictionCube) : return data
+    return PredictionCube.from_dataframe(data)
+
+def as_matrix(data):
+    """ Obtain a 2D feature matrix from either a cube or a flat DataFrame. """
+    if isinstance(data, PredictionCube) : return data.flatten()
+    return np.asarray(data, dtype=np.float64)
+
+def as_labels(data):
+    """ Obtain a 1D integer label array from a DataFrame, Series or array. """
+    return np.ravel(np.asarray(data), order="C").astype(np.int64)
@@ -0,0 +1,104 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import importlib
+from collections.abc import Mapping
+
+#-----------------------------------------------------#
+#              Lazy Ensembler Registry                #
+#-----------------------------------------------------#
+""" Mapping from ensembler names to Ensemble Learning Method classes.
+
+Classes are registered by an import path ("module:Class") and only imported on
+first access. Thus, importing the registry does not pull in any ELM dependencies
+(e.g. scikit-learn).
+
+Third-party ELMs can be registered via the entry point group "ensmic.ensemblers"
+in the setup.py of another package:
+    entry_points={"ensmic.ensemblers": ["MyELM = mypackage.module:ELM_MyELM"]}
+Entry points are only scanned if an unknown name is requested or if the
+registry is iterated. Built-in names cannot be overwritten by entry points.
+
+Methods:
+    __init__                Initialize registry with built-in import paths.
+    __getitem__:            Resolve (and import) an ELM class by name.
+    register:               Register an ELM class or import path by name.
+    load_plugins:           Register ELMs of the entry point group.
+"""
+class Ensembler_Registry(Mapping):
+    # Entry point group for third-party ELMs
+    entry_point_group = "ensmic.ensemblers"
+
+    #---------------------------------------------#
+    #                Initialization               #
+    #---------------------------------------------#
+    def __init__(self, targets):
+        # Store import paths or classes for each ensembler name
+        self.targets = dict(targets)
+        self.plugins_loaded = False
+
+    #---------------------------------------------#
+    #              Mapping Interface              #
+    #---------------------------------------------#
+    def __getitem__(self, name):
+        # Scan entry points for unknown ensemblers
+        if name not in self.targets : self.load_plugins()
+        target = self.targets[name]
+        # Import class on first access and cache it
+        if isinstance(target, str):
+            module_path, class_name = target.split(":")
+            target = getattr(importlib.import_module(module_path), class_name)
+            self.targets[name] = target
+        return target
+
+    def __iter__(self):
+        self.load_plugins()
+        return iter(self.targets)
+
+    def __len__(self):
+        self.load_plugins()
+        return len(self.targets)
+
+    def __contains__(self, name):
+        if name not in self.targets : self.load_plugins()
+        return name in self.targets
+
+    #---------------------------------------------#
+    #                 Registration                #
+    #---------------------------------------------#
+    def register(self, name, target):
+        # Register an ELM class or an import path "module:Class"
+        self.targets[name] = target
+
+    def load_plugins(self):
+        # Scan entry points only once
+        if self.plugins_loaded : return
+        self.plugins_loaded = True
+        from importlib.metadata import entry_points
+        # Obtain entry points of group (API differs between Python versions)
+        eps = entry_points()
+        if hasattr(eps, "select") : eps = eps.select(group=self.entry_point_group)
+        else : eps = eps.get(self.entry_point_group, [])
+        # Register ELMs without overwriting built-in ensemblers
+        for ep in eps:
+            if ep.name not in self.targets : self.targets[ep.name] = ep.value
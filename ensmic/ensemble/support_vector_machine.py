@@ -21,16 +21,41 @@
 #-----------------------------------------------------#
 # External libraries
 import numpy as np
-import pickle
-from sklearn.svm import SVC
+from scipy.special import expit
+from sklearn import config_context
+from sklearn.svm import SVC, LinearSVC
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.pipeline import make_pipeline
 # Internal libraries/scripts
 from ensmic.ensemble.abstract_elm import Abstract_Ensemble
+from ensmic.ensemble.prediction_cube import as_matrix, as_labels
+from ensmic.ensemble.kernel_approximation import create_feature_map, \
+                                               export_feature_map, apply_feature_map
+from ensmic.ensemble.model_format import store_model, load_model, is_model_file, load_pickle
 
 #-----------------------------------------------------#
 #             ELM: Support Vector Machine             #
 #-----------------------------------------------------#
 """ Ensemble Learning approach via Support Vector Machine.
 
+The exact SVC with probability=True fits an internal 5-fold Platt calibration
+and its training scales super-quadratic with the number of samples, whereas
+inference scales with the number of support vectors. The approximate modes map
+the data via an RBF kernel approximation into an explicit feature space, fit a
+linear SVM and calibrate its decision function with a single sigmoid fit on
+internal 3-fold predictions. Training and inference then scale linear in the
+number of samples and are independent of any support vector count.
+
+Fitted approximate models are exported into arrays (feature map, linear SVM
+coefficients, sigmoid calibration) and stored via the array-based model
+container. The exact mode is still stored as pickle fallback, because libsvm's
+multi-class probability coupling is only accessible through the fitted SVC.
+
+Modes:
+    "exact"                 SVC with RBF kernel and Platt scaling.
+    "nystroem"              Nystroem inducing points + calibrated linear SVM.
+    "rff"                   Random Fourier features + calibrated linear SVM.
+
 Methods:
     __init__                Initialize Ensemble Learning Method.
     training:               Fit Ensemble Learning Method on validate-ensemble.
@@ -42,42 +67,130 @@ class ELM_SupportVectorMachine(Abstract_Ensemble):
     #---------------------------------------------#
     #                Initialization               #
     #---------------------------------------------#
-    def __init__(self, n_classes):
+    def __init__(self, n_classes, mode="exact", n_components=300, gamma=None,
+                 C=1.0):
+        # Verify and store approximation configuration
+        if mode not in ["exact", "nystroem", "rff"]:
+            raise ValueError("Unknown Support Vector Machine mode: " + str(mode))
+        self.mode = mode
+        self.n_components = n_components
+        self.gamma = gamma
+        self.C = C
+        self.arrays = None
         # Initialize model
-        self.model = SVC(random_state=0,
-                         probability=True,
-                         gamma="scale")
+        if mode == "exact":
+            self.model = SVC(random_state=0, C=C,
+                             probability=True,
+                             gamma="scale" if gamma is None else gamma)
+        else : self.model = None
 
     #---------------------------------------------#
     #                  Training                   #
     #---------------------------------------------#
     def training(self, train_x, train_y):
-        # Transform Y array to be NumPy 1D array
-        train_y = np.ravel(train_y, order="C")
+        # Transform X to 2D feature matrix and Y to NumPy 1D array
+        train_x = as_matrix(train_x)
+        train_y = as_labels(train_y)
+        # Initialize approximate model based on training data
+        if self.mode != "exact" : self.model = self.create_approximation(train_x)
         # Fit model to val-ensemble
         self.model = self.model.fit(train_x, train_y)
+        # Export fitted approximate model into arrays
+        if self.mode != "exact" : self.arrays = self.export_approximation()
+
+    #---------------------------------------------#
+    #            Kernel Approximation             #
+    #---------------------------------------------#
+    def create_approximation(self, train_x):
+        # Create explicit RBF feature map based on training data
+        feature_map = create_feature_map(train_x, self.mode, self.n_components,
+                                         self.gamma)
+        # Calibrate linear SVM via a single sigmoid fit on cross-validated scores
+        svm = CalibratedClassifierCV(LinearSVC(random_state=0, C=self.C, dual=False),
+                                     method="sigmoid", cv=3, ensemble=False)
+        # Return pipeline of feature map and calibrated linear classifier
+        return make_pipeline(feature_map, svm)
+
+    def export_approximation(self):
+        # Export feature map, linear SVM and sigmoid calibration of the pipeline
+        feature_map, classifier = self.model[0], self.model[-1]
+        calibrated = classifier.calibrated_classifiers_[0]
+        arrays = export_feature_map(feature_map)
+        arrays.update({"coef": calibrated.estimator.coef_,
+                       "intercept": calibrated.estimator.intercept_,
+                       "calibration_a": np.array([c.a_ for c in calibrated.calibrators]),
+                       "calibration_b": np.array([c.b_ for c in calibrated.calibrators]),
+                       "classes": classifier.classes_})
+        return arrays
+
+    def predict_approximation(self, matrix):
+        # Map data into feature space & compute linear SVM decision function
+        features = apply_feature_map(self.arrays, matrix)
+        scores = features @ self.arrays["coef"].T + self.arrays["intercept"]
+        # Calibrate decision function of each class via sigmoid
+        proba = expit(-(self.arrays["calibration_a"] * scores + \
+                        self.arrays["calibration_b"]))
+        # Binary case: calibrated probability of the positive class
+        if len(self.arrays["classes"]) == 2:
+            return np.hstack([1.0 - proba, proba])
+        # Normalize one-vs-rest probabilities (uniform if all are zero)
+        denominator = np.sum(proba, axis=1, keepdims=True)
+        uniform = np.full_like(proba, 1.0 / proba.shape[1])
+        proba = np.divide(proba, denominator, out=uniform,
+                          where=denominator != 0)
+        proba[(proba > 1.0) & (proba <= 1.0 + 1e-5)] = 1.0
+        return proba
 
     #---------------------------------------------#
     #                  Prediction                 #
     #---------------------------------------------#
     def prediction(self, data):
-        # Compute prediction probabilities via fitted model
-        pred = self.model.predict_proba(data)
+        # Compute prediction probabilities via exported arrays or fitted model
+        if self.mode != "exact" : return self.predict_approximation(as_matrix(data))
+        pred = self.model.predict_proba(as_matrix(data))
         # Return results as NumPy array
         return pred
 
+    #---------------------------------------------#
+    #         Low-Latency Array Prediction        #
+    #---------------------------------------------#
+    def predict_batch(self, data):
+        # Reshape raw array to (samples, architectures*classes)
+        matrix = np.asarray(data, dtype=np.float64).reshape(len(data), -1)
+        if self.mode != "exact" : return self.predict_approximation(matrix)
+        # Compute prediction probabilities without finiteness validation
+        with config_context(assume_finite=True):
+            return self.model.predict_proba(matrix)
+
     #---------------------------------------------#
     #              Dump Model to Disk             #
     #---------------------------------------------#
     def dump(self, path):
-        # Dump model to disk via pickle
-        with open(path, "wb") as pickle_writer:
-            pickle.dump(self.model, pickle_writer)
+        # Dump configuration and exported arrays (approximate) or pickled
+        # kernel model (exact) via model container
+        params = {"mode": self.mode, "n_components": self.n_components,
+                  "gamma": self.gamma, "C": self.C}
+        if self.mode != "exact":
+            store_model(path, "ELM_SupportVectorMachine", params=params,
+                        arrays=self.arrays)
+        else:
+            store_model(path, "ELM_SupportVectorMachine", params=params,
+                        fallback=self.model)
 
     #---------------------------------------------#
     #             Load Model from Disk            #
     #---------------------------------------------#
     def load(self, path):
-        # Load model from disk via pickle
-        with open(path, "rb") as pickle_reader:
-            self.model = pickle.load(pickle_reader)
+        # Load configuration and arrays or pickled kernel model via container
+        if is_model_file(path):
+            params, arrays, self.model = load_model(path, "ELM_SupportVectorMachine")
+            self.arrays = arrays if arrays else None
+            self.mode = params["mode"]
+            self.n_components = params["n_components"]
+            self.gamma = params["gamma"]
+            self.C = params.get("C", 1.0)
+            # Export arrays of approximate models stored as pickle fallback
+            if self.mode != "exact" and self.arrays is None:
+                self.arrays = self.export_approximation()
+        # Support legacy dumps via pickle
+        else : self.model = load_pickle(path)
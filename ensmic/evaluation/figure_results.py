@@ -23,12 +23,11 @@
 # External libraries
 import os
 import pandas as pd
-import json
 from ast import literal_eval
 import numpy as np
 from plotnine import *
 # Internal libraries/scripts
-from ensmic.data_loading import IO_Inference
+from ensmic.data_loading import IO_Inference, load_ground_truth
 from ensmic.utils.metrics import compute_metrics, compute_rawCM
 
 #-----------------------------------------------------#
@@ -50,9 +49,7 @@ for phase in phases:
     # Iterate over each dataset
     for ds in datasets:
         # Load ground truth dictionary
-        path_gt = os.path.join(path_data, ds + ".test.json")
-        with open(path_gt, "r") as json_reader:
-            gt_map = json.load(json_reader)
+        gt_map = load_ground_truth(path_data, "test", ds)
 
         # Get current path
         path_current = os.path.join(path_results, "phase_" + phase + "." + ds)
@@ -30,7 +30,9 @@ from aucmedi.neural_network.architectures import supported_standardize_mode, \
                                                  architecture_dict
 from aucmedi.ensembler import predict_augmenting
 # ENSMIC libraries
-from ensmic.data_loading import IO_Inference, load_sampling, architecture_list
+from ensmic.data_loading import IO_Inference, Inference_Index, load_sampling, \
+                                architecture_list
+from ensmic.data_loading.io_inference import resolve_path
 
 #-----------------------------------------------------#
 #                      Argparser                      #
@@ -60,6 +62,8 @@ config["batch_size"] = 32
 config["batch_queue_size"] = 16
 # Neural Network Configurations
 config["workers"] = 16
+# Number of samples per committed inference block (resumable on restart)
+config["commit_size"] = 512
 
 # Adjust GPU configuration
 config["gpu_id"] = int(args.gpu)
@@ -69,6 +73,13 @@ os.environ["CUDA_VISIBLE_DEVICES"] = str(config["gpu_id"])
 #                   AUCMEDI Pipeline                  #
 #-----------------------------------------------------#
 def run_aucmedi(samples, dataset, architecture, config, best_model=True):
+    # Get result subdirectory for current architecture
+    path_arch = os.path.join(config["path_phase"], architecture)
+    if not os.path.exists(path_arch) : os.mkdir(path_arch)
+    # Skip dataset if inference has already been finished (any backend)
+    path_inf = os.path.join(path_arch, "inference" + "." + dataset + ".npz")
+    if os.path.exists(resolve_path(path_inf)) : return
+
     # Define Subfunctions
     sf_list = [Padding(mode="square")]
     # Set activation output to softmax for multi-class classification
@@ -98,13 +109,11 @@ def run_aucmedi(samples, dataset, architecture, config, best_model=True):
     # Load trained model from disk
     model.load(path_model)
 
-    # Get result subdirectory for current architecture
-    path_arch = os.path.join(config["path_phase"], architecture)
-    if not os.path.exists(path_arch) : os.mkdir(path_arch)
-
-    # Create an Inference IO Interface
-    path_inf = os.path.join(path_arch, "inference" + "." + dataset + ".json")
+    # Create an Inference IO Interface & open (or resume) append-mode writer
     infIO = IO_Inference(config["class_names"], path=path_inf)
+    writer = infIO.open_writer()
+    done = writer.done()
+    remaining = [s for s in samples if s not in done]
 
     # Initialize Image Augmentation
     aug = Image_Augmentation(flip=True, rotate=True, brightness=False, contrast=False,
@@ -113,15 +122,20 @@ def run_aucmedi(samples, dataset, architecture, config, best_model=True):
                              gaussian_noise=False, gaussian_blur=False,
                              downscaling=False, elastic_transform=False)
 
-    # Compute predictions & store them to disk
-    preds = predict_augmenting(model, samples, config["path_images"],
-                               n_cycles=15, img_aug=aug, aggregate="mean",
-                               image_format=config["image_format"], seed=None,
-                               batch_size=config["batch_size"],
-                               grayscale=False, subfunctions=sf_list,
-                               standardize_mode=sf_standardize,
-                               resize=input_shape, workers=config["threads"])
-    infIO.store_inference(samples, preds)
+    # Compute predictions block by block & commit them to disk
+    for i in range(0, len(remaining), config["commit_size"]):
+        block = remaining[i:i+config["commit_size"]]
+        preds = predict_augmenting(model, block, config["path_images"],
+                                   n_cycles=15, img_aug=aug, aggregate="mean",
+                                   image_format=config["image_format"],
+                                   seed=None, batch_size=config["batch_size"],
+                                   grayscale=False, subfunctions=sf_list,
+                                   standardize_mode=sf_standardize,
+                                   resize=input_shape,
+                                   workers=config["threads"])
+        writer.append(block, preds)
+    # Write final inference file & remove journal
+    writer.finalize()
 
 #-----------------------------------------------------#
 #               Setup Data IO Interface               #
@@ -162,3 +176,12 @@ for architecture in architecture_list:
         print("Finished inference for Architecture:", architecture)
     except Exception as e:
         print(architecture, "-", "An exception occurred:", str(e))
+
+
+# Build directory index for O(1) lookups of all architectures' predictions
+path_phase = os.path.join(config["path_results"], "phase_augmenting" + "." + \
+                          str(config["seed"]))
+for dataset in ["val-ensemble", "test"]:
+    index = Inference_Index(os.path.join(path_phase, "inference." + dataset + \
+                                         ".index.npz"))
+    index.build_directory(path_phase, dataset)
@@ -23,14 +23,14 @@
 # External libraries
 import argparse
 import os
-import time
 import json
 import pandas as pd
 import numpy as np
 from sklearn.utils import shuffle
 # Internal libraries/scripts
-from ensmic.data_loading import IO_Inference, architecture_list
-from ensmic.ensemble import ensembler_dict, ensembler
+from ensmic.data_loading import IO_Inference, architecture_list, load_ground_truth
+from ensmic.ensemble import ensembler, PredictionCube, Ensemble_Engine
+from ensmic.utils.parallel import process_pool
 
 #-----------------------------------------------------#
 #                      Argparser                      #
@@ -58,25 +58,33 @@ config["ensembler_list"] = ensembler
 
 # Cross-Validation Configurations
 config["k_fold"] = 5
+# Number of samples per chunk for streaming inference
+config["chunk_size"] = 10000
+# Number of processes for running (architecture, ensembler) jobs in parallel
+config["workers"] = os.cpu_count() or 1
+# Optional hyperparameters for ensemble learning techniques, e.g. approximate
+# Gaussian Process or SVM for large val-ensemble sets: {"mode": "nystroem"}
+config["ensembler_params"] = {"GaussianProcess": {"mode": "exact"},
+                             "SupportVectorMachine": {"mode": "exact"}}
 
 #-----------------------------------------------------#
 #                   Prepare Dataset                   #
 #-----------------------------------------------------#
 def prepare(architecture, label, config):
-    # Load ground truth dictionary & class list
-    path_gt = os.path.join(config["path_data"], config["seed"] + \
-                           "." + label + ".json")
-    with open(path_gt, "r") as json_reader:
-        gt_map = json.load(json_reader)
-    class_names = gt_map["legend"]
-    config["class_n"] = len(class_names)
-    config["class_list"] = class_names
-
     # Identify path to result architecture
     path_arch = os.path.join(config["path_results"], "phase_bagging" + "." + \
                              str(config["seed"]), architecture)
-    if not os.path.exists(os.path.join(path_arch, "ensemble")):
-        os.mkdir(os.path.join(path_arch, "ensemble"))
+    for subdir in ["ensemble", "inference"]:
+        if not os.path.exists(os.path.join(path_arch, subdir)):
+            os.mkdir(os.path.join(path_arch, subdir))
+    # Skip preparation if dataset was already prepared (resume)
+    path_cube = os.path.join(path_arch, "inference." + label + "." + "cube" + ".npz")
+    path_dsY = os.path.join(path_arch, "inference." + label + "." + "set_y" + ".csv")
+    if os.path.exists(path_cube) and os.path.exists(path_dsY) : return
+
+    # Load ground truth dictionary & class list
+    gt_map = load_ground_truth(config["path_data"], label, config["seed"])
+    class_names = gt_map["legend"]
 
     # Iterate over all folds
     inf_cache = {}
@@ -86,110 +94,188 @@ def prepare(architecture, label, config):
         # Load and return
         infIO = IO_Inference(None, path=path_ds)
         inf_cache["cv" + str(fold)] = infIO.load_inference()
-    # Convert to dataframe
-    dt_raw = pd.DataFrame.from_dict(inf_cache)
-
-    # Split inference tuple (for each class) into separate dataframes
-    dt_cv_list = []
-    for name, dt_cv in dt_raw.items():
-        class_list = [str(c) for c in range(0, len(class_names))]
-        colnames = [name + "_C" + c for c in class_list]
-        dt_split = pd.DataFrame(dt_cv.values.tolist(), columns=colnames)
-        dt_cv_list.append(dt_split)
-    # Concat inference dataframes of all architecture
-    dt_x = pd.concat(dt_cv_list, axis=1)
-    # Add sample names to dataframe
-    dt_x.set_index(dt_raw.index, inplace=True)
-
-    # Create ground truth dataframe
-    sample_list = dt_raw.index.tolist()
-    gt = [gt_map[sample] for sample in sample_list]
+    # Convert to prediction cube (samples, folds, classes)
+    cube = PredictionCube.from_inference(inf_cache, class_names)
+
+    # Create ground truth array
+    gt = [gt_map[sample] for sample in cube.samples]
     gt = np.argmax(np.asarray(gt), axis=-1)
-    dt_y = pd.DataFrame(gt, index=dt_raw.index, columns=["Ground_Truth"])
 
     # Shuffle rows
-    dt_x, dt_y = shuffle(dt_x, dt_y, random_state=0)
+    data, samples, gt = shuffle(cube.data, cube.samples, gt, random_state=0)
+    cube = PredictionCube(data, samples, cube.architectures, cube.class_list)
 
     # Store dataset to disk as CSV
+    dt_x = cube.to_dataframe()
+    dt_y = pd.DataFrame(gt, index=cube.samples, columns=["Ground_Truth"])
     path_dsX = os.path.join(path_arch, "inference." + label + "." + "set_x" + ".csv")
-    path_dsY = os.path.join(path_arch, "inference." + label + "." + "set_y" + ".csv")
     dt_x.to_csv(path_dsX, sep=",", header=True, index=True, index_label="index")
     dt_y.to_csv(path_dsY, sep=",", header=True, index=True, index_label="index")
+    # Store prediction cube to disk as NumPy archive (last, marks completion)
+    cube.store(path_cube)
 
 #-----------------------------------------------------#
-#                     Run Training                    #
+#                     Load Dataset                    #
 #-----------------------------------------------------#
-def run_training(ensembler, architecture, config):
-    # Load dataset for training
+def load_dataset(architecture, config):
+    # Identify path to result architecture
     path_arch = os.path.join(config["path_results"], "phase_bagging" + "." + \
                              str(config["seed"]), architecture)
-    train_x = pd.read_csv(os.path.join(path_arch, "inference." + "val-ensemble." + "set_x" + ".csv"),
-                          header=0, index_col="index")
+    # Load dataset for training once and precompute shared intermediates
+    train_x = PredictionCube.load(os.path.join(path_arch, "inference." + "val-ensemble." + "cube" + ".npz"))
     train_y = pd.read_csv(os.path.join(path_arch, "inference." + "val-ensemble." + "set_y" + ".csv"),
                           header=0, index_col="index")
-    # Create Ensemble Learning model
-    model = ensembler_dict[ensembler](n_classes=config["class_n"])
-    # Fit model on data
-    model.training(train_x, train_y)
-    # Dump fitted model to disk
-    path_model = os.path.join(path_arch, "ensemble", "model." + ensembler + ".pkl")
-    model.dump(path_model)
-    # Return fitted model and esembler path
-    return model
+    train_y = train_y["Ground_Truth"].to_numpy()
+    train_x.votes()
+    train_x.class_sum()
+    train_x.macro_f1(train_y)
+    # Load dataset for testing (memory-mapped for streaming inference)
+    test_x = PredictionCube.load(os.path.join(path_arch, "inference." + "test." + "cube" + ".npz"),
+                                 mmap_mode="r")
+    # Create (or resume) shared prediction file for all ensemblers
+    path_cube = os.path.join(path_arch, "inference", "inference.ensemble.pred.cube.npz")
+    path_work = os.path.join(path_arch, "inference", "inference.ensemble.pred.partial.npy")
+    if not os.path.exists(path_work):
+        shape = (test_x.n_samples, len(config["ensembler_list"]), test_x.n_classes)
+        preds = np.lib.format.open_memmap(path_work, mode="w+", dtype=np.float64,
+                                          shape=shape)
+        preds[:] = np.nan
+        # Restore predictions of already finished ensemblers
+        if os.path.exists(path_cube):
+            previous = PredictionCube.load(path_cube, mmap_mode="r")
+            for e, ens in enumerate(previous.architectures):
+                if ens in config["ensembler_list"]:
+                    preds[:, config["ensembler_list"].index(ens), :] = previous.data[:, e, :]
+        preds.flush()
+        del preds
+    # Return dataset
+    return {"train_x": train_x, "train_y": train_y, "test_x": test_x,
+            "path_arch": path_arch, "path_cube": path_cube,
+            "path_work": path_work}
 
 #-----------------------------------------------------#
-#                    Run Inference                    #
+#                  Identify Finished Jobs             #
 #-----------------------------------------------------#
-def run_inference(model, ensembler, architecture, config):
-    # Identify path to result architecture
+def is_finished(architecture, ensembler, config):
     path_arch = os.path.join(config["path_results"], "phase_bagging" + "." + \
                              str(config["seed"]), architecture)
-    if not os.path.exists(os.path.join(path_arch, "inference")):
-        os.mkdir(os.path.join(path_arch, "inference"))
+    # Inference is exported atomically after the model dump, thus marks completion
+    path_inf = os.path.join(path_arch, "inference", "inference." + ensembler + ".pred")
+    return os.path.exists(path_inf + ".npz") or os.path.exists(path_inf + ".json")
 
-    # Load dataset for testing
-    test_x = pd.read_csv(os.path.join(path_arch, "inference." + "test." + "set_x" + ".csv"),
-                         header=0, index_col="index")
+#-----------------------------------------------------#
+#           Run Training & Inference (Job)            #
+#-----------------------------------------------------#
+# Datasets of all architectures shared with forked workers
+datasets = {}
 
-    # Compute predictions via Ensemble Learning method
-    predictions = model.prediction(test_x)
+def share_datasets(shared):
+    datasets.update(shared)
 
-    # Create an Inference IO Interface
-    path_inf = os.path.join(path_arch, "inference", "inference." + ensembler + ".pred.json")
-    infIO = IO_Inference(config["class_list"], path=path_inf)
-    # Store prediction for each sample
-    samples = test_x.index.values.tolist()
-    infIO.store_inference(samples, predictions)
+def run_job(job):
+    architecture, ensembler, settings = job
+    dataset = datasets[architecture]
+    path_arch = dataset["path_arch"]
+    # Create engine for the single Ensemble Learning model
+    engine = Ensemble_Engine([ensembler], n_classes=settings["class_n"],
+                             ensembler_params=settings["ensembler_params"])
+    # Fit model on the shared data and dump it to disk
+    engine.training(dataset["train_x"], dataset["train_y"])
+    if ensembler not in engine.models:
+        return architecture, ensembler, None, "Training failed: " + \
+                                              engine.errors[ensembler]
+    engine.dump(lambda ensembler: os.path.join(path_arch, "ensemble",
+                                               "model." + ensembler + ".pkl"))
+
+    # Compute predictions chunk by chunk into the shared prediction file
+    test_x = dataset["test_x"]
+    e = settings["ensembler_list"].index(ensembler)
+    preds = np.load(dataset["path_work"], mmap_mode="r+")
+    start = 0
+    for chunk in engine.predict_stream(test_x.iter_chunks(settings["chunk_size"])):
+        preds[start:start+chunk.n_samples, e, :] = chunk.data[:, 0, :]
+        start += chunk.n_samples
+    preds.flush()
+    if ensembler in engine.failed:
+        return architecture, ensembler, None, "Inference failed: " + \
+                                              engine.errors[ensembler]
+
+    # Export predictions for the evaluation scripts (atomic, marks completion)
+    path_inf = os.path.join(path_arch, "inference", "inference." + ensembler + ".pred.npz")
+    chunk_size = settings["chunk_size"]
+    infIO = IO_Inference(settings["class_list"], path=path_inf)
+    infIO.store_inference_stream((test_x.samples[i:i+chunk_size].tolist(),
+                                  preds[i:i+chunk_size, e, :]) \
+                                 for i in range(0, len(test_x), chunk_size))
+    # Return time measurement
+    return architecture, ensembler, engine.timer_cache[ensembler], None
 
 #-----------------------------------------------------#
 #                     Main Runner                     #
 #-----------------------------------------------------#
-# Iterate over all architectures
+# Load class list
+gt_map = load_ground_truth(config["path_data"], "val-ensemble", config["seed"])
+config["class_list"] = gt_map["legend"]
+config["class_n"] = len(config["class_list"])
+# Settings passed to each job (independent of the process start method)
+settings = {key: config[key] for key in ["class_n", "class_list",
+                                         "ensembler_list", "ensembler_params",
+                                         "chunk_size"]}
+
+# Prepare and load datasets of each architecture only once
+jobs = []
 for architecture in architecture_list:
-    # Prepare dataset
     prepare(architecture, "val-ensemble", config)
     prepare(architecture, "test", config)
+    # Identify outstanding jobs (resume)
+    todo = [(architecture, ens, settings) for ens in config["ensembler_list"] \
+            if not is_finished(architecture, ens, config)]
+    path_work = os.path.join(config["path_results"], "phase_bagging" + "." + \
+                             str(config["seed"]), architecture, "inference",
+                             "inference.ensemble.pred.partial.npy")
+    if len(todo) == 0 and not os.path.exists(path_work) : continue
+    datasets[architecture] = load_dataset(architecture, config)
+    jobs.extend(todo)
 
-    # Run Training and Inference for all ensemble learning techniques
+# Run Training and Inference for all (architecture, ensembler) jobs
+print("Start running", len(jobs), "Ensembler jobs on", config["workers"], "workers")
+if config["workers"] == 1 or len(jobs) <= 1:
+    pool = None
+    results = map(run_job, jobs)
+else:
+    pool = process_pool(min(config["workers"], len(jobs)),
+                        initializer=share_datasets, initargs=(datasets,))
+    results = pool.imap_unordered(run_job, jobs)
+for i, (architecture, ensembler, timer, error) in enumerate(results):
+    if error is not None:
+        print("[" + str(i+1) + "/" + str(len(jobs)) + "]", architecture, "-",
+              ensembler, "-", "An exception occurred:", error)
+        continue
+    print("[" + str(i+1) + "/" + str(len(jobs)) + "]", architecture, "-",
+          "Finished running Ensembler:", ensembler, timer)
+    # Update time measurements on disk after each job
+    path_time = os.path.join(datasets[architecture]["path_arch"],
+                             "time_measurements.ensembler.json")
     timer_cache = {}
-    for ensembler in config["ensembler_list"]:
-        print(architecture, "- Start running Ensembler:", ensembler)
-        try:
-            # Run Pipeline
-            timer_start = time.time()
-            model = run_training(ensembler, architecture, config)
-            run_inference(model, ensembler, architecture, config)
-            timer_end = time.time()
-            # Store execution time in cache
-            timer_time = timer_end - timer_start
-            timer_cache[ensembler] = timer_time
-            print(architecture, "- Finished running Ensembler:", ensembler, timer_time)
-        except Exception as e:
-            print(architecture, ensembler, "-", "An exception occurred:", str(e))
-
-    # Store time measurements as JSON to disk
-    path_arch = os.path.join(config["path_results"], "phase_bagging" +  "." + str(config["seed"]),
-                             architecture)
-    path_time = os.path.join(path_arch, "time_measurements.ensembler.json")
-    with open(path_time, "w") as file:
-        json.dump(timer_cache, file, indent=2)
\ No newline at end of file
+    if os.path.exists(path_time):
+        with open(path_time, "r") as file:
+            timer_cache = json.load(file)
+    timer_cache[ensembler] = timer
+    with open(path_time + ".tmp", "w") as file:
+        json.dump(timer_cache, file, indent=2)
+    os.replace(path_time + ".tmp", path_time)
+if pool is not None:
+    pool.close()
+    pool.join()
+
+# Store predictions of all ensemblers into a single bulk file per architecture
+for architecture, dataset in datasets.items():
+    preds = np.load(dataset["path_work"], mmap_mode="r")
+    chunks = (preds[i:i+config["chunk_size"]] \
+              for i in range(0, len(preds), config["chunk_size"]))
+    PredictionCube.store_stream(dataset["path_cube"] + ".tmp", chunks,
+                                dataset["test_x"].samples,
+                                config["ensembler_list"], config["class_list"])
+    os.replace(dataset["path_cube"] + ".tmp", dataset["path_cube"])
+    del preds
+    os.remove(dataset["path_work"])
@@ -25,10 +25,9 @@ import argparse
 import os
 import pandas
 import numpy as np
-import json
 from plotnine import *
 # Internal libraries/scripts
-from ensmic.data_loading import IO_Inference, architecture_list
+from ensmic.data_loading import IO_Inference, architecture_list, load_ground_truth
 from ensmic.ensemble import ensembler
 from ensmic.utils.metrics import compute_metrics
 from ensmic.utils.categorical_averaging import macro_averaging, macro_average_roc
@@ -57,10 +56,7 @@ config["path_results"] = "results"
 config["seed"] = args.seed
 
 # Load class list
-path_gt = os.path.join(config["path_data"], config["seed"] + \
-                       "." + "test" + ".json")
-with open(path_gt, "r") as json_reader:
-    gt_map = json.load(json_reader)
+gt_map = load_ground_truth(config["path_data"], "test", config["seed"])
 config["class_list"] = gt_map["legend"]
 
 # Ensemble Learning Techniques
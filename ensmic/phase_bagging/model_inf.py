@@ -31,6 +31,7 @@ from aucmedi.neural_network.architectures import supported_standardize_mode, \
                                                  architecture_dict
 # ENSMIC libraries
 from ensmic.data_loading import IO_Inference, load_sampling, architecture_list
+from ensmic.data_loading.io_inference import resolve_path
 
 #-----------------------------------------------------#
 #                      Argparser                      #
@@ -63,6 +64,8 @@ config["batch_queue_size"] = 16
 # Neural Network Configurations
 config["workers"] = 32
 config["architecture"] = args.architecture
+# Number of samples per committed inference block (resumable on restart)
+config["commit_size"] = 2048
 
 # Cross-Validation Configurations
 config["k_fold"] = 5
@@ -75,6 +78,13 @@ os.environ["CUDA_VISIBLE_DEVICES"] = str(config["gpu_id"])
 #                   AUCMEDI Pipeline                  #
 #-----------------------------------------------------#
 def run_aucmedi(samples, dataset, fold, architecture, config, best_model=True):
+    # Get result subdirectory for current architecture
+    path_arch = os.path.join(config["path_results"], "phase_bagging" + "." + \
+                             config["seed"], architecture, "cv_" + str(fold))
+    # Skip dataset if inference has already been finished (any backend)
+    path_inf = os.path.join(path_arch, "inference" + "." + dataset + ".npz")
+    if os.path.exists(resolve_path(path_inf)) : return
+
     # Define Subfunctions
     sf_list = [Padding(mode="square")]
     # Set activation output to softmax for multi-class classification
@@ -96,33 +106,34 @@ def run_aucmedi(samples, dataset, fold, architecture, config, best_model=True):
     # Obtain standardization mode for current architecture
     sf_standardize = supported_standardize_mode[architecture]
 
-    # Initialize Data Generator for prediction
-    pred_gen = DataGenerator(samples, config["path_images"], labels=None,
-                             batch_size=config["batch_size"], img_aug=None,
-                             shuffle=False, subfunctions=sf_list,
-                             resize=input_shape, standardize_mode=sf_standardize,
-                             grayscale=False, prepare_images=False,
-                             sample_weights=None, seed=None,
-                             image_format=config["image_format"],
-                             workers=config["threads"])
-
-    # Get result subdirectory for current architecture
-    path_arch = os.path.join(config["path_results"], "phase_bagging" + "." + \
-                             config["seed"], architecture, "cv_" + str(fold))
-
     # Obtain trained model file
     if best_model : path_model = os.path.join(path_arch, "model.best.hdf5")
     else : path_model = os.path.join(path_arch, "model.last.hdf5")
     # Load trained model from disk
     model.load(path_model)
 
-    # Create an Inference IO Interface
-    path_inf = os.path.join(path_arch, "inference" + "." + dataset + ".json")
+    # Create an Inference IO Interface & open (or resume) append-mode writer
     infIO = IO_Inference(config["class_names"], path=path_inf)
-
-    # Compute predictions & store them to disk
-    preds = model.predict(pred_gen)
-    infIO.store_inference(samples, preds)
+    writer = infIO.open_writer()
+    done = writer.done()
+    remaining = [s for s in samples if s not in done]
+
+    # Compute predictions block by block & commit them to disk
+    for i in range(0, len(remaining), config["commit_size"]):
+        block = remaining[i:i+config["commit_size"]]
+        # Initialize Data Generator for prediction
+        pred_gen = DataGenerator(block, config["path_images"], labels=None,
+                                 batch_size=config["batch_size"], img_aug=None,
+                                 shuffle=False, subfunctions=sf_list,
+                                 resize=input_shape,
+                                 standardize_mode=sf_standardize,
+                                 grayscale=False, prepare_images=False,
+                                 sample_weights=None, seed=None,
+                                 image_format=config["image_format"],
+                                 workers=config["threads"])
+        writer.append(block, model.predict(pred_gen))
+    # Write final inference file & remove journal
+    writer.finalize()
 
 #-----------------------------------------------------#
 #               Setup Data IO Interface               #
@@ -37,7 +37,7 @@ from aucmedi.neural_network.architectures import supported_standardize_mode, \
 from aucmedi.data_processing.subfunctions import Padding
 from aucmedi.utils.class_weights import compute_class_weights
 # ENSMIC libraries
-from ensmic.data_loading import load_sampling
+from ensmic.data_loading import load_kfold
 
 #-----------------------------------------------------#
 #                      Argparser                      #
@@ -94,15 +94,10 @@ def run_aucmedi(fold, architecture, config):
     if os.path.exists(os.path.join(path_cv, "model.last.hdf5")):
         return
 
-    # Load sampling from disk
-    sampling_train = load_sampling(path_input=config["path_data"],
-                                   subset="cv" + str(fold) + "_train",
-                                   seed=config["seed"])
-    (x_train, y_train, nclasses, _, image_format) = sampling_train
-    sampling_val = load_sampling(path_input=config["path_data"],
-                                 subset="cv" + str(fold) + "_val",
-                                 seed=config["seed"])
-    (x_val, y_val, _, _, _) = sampling_val
+    # Load fold view of the cross-validation sampling from disk
+    sampling_cv = load_kfold(path_input=config["path_data"],
+                             seed=config["seed"], fold=fold)
+    (x_train, y_train, x_val, y_val, nclasses, _, image_format) = sampling_cv
 
     # Compute classweights
     _, class_weights_dict = compute_class_weights(y_train)
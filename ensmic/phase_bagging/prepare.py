@@ -26,7 +26,7 @@ import numpy as np
 # AUCMEDI libraries
 from aucmedi.sampling import sampling_kfold
 # ENSMIC libraries
-from ensmic.data_loading import load_sampling, sampling_to_disk
+from ensmic.data_loading import load_sampling, kfold_to_disk
 
 #-----------------------------------------------------#
 #                      Argparser                      #
@@ -82,10 +82,13 @@ y_ds = np.concatenate((y_train, y_val), axis=0)
 subsets = sampling_kfold(x_ds, y_ds, n_splits=config["k_fold"],
                          stratified=True, iterative=False, seed=0)
 
-# Store sampling to disk
+# Compute per-sample fold assignment (fold in which sample is validation)
+position = {sample: i for i, sample in enumerate(x_ds)}
+folds = np.zeros(len(x_ds), dtype=np.int8)
 for i, fold in enumerate(subsets):
-    (x_train, y_train, x_val, y_val) = fold
-    sample_sets = [(x_train, y_train), (x_val, y_val)]
-    setnames = ["cv" + str(i) + "_train", "cv" + str(i) + "_val"]
-    sampling_to_disk(sample_sets, setnames, class_names=config["class_names"],
-                     path_data=config["path_data"], seed=config["seed"])
+    (_, _, x_val, _) = fold
+    folds[[position[sample] for sample in x_val]] = i
+
+# Store fold assignment to disk
+kfold_to_disk(folds, ["train-model", "val-model"],
+              path_data=config["path_data"], seed=config["seed"])
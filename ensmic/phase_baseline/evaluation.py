@@ -23,12 +23,12 @@
 # External libraries
 import argparse
 import os
-import json
 import pandas
 import numpy as np
 from plotnine import *
 # Internal libraries/scripts
-from ensmic.data_loading import IO_Inference, architecture_list, architecture_params
+from ensmic.data_loading import IO_Inference, architecture_list, architecture_params, \
+                                load_ground_truth
 from ensmic.utils.metrics import compute_metrics, compute_rawCM
 from ensmic.utils.categorical_averaging import macro_averaging, macro_average_roc
 # Experimental
@@ -60,10 +60,7 @@ config["seed"] = args.seed
 #-----------------------------------------------------#
 def preprocessing(architecture, dataset, config):
     # Load ground truth dictionary
-    path_gt = os.path.join(config["path_data"], config["seed"] + \
-                           "." + dataset + ".json")
-    with open(path_gt, "r") as json_reader:
-        gt_map = json.load(json_reader)
+    gt_map = load_ground_truth(config["path_data"], dataset, config["seed"])
     # Get result subdirectory for current architecture
     path_arch = os.path.join(config["path_results"], "phase_baseline" + "." + \
                              config["seed"], architecture)
@@ -30,7 +30,9 @@ from aucmedi.data_processing.subfunctions import Padding
 from aucmedi.neural_network.architectures import supported_standardize_mode, \
                                                  architecture_dict
 # ENSMIC libraries
-from ensmic.data_loading import IO_Inference, load_sampling, architecture_list
+from ensmic.data_loading import IO_Inference, Inference_Index, load_sampling, \
+                                architecture_list
+from ensmic.data_loading.io_inference import resolve_path
 
 #-----------------------------------------------------#
 #                      Argparser                      #
@@ -60,6 +62,8 @@ config["batch_size"] = 28
 config["batch_queue_size"] = 16
 # Neural Network Configurations
 config["workers"] = 16
+# Number of samples per committed inference block (resumable on restart)
+config["commit_size"] = 2048
 
 # Adjust GPU configuration
 config["gpu_id"] = int(args.gpu)
@@ -69,6 +73,13 @@ os.environ["CUDA_VISIBLE_DEVICES"] = str(config["gpu_id"])
 #                   AUCMEDI Pipeline                  #
 #-----------------------------------------------------#
 def run_aucmedi(samples, dataset, architecture, config, best_model=True):
+    # Get result subdirectory for current architecture
+    path_arch = os.path.join(config["path_results"], "phase_baseline" + "." + \
+                             config["seed"], architecture)
+    # Skip dataset if inference has already been finished (any backend)
+    path_inf = os.path.join(path_arch, "inference" + "." + dataset + ".npz")
+    if os.path.exists(resolve_path(path_inf)) : return
+
     # Define Subfunctions
     sf_list = [Padding(mode="square")]
     # Set activation output to softmax for multi-class classification
@@ -90,33 +101,34 @@ def run_aucmedi(samples, dataset, architecture, config, best_model=True):
     # Obtain standardization mode for current architecture
     sf_standardize = supported_standardize_mode[architecture]
 
-    # Initialize Data Generator for prediction
-    pred_gen = DataGenerator(samples, config["path_images"], labels=None,
-                             batch_size=config["batch_size"], img_aug=None,
-                             shuffle=False, subfunctions=sf_list,
-                             resize=input_shape, standardize_mode=sf_standardize,
-                             grayscale=False, prepare_images=False,
-                             sample_weights=None, seed=None,
-                             image_format=config["image_format"],
-                             workers=config["threads"])
-
-    # Get result subdirectory for current architecture
-    path_arch = os.path.join(config["path_results"], "phase_baseline" + "." + \
-                             config["seed"], architecture)
-
     # Obtain trained model file
     if best_model : path_model = os.path.join(path_arch, "model.best.hdf5")
     else : path_model = os.path.join(path_arch, "model.last.hdf5")
     # Load trained model from disk
     model.load(path_model)
 
-    # Create an Inference IO Interface
-    path_inf = os.path.join(path_arch, "inference" + "." + dataset + ".json")
+    # Create an Inference IO Interface & open (or resume) append-mode writer
     infIO = IO_Inference(config["class_names"], path=path_inf)
-
-    # Compute predictions & store them to disk
-    preds = model.predict(pred_gen)
-    infIO.store_inference(samples, preds)
+    writer = infIO.open_writer()
+    done = writer.done()
+    remaining = [s for s in samples if s not in done]
+
+    # Compute predictions block by block & commit them to disk
+    for i in range(0, len(remaining), config["commit_size"]):
+        block = remaining[i:i+config["commit_size"]]
+        # Initialize Data Generator for prediction
+        pred_gen = DataGenerator(block, config["path_images"], labels=None,
+                                 batch_size=config["batch_size"], img_aug=None,
+                                 shuffle=False, subfunctions=sf_list,
+                                 resize=input_shape,
+                                 standardize_mode=sf_standardize,
+                                 grayscale=False, prepare_images=False,
+                                 sample_weights=None, seed=None,
+                                 image_format=config["image_format"],
+                                 workers=config["threads"])
+        writer.append(block, model.predict(pred_gen))
+    # Write final inference file & remove journal
+    writer.finalize()
 
 #-----------------------------------------------------#
 #               Setup Data IO Interface               #
@@ -151,4 +163,12 @@ for architecture in architecture_list:
         run_aucmedi(x_test, "test", architecture, config, best_model=True)
         print("Finished inference for Architecture:", architecture)
     except Exception as e:
-        print(architecture, "-", "An exception occurred:", str(e))
\ No newline at end of file
+        print(architecture, "-", "An exception occurred:", str(e))
+
+# Build directory index for O(1) lookups of all architectures' predictions
+path_phase = os.path.join(config["path_results"], "phase_baseline" + "." + \
+                          str(config["seed"]))
+for dataset in ["val-ensemble", "test"]:
+    index = Inference_Index(os.path.join(path_phase, "inference." + dataset + \
+                                         ".index.npz"))
+    index.build_directory(path_phase, dataset)
@@ -0,0 +1,154 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import argparse
+import os
+import time
+import json
+import numpy as np
+# AUCMEDI libraries
+from aucmedi import DataGenerator, Neural_Network
+from aucmedi.data_processing.subfunctions import Padding
+from aucmedi.neural_network.architectures import supported_standardize_mode, \
+                                                 architecture_dict
+# ENSMIC libraries
+from ensmic.data_loading import IO_Inference, load_sampling
+from ensmic.ensemble import Cascade_Ensemble
+
+#-----------------------------------------------------#
+#                      Argparser                      #
+#-----------------------------------------------------#
+parser = argparse.ArgumentParser(description="Analysis of COVID-19 Classification via Ensemble Learning")
+parser.add_argument("-m", "--modularity", help="Data modularity selection: ['covid', 'isic', 'chmnist', 'drd']",
+                    required=True, type=str, dest="seed")
+parser.add_argument("-g", "--gpu", help="GPU ID selection for multi cluster",
+                    required=False, type=int, dest="gpu", default=0)
+args = parser.parse_args()
+
+#-----------------------------------------------------#
+#                    Configurations                   #
+#-----------------------------------------------------#
+# Initialize configuration dictionary
+config = {}
+# Path to data directory
+config["path_data"] = "data"
+# Path to result directory
+config["path_results"] = "results"
+# Seed (if training multiple runs)
+config["seed"] = args.seed
+
+# Preprocessor Configurations
+config["threads"] = 16
+config["batch_size"] = 28
+config["batch_queue_size"] = 16
+# Neural Network Configurations
+config["workers"] = 16
+
+# Adjust GPU configuration
+config["gpu_id"] = int(args.gpu)
+os.environ["CUDA_VISIBLE_DEVICES"] = str(config["gpu_id"])
+
+#-----------------------------------------------------#
+#                   AUCMEDI Pipeline                  #
+#-----------------------------------------------------#
+def run_aucmedi(architecture, samples):
+    # Skip model execution if all samples exited the cascade already
+    if len(samples) == 0 : return np.zeros((0, config["nclasses"]))
+    # Define Subfunctions
+    sf_list = [Padding(mode="square")]
+    # Initialize architecture
+    nn_arch = architecture_dict[architecture](channels=3)
+    input_shape = nn_arch.input[:-1]
+    # Initialize model
+    model = Neural_Network(config["nclasses"], channels=3, architecture=nn_arch,
+                           workers=config["workers"], multiprocessing=False,
+                           batch_queue_size=config["batch_queue_size"],
+                           activation_output="softmax",
+                           loss="categorical_crossentropy",
+                           pretrained_weights=False)
+    # Load trained model from phase one
+    model.load(os.path.join(config["path_results"], "phase_baseline" + "." + \
+                            config["seed"], architecture, "model.best.hdf5"))
+    # Initialize Data Generator for prediction of remaining samples only
+    pred_gen = DataGenerator(samples, config["path_images"], labels=None,
+                             batch_size=config["batch_size"], img_aug=None,
+                             shuffle=False, subfunctions=sf_list,
+                             resize=input_shape,
+                             standardize_mode=supported_standardize_mode[architecture],
+                             grayscale=False, prepare_images=False,
+                             sample_weights=None, seed=None,
+                             image_format=config["image_format"],
+                             workers=config["threads"])
+    # Compute predictions and measure execution time
+    timer_start = time.time()
+    preds = model.predict(pred_gen)
+    timer_cache[architecture] = {"samples": len(samples),
+                                 "time": time.time() - timer_start}
+    print("Finished inference for Architecture:", architecture,
+          "on", len(samples), "samples")
+    return preds
+
+#-----------------------------------------------------#
+#               Setup Data IO Interface               #
+#-----------------------------------------------------#
+# Load sampling from disk
+sampling_test = load_sampling(path_input=config["path_data"],
+                              subset="test",
+                              seed=config["seed"])
+(x_test, _, nclasses, class_names, image_format) = sampling_test
+
+# Parse information to config
+config["nclasses"] = nclasses
+config["class_names"] = class_names
+config["image_format"] = image_format
+config["path_images"] = os.path.join(config["path_data"],
+                                     config["seed"] + ".images")
+
+#-----------------------------------------------------#
+#                     Main Runner                     #
+#-----------------------------------------------------#
+# Identify phase results directory
+path_phase = os.path.join(config["path_results"],
+                          "phase_cascade" + "." + str(config["seed"]))
+# Load calibrated cascade from the offline simulation
+cascade = Cascade_Ensemble([])
+cascade.load(os.path.join(path_phase, "cascade.model"))
+print("Start running Cascade:", cascade.architectures)
+
+# Run cascade which only executes architectures for unresolved samples
+timer_cache = {}
+preds, exit_stage = cascade.run(x_test, run_aucmedi)
+
+# Store pooled predictions to disk
+path_inf = os.path.join(path_phase, "inference" + "." + "test" + ".npz")
+infIO = IO_Inference(config["class_names"], path=path_inf)
+infIO.store_inference(list(x_test), preds)
+
+# Store exit rates and time measurements as JSON to disk
+exit_rate = np.bincount(exit_stage, minlength=len(cascade.architectures)) \
+            / len(exit_stage)
+results = {"exit_rate": dict(zip(cascade.architectures, exit_rate.tolist())),
+           "time_measurements": timer_cache}
+path_json = os.path.join(path_phase, "cascade.test.json")
+with open(path_json, "w") as file:
+    json.dump(results, file, indent=2)
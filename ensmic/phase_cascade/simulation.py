@@ -0,0 +1,159 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import argparse
+import os
+import json
+import numpy as np
+import pandas as pd
+# Internal libraries/scripts
+from ensmic.data_loading import IO_Inference, architecture_list, \
+                                architecture_params, load_ground_truth
+from ensmic.data_loading.io_inference import resolve_path
+from ensmic.ensemble import PredictionCube, Cascade_Ensemble
+from ensmic.utils.metrics import compute_macro_f1
+
+#-----------------------------------------------------#
+#                      Argparser                      #
+#-----------------------------------------------------#
+parser = argparse.ArgumentParser(description="Analysis of COVID-19 Classification via Ensemble Learning")
+parser.add_argument("-m", "--modularity", help="Data modularity selection: ['covid', 'isic', 'chmnist', 'drd']",
+                    required=True, type=str, dest="seed")
+parser.add_argument("-c", "--criterion", help="Gating criterion of the deployed cascade: ['confidence', 'margin']",
+                    required=False, type=str, dest="criterion", default="confidence")
+parser.add_argument("-t", "--tolerance", help="Tolerated fraction of additional errors of the deployed cascade",
+                    required=False, type=float, dest="tolerance", default=0.01)
+args = parser.parse_args()
+
+#-----------------------------------------------------#
+#                    Configurations                   #
+#-----------------------------------------------------#
+# Initialize configuration dictionary
+config = {}
+# Path to data directory
+config["path_data"] = "data"
+# Path to result directory
+config["path_results"] = "results"
+# Seed (if training multiple runs)
+config["seed"] = args.seed
+# List of architectures which inferences should be included into the cascade
+config["architecture_list"] = architecture_list
+# Measured inference costs (latency in ms), parameter counts as fallback
+config["path_costs"] = os.path.join(config["path_results"],
+                                    "benchmark.architecture_costs.json")
+# Simulated gating criteria and error tolerances
+config["criteria"] = ["confidence", "margin"]
+config["tolerances"] = [0.0, 0.005, 0.01, 0.02, 0.05, 0.1]
+# Configuration of the deployed cascade
+config["criterion"] = args.criterion
+config["tolerance"] = args.tolerance
+
+#-----------------------------------------------------#
+#            Prepare Result File Structure            #
+#-----------------------------------------------------#
+# Create subdirectory for phase
+path_phase = os.path.join(config["path_results"],
+                          "phase_cascade" + "." + str(config["seed"]))
+if not os.path.exists(path_phase) : os.mkdir(path_phase)
+
+#-----------------------------------------------------#
+#                  Data Loading                       #
+#-----------------------------------------------------#
+def load_dataset(subset, architectures):
+    # Load inferences of each architecture from phase one
+    inference = {}
+    for arch in architectures:
+        path_inf = os.path.join(config["path_results"],
+                                "phase_baseline" + "." + str(config["seed"]),
+                                arch, "inference." + subset + ".json")
+        infIO = IO_Inference(None, path=path_inf)
+        inference[arch] = infIO.load_inference()
+        class_list = infIO.load_inference(index="legend")
+    cube = PredictionCube.from_inference(inference, class_list)
+    # Load ground truth in cube order
+    gt_map = load_ground_truth(config["path_data"], subset, config["seed"])
+    labels = np.argmax(np.asarray([gt_map[s] for s in cube.samples]), axis=-1)
+    # Return cube and labels
+    return cube, labels
+
+#-----------------------------------------------------#
+#                     Main Runner                     #
+#-----------------------------------------------------#
+# Obtain inference cost of each architecture
+if os.path.exists(config["path_costs"]):
+    with open(config["path_costs"], "r") as file:
+        measurements = json.load(file)["results"]
+    costs = {a: measurements[a]["latency_ms"] for a in measurements}
+    config["cost_unit"] = "latency_ms"
+else:
+    costs = architecture_params
+    config["cost_unit"] = "params"
+
+# Identify architectures with available inference and costs
+archs = []
+for arch in config["architecture_list"]:
+    path_inf = os.path.join(config["path_results"],
+                            "phase_baseline" + "." + str(config["seed"]),
+                            arch, "inference." + "test" + ".json")
+    if os.path.exists(resolve_path(path_inf)) and arch in costs : archs.append(arch)
+    else : print("Skipping architecture:", arch)
+# Run cheap architectures first
+archs = sorted(archs, key=lambda a: costs[a])
+arch_costs = [costs[a] for a in archs]
+
+# Load val-ensemble for calibration and test set for simulation
+val_x, val_y = load_dataset("val-ensemble", archs)
+test_x, test_y = load_dataset("test", archs)
+
+# Reference: complete ensemble (mean of all architectures)
+pred_all = np.argmax(test_x.class_sum(), axis=-1)
+rows = [{"criterion": "none", "tolerance": None, "mean_cost": sum(arch_costs),
+         "F1": float(compute_macro_f1(test_y, pred_all, test_x.n_classes)[0])}]
+# Simulate cascade for each criterion and tolerance
+for criterion in config["criteria"]:
+    for tolerance in config["tolerances"]:
+        cascade = Cascade_Ensemble(archs, costs=arch_costs, criterion=criterion,
+                                   tolerance=tolerance)
+        cascade.calibrate(val_x, val_y)
+        results = cascade.simulate(test_x, test_y)
+        row = {"criterion": criterion, "tolerance": tolerance,
+               "mean_cost": results["mean_cost"], "F1": results["f1"]}
+        for arch, rate in zip(archs, results["exit_rate"]):
+            row["exit_" + arch] = rate
+        rows.append(row)
+table = pd.DataFrame(rows)
+table["relative_cost"] = table["mean_cost"] / sum(arch_costs)
+print(table[["criterion", "tolerance", "mean_cost", "relative_cost",
+             "F1"]].to_string(index=False))
+
+# Store simulation table to disk as CSV
+path_table = os.path.join(path_phase, "simulation.csv")
+table.to_csv(path_table, sep=",", header=True, index=False)
+
+# Calibrate and store deployed cascade for the online runner
+cascade = Cascade_Ensemble(archs, costs=arch_costs,
+                           criterion=config["criterion"],
+                           tolerance=config["tolerance"])
+cascade.calibrate(val_x, val_y)
+cascade.dump(os.path.join(path_phase, "cascade.model"))
+print("Calibrated cascade:", dict(zip(archs, cascade.thresholds)))
@@ -0,0 +1,182 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import argparse
+import os
+import json
+import numpy as np
+import pandas as pd
+# Internal libraries/scripts
+from ensmic.ensemble import ensembler, ensembler_dict, PredictionCube
+from ensmic.ensemble.composition import search_subsets, \
+                                        evaluate_compositions, pareto_front
+from ensmic.utils.metrics import compute_macro_f1
+
+#-----------------------------------------------------#
+#                      Argparser                      #
+#-----------------------------------------------------#
+parser = argparse.ArgumentParser(description="Analysis of COVID-19 Classification via Ensemble Learning")
+parser.add_argument("-m", "--modularity", help="Data modularity selection: ['covid', 'isic', 'chmnist', 'drd']",
+                    required=True, type=str, dest="seed")
+parser.add_argument("-b", "--budget", help="Inference cost budget per image (in unit of cost mode)",
+                    required=True, type=float, dest="budget")
+parser.add_argument("-u", "--unit", help="Cost mode: ['latency', 'flops']",
+                    required=False, type=str, dest="unit", default="latency")
+parser.add_argument("-c", "--costs", help="Path to measured architecture costs (benchmark.architecture_costs.json)",
+                    required=False, type=str, dest="costs",
+                    default=os.path.join("results", "benchmark.architecture_costs.json"))
+parser.add_argument("-w", "--beam", help="Number of architecture subsets kept per beam search step",
+                    required=False, type=int, dest="beam", default=8)
+args = parser.parse_args()
+
+#-----------------------------------------------------#
+#                    Configurations                   #
+#-----------------------------------------------------#
+# Initialize configuration dictionary
+config = {}
+# Path to result directory
+config["path_results"] = "results"
+# Seed (if training multiple runs)
+config["seed"] = args.seed
+# Inference cost budget per image and cost mode (latency in ms or FLOPs)
+config["budget"] = args.budget
+config["unit"] = args.unit
+config["cost_key"] = {"latency": "latency_ms", "flops": "flops"}[args.unit]
+# Path to measured costs of each architecture
+config["path_costs"] = args.costs
+# Beam width of the architecture subset search
+config["beam_width"] = args.beam
+# Number of cross-validation folds on val-ensemble for scoring compositions
+config["n_folds"] = 3
+# List of ensemble learning techniques
+config["ensembler_list"] = ensembler
+# Approximate kernel methods, as each composition is fitted once per fold
+config["ensembler_params"] = {"GaussianProcess": {"mode": "nystroem"},
+                             "SupportVectorMachine": {"mode": "nystroem"}}
+# Number of processes for running ensemblers in parallel
+config["workers"] = min(len(ensembler), os.cpu_count() or 1)
+
+#-----------------------------------------------------#
+#                  Data Loading                       #
+#-----------------------------------------------------#
+def load_dataset(path_phase, subset):
+    # Load prediction cube (samples, architectures, classes)
+    cube = PredictionCube.load(os.path.join(path_phase, "phase_baseline.inference." + \
+                                            subset + "." + "cube" + ".npz"))
+    # Load ground truth in cube order
+    labels = pd.read_csv(os.path.join(path_phase, "phase_baseline.inference." + \
+                                      subset + "." + "set_y" + ".csv"),
+                         header=0, index_col="index", dtype={"index": str})
+    labels = labels.loc[cube.samples, "Ground_Truth"].to_numpy()
+    # Return cube and labels
+    return cube, labels
+
+def restrict(cube, architectures):
+    # Restrict prediction cube to the given architectures
+    index = [cube.architectures.index(a) for a in architectures]
+    return PredictionCube(cube.data[:, index, :], cube.samples, architectures,
+                          cube.class_list)
+
+#-----------------------------------------------------#
+#                     Main Runner                     #
+#-----------------------------------------------------#
+# Identify phase results directory
+path_phase = os.path.join(config["path_results"],
+                          "phase_stacking" + "." + str(config["seed"]))
+# Load val-ensemble for the search and test set for reporting
+train_x, train_y = load_dataset(path_phase, "val-ensemble")
+test_x, test_y = load_dataset(path_phase, "test")
+
+# Load measured costs and restrict search to measured architectures
+with open(config["path_costs"], "r") as file:
+    measurements = json.load(file)["results"]
+archs = [a for a in train_x.architectures if a in measurements]
+for arch in train_x.architectures:
+    if arch not in archs : print("Skipping architecture without costs:", arch)
+train_x = restrict(train_x, archs)
+costs = np.asarray([measurements[a][config["cost_key"]] for a in archs])
+
+# Search architecture subsets within budget via beam search
+subsets = search_subsets(train_x, train_y, costs, config["budget"],
+                         beam_width=config["beam_width"])
+print("Scoring", len(subsets), "architecture subsets with",
+      len(config["ensembler_list"]), "ensemblers")
+# Score each subset in combination with each ensembler via cross-validation
+results = evaluate_compositions(train_x, train_y, [s[0] for s in subsets],
+                                config["ensembler_list"],
+                                ensembler_params=config["ensembler_params"],
+                                n_folds=config["n_folds"],
+                                n_workers=config["workers"])
+
+# Create Pareto table of cost and cross-validated score
+table = pd.DataFrame(results)
+table["cost"] = [sum(measurements[a][config["cost_key"]] for a in row) \
+                 for row in table["architectures"]]
+# Ensembler latency is only relevant for a latency budget
+if config["unit"] == "latency" : table["cost"] += table["latency_ms"]
+table["feasible"] = table["cost"] <= config["budget"]
+table["pareto"] = pareto_front(table["cost"], table["score"])
+table = table.sort_values(["cost", "score"], ascending=[True, False])
+table["architectures"] = table["architectures"].apply(lambda x: ";".join(x))
+path_table = os.path.join(path_phase, "composition.pareto.csv")
+table.to_csv(path_table, sep=",", header=True, index=False)
+print(table[table["pareto"]].to_string(index=False))
+
+# Select best feasible composition (cheaper composition on ties)
+feasible = table[table["feasible"]]
+if len(feasible) == 0:
+    raise ValueError("No composition satisfies the budget: " + \
+                     str(config["budget"]))
+best = feasible.sort_values(["score", "cost"], ascending=[False, True]).iloc[0]
+best_archs = best["architectures"].split(";")
+best_ensembler = best["ensembler"]
+
+# Fit selected ensembler on complete val-ensemble of selected architectures
+params = config["ensembler_params"].get(best_ensembler, {})
+model = ensembler_dict[best_ensembler](n_classes=train_x.n_classes, **params)
+model.training(restrict(train_x, best_archs), train_y)
+path_comp = os.path.join(path_phase, "composition")
+if not os.path.exists(path_comp) : os.mkdir(path_comp)
+path_model = os.path.join(path_comp, "model.pkl")
+model.dump(path_model)
+# Report score of selected composition on test set
+pred = np.argmax(model.prediction(restrict(test_x, best_archs)), axis=-1)
+score_test = float(compute_macro_f1(test_y, pred, test_x.n_classes)[0])
+
+# Store deployable configuration as JSON to disk
+deployment = {"seed": config["seed"],
+              "unit": config["unit"],
+              "budget": config["budget"],
+              "architectures": best_archs,
+              "ensembler": best_ensembler,
+              "ensembler_params": params,
+              "model": path_model,
+              "cost": float(best["cost"]),
+              "F1_cv": float(best["score"]),
+              "F1_test": score_test}
+path_json = os.path.join(path_phase, "composition.config.json")
+with open(path_json, "w") as file:
+    json.dump(deployment, file, indent=2)
+print("Selected composition:", best_archs, best_ensembler,
+      "-> cost:", deployment["cost"], "| F1 (cv/test):",
+      deployment["F1_cv"], score_test)
@@ -0,0 +1,102 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import argparse
+import os
+import pandas as pd
+# Internal libraries/scripts
+from ensmic.ensemble import PredictionCube
+from ensmic.ensemble.hyperparameter_search import Hyperparameter_Search, \
+     search_spaces, create_folds, store_folds, load_folds, \
+     load_hyperparameters, store_hyperparameters
+
+#-----------------------------------------------------#
+#                      Argparser                      #
+#-----------------------------------------------------#
+parser = argparse.ArgumentParser(description="Analysis of COVID-19 Classification via Ensemble Learning")
+parser.add_argument("-m", "--modularity", help="Data modularity selection: ['covid', 'isic', 'chmnist', 'drd']",
+                    required=True, type=str, dest="seed")
+parser.add_argument("-s", "--search", help="Search mode: ['halving', 'hyperband']",
+                    required=False, type=str, dest="search", default="hyperband")
+parser.add_argument("-f", "--force", help="Search again even if a configuration is already stored",
+                    required=False, action="store_true", dest="force")
+args = parser.parse_args()
+
+#-----------------------------------------------------#
+#                    Configurations                   #
+#-----------------------------------------------------#
+# Initialize configuration dictionary
+config = {}
+# Path to result directory
+config["path_results"] = "results"
+# Seed (if training multiple runs)
+config["seed"] = args.seed
+# List of ensemble learning techniques with a search space
+config["ensembler_list"] = list(search_spaces.keys())
+# Fixed hyperparameters which are not searched (same as in train_inf.py)
+config["ensembler_params"] = {"SupportVectorMachine": {"mode": "exact"}}
+# Search configurations
+config["search"] = args.search
+config["eta"] = 3
+config["k_fold"] = 3
+# Number of processes for evaluating configurations in parallel
+config["workers"] = os.cpu_count() or 1
+
+#-----------------------------------------------------#
+#                     Main Runner                     #
+#-----------------------------------------------------#
+# Identify phase results directory
+path_phase = os.path.join(config["path_results"],
+                          "phase_stacking" + "." + str(config["seed"]))
+path_json = os.path.join(path_phase, "hyperparameters.json")
+# Load stacking matrix of val-ensemble
+train_x = PredictionCube.load(os.path.join(path_phase, "phase_baseline.inference." + \
+                                           "val-ensemble." + "cube" + ".npz"))
+train_y = pd.read_csv(os.path.join(path_phase, "phase_baseline.inference." + \
+                                   "val-ensemble." + "set_y" + ".csv"),
+                      header=0, index_col="index", dtype={"index": str})
+train_y = train_y.loc[train_x.samples, "Ground_Truth"].to_numpy()
+
+# Load cached cross-validation folds or create them once
+path_folds = os.path.join(path_phase, "hyperparameters.folds.npz")
+folds = load_folds(path_folds, train_x.n_samples, config["k_fold"])
+if folds is None:
+    folds = create_folds(train_y, n_folds=config["k_fold"])
+    store_folds(path_folds, folds)
+
+# Run search for each ensembler without a stored configuration
+stored = load_hyperparameters(path_json)
+for ensembler in config["ensembler_list"]:
+    if ensembler in stored and not args.force:
+        print("Reusing configuration of Ensembler:", ensembler, stored[ensembler])
+        continue
+    print("Start searching Ensembler:", ensembler)
+    search = Hyperparameter_Search(ensembler, train_x.n_classes,
+                                   base_params=config["ensembler_params"].get(ensembler, {}),
+                                   mode=config["search"], eta=config["eta"],
+                                   n_workers=config["workers"])
+    result = search.run(train_x, train_y, folds)
+    result["search"] = config["search"]
+    # Persist best configuration for later runs
+    store_hyperparameters(path_json, ensembler, result)
+    print("Finished searching Ensembler:", ensembler, result)
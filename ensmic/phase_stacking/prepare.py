@@ -25,11 +25,10 @@ import argparse
 import os
 import pandas as pd
 import numpy as np
-import json
 from sklearn.utils import shuffle
 # Internal libraries/scripts
-from ensmic.data_loading import IO_Inference
-from ensmic.ensemble import ensembler_dict, ensembler
+from ensmic.data_loading import IO_Inference, load_ground_truth
+from ensmic.ensemble import ensembler_dict, ensembler, PredictionCube
 from ensmic.data_loading import architecture_list
 
 #-----------------------------------------------------#
@@ -105,38 +104,27 @@ for arch in config["architecture_list"]:
 #                   Create dataset                    #
 #-----------------------------------------------------#
 def create_dataset(dt, label):
-    # Create dataset and save to disk
-    dt_raw = pd.DataFrame.from_dict(dt)
-
-    # Split inference tuple (for each class) into separate dataframes
-    dt_arch_list = []
-    for name, arch_dt in dt_raw.items():
-        class_list = [str(c) for c in range(0, len(config["class_list"]))]
-        colnames = [name + "_C" + c for c in class_list]
-        dt_split = pd.DataFrame(arch_dt.values.tolist(), columns=colnames)
-        dt_arch_list.append(dt_split)
-    # Concat inference dataframes of all architecture
-    dt_x = pd.concat(dt_arch_list, axis=1)
-    # Add sample names to dataframe
-    dt_x.set_index(dt_raw.index, inplace=True)
-
+    # Create prediction cube (samples, architectures, classes)
+    cube = PredictionCube.from_inference(dt, config["class_list"])
 
     # Load ground truth dictionary
-    path_gt = os.path.join(config["path_data"], config["seed"] + \
-                           "." + label + ".json")
-    with open(path_gt, "r") as json_reader:
-        gt_map = json.load(json_reader)
+    gt_map = load_ground_truth(config["path_data"], label, config["seed"])
 
-    # Create ground truth dataframe
-    sample_list = dt_raw.index.tolist()
-    gt = [gt_map[sample] for sample in sample_list]
+    # Create ground truth array
+    gt = [gt_map[sample] for sample in cube.samples]
     gt = np.argmax(np.asarray(gt), axis=-1)
-    dt_y = pd.DataFrame(gt, index=dt_raw.index, columns=["Ground_Truth"])
 
     # Shuffle rows
-    dt_x, dt_y = shuffle(dt_x, dt_y, random_state=0)
+    data, samples, gt = shuffle(cube.data, cube.samples, gt, random_state=0)
+    cube = PredictionCube(data, samples, cube.architectures, cube.class_list)
 
+    # Store prediction cube to disk as NumPy archive
+    path_cube = os.path.join(path_phase, "phase_baseline.inference." + \
+                             label + "." + "cube" + ".npz")
+    cube.store(path_cube)
     # Store dataset to disk as CSV
+    dt_x = cube.to_dataframe()
+    dt_y = pd.DataFrame(gt, index=cube.samples, columns=["Ground_Truth"])
     path_dsX = os.path.join(path_phase, "phase_baseline.inference." + \
                             label + "." + "set_x" + ".csv")
     path_dsY = os.path.join(path_phase, "phase_baseline.inference." + \
@@ -0,0 +1,130 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import argparse
+import os
+import json
+import numpy as np
+import pandas as pd
+# Internal libraries/scripts
+from ensmic.data_loading import architecture_params
+from ensmic.ensemble import PredictionCube, ensembler_dict
+from ensmic.utils.metrics import compute_macro_f1
+
+#-----------------------------------------------------#
+#                      Argparser                      #
+#-----------------------------------------------------#
+parser = argparse.ArgumentParser(description="Analysis of COVID-19 Classification via Ensemble Learning")
+parser.add_argument("-m", "--modularity", help="Data modularity selection: ['covid', 'isic', 'chmnist', 'drd']",
+                    required=True, type=str, dest="seed")
+parser.add_argument("-i", "--iterations", help="Number of greedy selection iterations",
+                    required=False, type=int, dest="iterations", default=25)
+parser.add_argument("-s", "--metric", help="Selection metric: ['f1', 'logloss']",
+                    required=False, type=str, dest="metric", default="f1")
+args = parser.parse_args()
+
+#-----------------------------------------------------#
+#                    Configurations                   #
+#-----------------------------------------------------#
+# Initialize configuration dictionary
+config = {}
+# Path to result directory
+config["path_results"] = "results"
+# Seed (if training multiple runs)
+config["seed"] = args.seed
+# Number of greedy selection iterations (selection with replacement)
+config["n_iterations"] = args.iterations
+# Metric which is maximized during selection
+config["metric"] = args.metric
+
+#-----------------------------------------------------#
+#                  Data Loading                       #
+#-----------------------------------------------------#
+def load_dataset(path_phase, subset):
+    # Load prediction cube (samples, architectures, classes)
+    cube = PredictionCube.load(os.path.join(path_phase, "phase_baseline.inference." + \
+                                            subset + "." + "cube" + ".npz"))
+    # Load ground truth in cube order
+    labels = pd.read_csv(os.path.join(path_phase, "phase_baseline.inference." + \
+                                      subset + "." + "set_y" + ".csv"),
+                         header=0, index_col="index", dtype={"index": str})
+    labels = labels.loc[cube.samples, "Ground_Truth"].to_numpy()
+    # Return cube and labels
+    return cube, labels
+
+#-----------------------------------------------------#
+#                  Inference Costs                    #
+#-----------------------------------------------------#
+def compute_costs(architectures):
+    # Sum up number of parameters of all architectures which have to be run
+    return int(sum(architecture_params[arch] for arch in architectures))
+
+#-----------------------------------------------------#
+#                     Main Runner                     #
+#-----------------------------------------------------#
+# Identify phase results directory
+path_phase = os.path.join(config["path_results"],
+                          "phase_stacking" + "." + str(config["seed"]))
+# Load val-ensemble for selection and test set for evaluation
+train_x, train_y = load_dataset(path_phase, "val-ensemble")
+test_x, test_y = load_dataset(path_phase, "test")
+n_classes = train_x.n_classes
+
+# Run greedy ensemble selection on val-ensemble (opt-in ensembler)
+model = ensembler_dict["GreedySelection"](n_classes,
+                                          n_iterations=config["n_iterations"],
+                                          metric=config["metric"])
+model.training(train_x, train_y)
+selection = model.selection()
+
+# Evaluate selected ensemble against the mean of all architectures
+results = {"selection": selection, "scores": model.scores}
+for subset, cube, labels in [("val-ensemble", train_x, train_y),
+                             ("test", test_x, test_y)]:
+    pred_sel = np.argmax(model.prediction(cube), axis=-1)
+    pred_all = np.argmax(cube.class_sum(), axis=-1)
+    f1 = compute_macro_f1(labels, np.stack([pred_sel, pred_all], axis=1),
+                          n_classes)
+    results[subset] = {"F1_selection": float(f1[0]), "F1_all": float(f1[1])}
+
+# Compare inference costs of selected against all architectures
+params_sel = compute_costs(selection.keys())
+params_all = compute_costs(train_x.architectures)
+results["costs"] = {"architectures_selection": len(selection),
+                    "architectures_all": train_x.n_architectures,
+                    "params_selection": params_sel,
+                    "params_all": params_all,
+                    "savings": 1.0 - params_sel / params_all}
+
+# Print summary
+print("Selected architectures:", selection)
+for subset in ["val-ensemble", "test"]:
+    print(subset, "F1 (selection/all):", results[subset]["F1_selection"],
+          results[subset]["F1_all"])
+print("Parameters (selection/all):", params_sel, params_all,
+      "-> savings:", round(results["costs"]["savings"] * 100, 2), "%")
+
+# Store results as JSON to disk
+path_json = os.path.join(path_phase, "greedy_selection.json")
+with open(path_json, "w") as file:
+    json.dump(results, file, indent=2)
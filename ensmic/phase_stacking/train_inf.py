@@ -23,12 +23,12 @@
 # External libraries
 import argparse
 import os
-import time
 import json
 import pandas as pd
 # Internal libraries/scripts
-from ensmic.data_loading import IO_Inference
-from ensmic.ensemble import ensembler_dict, ensembler
+from ensmic.data_loading import IO_Inference, load_ground_truth
+from ensmic.ensemble import ensembler, PredictionCube, Ensemble_Engine
+from ensmic.ensemble.hyperparameter_search import load_hyperparameters
 
 #-----------------------------------------------------#
 #                      Argparser                      #
@@ -53,36 +53,56 @@ config["path_results"] = "results"
 config["seed"] = args.seed
 # List of ensemble learning techniques
 config["ensembler_list"] = ensembler
+# Number of samples per chunk for streaming inference
+config["chunk_size"] = 10000
+# Number of processes for running ensemblers in parallel
+config["workers"] = min(len(ensembler), os.cpu_count() or 1)
+# Optional hyperparameters for ensemble learning techniques, e.g. approximate
+# Gaussian Process or SVM for large val-ensemble sets: {"mode": "nystroem"}
+config["ensembler_params"] = {"GaussianProcess": {"mode": "exact"},
+                             "SupportVectorMachine": {"mode": "exact"}}
 
 #-----------------------------------------------------#
 #                     Run Training                    #
 #-----------------------------------------------------#
-def run_training(ds_x, ds_y, ensembler, path_elm, config):
-    # Obtain initialization variables for Ensemble Learning model
+def run_training(ds_x, ds_y, path_phase, config):
+    # Obtain initialization variables for Ensemble Learning models
     n_classes = len(config["class_list"])
-    # Create Ensemble Learning model
-    model = ensembler_dict[ensembler](n_classes=n_classes)
-    # Fit model on data
-    model.training(ds_x.copy(), ds_y.copy())
-    # Dump fitted model to disk
-    path_model = os.path.join(path_elm, "model.pkl")
-    model.dump(path_model)
-    # Return fitted model and esembler path
-    return model
+    # Create fused engine for all Ensemble Learning models
+    engine = Ensemble_Engine(config["ensembler_list"], n_classes=n_classes,
+                             ensembler_params=config["ensembler_params"],
+                             n_workers=config["workers"])
+    # Fit all models on data with shared intermediates
+    engine.training(ds_x, ds_y)
+    # Dump fitted models to disk
+    engine.dump(lambda ensembler: os.path.join(path_phase, ensembler,
+                                               "model.pkl"))
+    # Return fitted engine
+    return engine
 
 #-----------------------------------------------------#
 #                    Run Inference                    #
 #-----------------------------------------------------#
-def run_inference(test_x, model, path_elm, config):
-    # Compute predictions via Ensemble Learning method
-    predictions = model.prediction(test_x.copy())
+def run_inference(test_x, engine, path_phase, config):
+    # Compute predictions via all Ensemble Learning methods chunk by chunk
+    chunks = test_x.iter_chunks(config["chunk_size"])
+    predictions = engine.predict_stream(chunks)
+    # Stream predictions of all ensemblers to disk into a single bulk file
+    path_cube = os.path.join(path_phase, "ensemble.inference.test.cube.npz")
+    PredictionCube.store_stream(path_cube, predictions, test_x.samples,
+                                list(engine.models.keys()), test_x.class_list)
 
-    # Create an Inference IO Interface
-    path_inf = os.path.join(path_elm, "inference" + "." + "test" + ".json")
-    infIO = IO_Inference(config["class_list"], path=path_inf)
-    # Store prediction for each sample
-    samples = test_x.index.values.tolist()
-    infIO.store_inference(samples, predictions)
+    # Export predictions of each ensembler for the evaluation scripts
+    predictions = PredictionCube.load(path_cube, mmap_mode="r")
+    for e, ensembler in enumerate(predictions.architectures):
+        if ensembler in engine.failed : continue
+        # Create an Inference IO Interface
+        path_inf = os.path.join(path_phase, ensembler,
+                                "inference" + "." + "test" + ".npz")
+        infIO = IO_Inference(config["class_list"], path=path_inf)
+        # Store prediction for each sample chunk by chunk
+        infIO.store_inference_stream((chunk.samples.tolist(), chunk.data[:, e, :])
+                                     for chunk in predictions.iter_chunks(config["chunk_size"]))
 
 #-----------------------------------------------------#
 #                     Main Runner                     #
@@ -90,45 +110,35 @@ def run_inference(test_x, model, path_elm, config):
 # Identify phase results directory
 path_phase = os.path.join(config["path_results"],
                           "phase_stacking" + "." + str(config["seed"]))
+# Reuse tuned hyperparameters of hyperparameter_search.py (if available)
+tuned = load_hyperparameters(os.path.join(path_phase, "hyperparameters.json"))
+for ensembler in tuned:
+    params = config["ensembler_params"].setdefault(ensembler, {})
+    params.update(tuned[ensembler])
+    print("Using tuned hyperparameters for Ensembler:", ensembler, params)
 # Load dataset for training
-train_x = pd.read_csv(os.path.join(path_phase, "phase_baseline.inference." + \
-                                   "val-ensemble." + "set_x" + ".csv"),
-                      header=0, index_col="index")
+train_x = PredictionCube.load(os.path.join(path_phase, "phase_baseline.inference." + \
+                                           "val-ensemble." + "cube" + ".npz"))
 train_y = pd.read_csv(os.path.join(path_phase, "phase_baseline.inference." + \
                                    "val-ensemble." + "set_y" + ".csv"),
                       header=0, index_col="index")
-# Load dataset for testing
-test_x = pd.read_csv(os.path.join(path_phase, "phase_baseline.inference." + \
-                                  "test." + "set_x" + ".csv"),
-                     header=0, index_col="index")
+# Load dataset for testing (memory-mapped for streaming inference)
+test_x = PredictionCube.load(os.path.join(path_phase, "phase_baseline.inference." + \
+                                          "test." + "cube" + ".npz"),
+                             mmap_mode="r")
 
 # Load class list
-path_gt = os.path.join(config["path_data"], config["seed"] + \
-                       "." + "val-ensemble" + ".json")
-with open(path_gt, "r") as json_reader:
-    gt_map = json.load(json_reader)
+gt_map = load_ground_truth(config["path_data"], "val-ensemble", config["seed"])
 config["class_list"] = gt_map["legend"]
 
-# Initialize cache memory to store meta information
-timer_cache = {}
-
 # Run Training and Inference for all ensemble learning techniques
-for ensembler in config["ensembler_list"]:
-    print("Start running Ensembler:", ensembler)
-    try:
-        # Get path to Ensembler subdirectory
-        path_elm = os.path.join(path_phase, ensembler)
-        # Run Pipeline
-        timer_start = time.time()
-        model = run_training(train_x, train_y, ensembler, path_elm, config)
-        run_inference(test_x, model, path_elm, config)
-        timer_end = time.time()
-        # Store execution time in cache
-        timer_time = timer_end - timer_start
-        timer_cache[ensembler] = timer_time
-        print("Finished running Ensembler:", ensembler, timer_time)
-    except Exception as e:
-        print(ensembler, "-", "An exception occurred:", str(e))
+print("Start running Ensemblers:", config["ensembler_list"])
+engine = run_training(train_x, train_y, path_phase, config)
+run_inference(test_x, engine, path_phase, config)
+# Obtain execution time of each ensembler
+timer_cache = engine.timer_cache
+for ensembler in timer_cache:
+    print("Finished running Ensembler:", ensembler, timer_cache[ensembler])
 
 # Store time measurements as JSON to disk
 path_time = os.path.join(config["path_results"], "phase_stacking" + "." + \
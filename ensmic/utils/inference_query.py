@@ -0,0 +1,70 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import argparse
+import os
+import json
+# Internal libraries/scripts
+from ensmic.data_loading import Inference_Index
+
+#-----------------------------------------------------#
+#                      Argparser                      #
+#-----------------------------------------------------#
+parser = argparse.ArgumentParser(description="Query predictions of all architectures for samples via the directory index")
+parser.add_argument("-m", "--modularity", help="Data modularity selection: ['covid', 'isic', 'chmnist', 'drd']",
+                    required=True, type=str, dest="seed")
+parser.add_argument("-p", "--phase", help="Phase directory prefix, e.g. 'phase_baseline' or 'phase_augmenting'",
+                    required=False, type=str, dest="phase", default="phase_baseline")
+parser.add_argument("-s", "--subset", help="Inference subset: ['val-ensemble', 'test']",
+                    required=False, type=str, dest="subset", default="test")
+parser.add_argument("samples", help="Sample identifiers", nargs="+")
+args = parser.parse_args()
+
+#-----------------------------------------------------#
+#                    Configurations                   #
+#-----------------------------------------------------#
+# Initialize configuration dictionary
+config = {}
+# Path to result directory
+config["path_results"] = "results"
+# Seed (if training multiple runs)
+config["seed"] = args.seed
+
+#-----------------------------------------------------#
+#                     Main Runner                     #
+#-----------------------------------------------------#
+# Identify phase directory and index file
+path_phase = os.path.join(config["path_results"], args.phase + "." + config["seed"])
+index = Inference_Index(os.path.join(path_phase, "inference." + args.subset + \
+                                     ".index.npz"))
+# (Re)build index if missing or outdated
+if index.is_stale():
+    print("Building inference index of:", path_phase)
+    index.build_directory(path_phase, args.subset)
+
+# Query predictions of all architectures for each sample
+results = {"legend": index.legend()}
+for sample in args.samples:
+    try : results[sample] = index.query(sample)
+    except KeyError : results[sample] = None
+print(json.dumps(results, indent=2))
@@ -0,0 +1,54 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import zipfile
+import numpy as np
+
+#-----------------------------------------------------#
+#          Memory-Mapping of NumPy Archives           #
+#-----------------------------------------------------#
+def memmap_archive(path, member, mmap_mode="r"):
+    """ Memory-map an uncompressed array member of a NumPy npz archive. """
+    with zipfile.ZipFile(path, "r") as archive:
+        info = archive.getinfo(member)
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError("Memory-mapping requires an uncompressed archive: " + \
+                             str(path))
+    with open(path, "rb") as file:
+        # Skip local zip file header to reach the npy member
+        file.seek(info.header_offset)
+        local_header = file.read(30)
+        name_length = int.from_bytes(local_header[26:28], "little")
+        extra_length = int.from_bytes(local_header[28:30], "little")
+        file.seek(info.header_offset + 30 + name_length + extra_length)
+        # Parse npy header and identify offset of the raw array
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+        offset = file.tell()
+    # Return memory-mapped array
+    order = "F" if fortran_order else "C"
+    return np.memmap(path, dtype=dtype, mode=mmap_mode, shape=shape,
+                     order=order, offset=offset)
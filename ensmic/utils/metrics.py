@@ -81,6 +81,59 @@ def compute_rawCM(gt, pd, classes):
         rawcm[gt[i]][pd[i]] += 1
     return rawcm
 
+# Compute macro-averaged F1 score for multiple predictions at once
+def compute_macro_f1(truth, preds, n_classes):
+    """ Macro F1 for each column of an integer prediction matrix.
+
+    Equivalent to sklearn's f1_score(average="macro") per column, but computed
+    via bincount for all columns at once. Classes which neither occur in the
+    ground truth nor in the predictions are ignored (like sklearn).
+
+    Arguments:
+        truth (numpy.ndarray):      Ground truth classes with shape (samples,).
+        preds (numpy.ndarray):      Predicted classes with shape (samples, n).
+        n_classes (int):            Number of classes.
+
+    Returns:
+        f1 (numpy.ndarray):         Macro F1 for each column with shape (n,).
+    """
+    return macro_f1_from_counts(compute_f1_counts(truth, preds, n_classes))
+
+def compute_f1_counts(truth, preds, n_classes):
+    """ Sufficient statistics of the macro F1 for each prediction column.
+
+    The counts are additive, thus the counts of multiple sample chunks can be
+    summed up to obtain the counts of all samples (incremental F1).
+
+    Returns:
+        counts (numpy.ndarray):     True positives, predicted and true
+                                    occurrences with shape (n, 3, n_classes).
+    """
+    truth = np.asarray(truth).ravel()
+    preds = np.asarray(preds).reshape(len(truth), -1)
+    n = preds.shape[1]
+    # Shift class indices for each column to obtain disjoint bincount ranges
+    index = preds + np.arange(n) * n_classes
+    correct = preds == truth[:, None]
+    # Count true positives, predicted and true occurrences per column & class
+    tp = np.bincount(index[correct], minlength=n*n_classes).reshape(n, n_classes)
+    pd_count = np.bincount(index.ravel(),
+                           minlength=n*n_classes).reshape(n, n_classes)
+    gt_count = np.broadcast_to(np.bincount(truth, minlength=n_classes),
+                               (n, n_classes))
+    # Return stacked counts
+    return np.stack([tp, pd_count, gt_count], axis=1)
+
+def macro_f1_from_counts(counts):
+    """ Macro F1 for each column from counts of compute_f1_counts. """
+    tp, pd_count, gt_count = counts[:, 0], counts[:, 1], counts[:, 2]
+    # Compute classwise F1 = 2TP / (2TP + FP + FN) = 2TP / (#pred + #truth)
+    denom = pd_count + gt_count
+    present = denom > 0
+    f1 = np.divide(2 * tp, denom, out=np.zeros(denom.shape), where=present)
+    # Average over all classes present in ground truth or predictions
+    return f1.sum(axis=1) / np.maximum(present.sum(axis=1), 1)
+
 # Function for safe division (catch division by zero)
 def safe_division(x, y):
     return x / y if y else 0
\ No newline at end of file
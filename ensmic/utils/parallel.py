@@ -0,0 +1,55 @@
+
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import os
+import multiprocessing
+from threadpoolctl import threadpool_limits
+
+#-----------------------------------------------------#
+#                 Process Pool Creation               #
+#-----------------------------------------------------#
+""" Create a process pool for CPU-bound ensemble learning jobs.
+
+The pool is forked, thus all objects passed via initargs (e.g. prediction cubes
+or memory-mapped matrices) are shared zero-copy with the workers instead of
+being pickled. To avoid oversubscription, the BLAS/OpenMP threads of each worker
+are capped to blas_threads (default: cores divided by workers).
+"""
+def process_pool(n_workers, initializer=None, initargs=(), blas_threads=None):
+    # Compute thread cap per worker
+    if blas_threads is None:
+        blas_threads = max(1, (os.cpu_count() or 1) // n_workers)
+    # Create forked pool with thread limitation in each worker
+    context = multiprocessing.get_context("fork")
+    return context.Pool(processes=n_workers, initializer=initialize_worker,
+                        initargs=(blas_threads, initializer, initargs))
+
+def initialize_worker(blas_threads, initializer, initargs):
+    # Cap threads for libraries initialized later in the worker
+    for variable in ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                     "MKL_NUM_THREADS", "BLIS_NUM_THREADS"]:
+        os.environ[variable] = str(blas_threads)
+    # Cap threads of already loaded BLAS/OpenMP libraries
+    threadpool_limits(limits=blas_threads)
+    # Run custom initialization
+    if initializer is not None : initializer(*initargs)
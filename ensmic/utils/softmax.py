@@ -31,7 +31,11 @@ import numpy as np
 #-----------------------------------------------------#
 #                   Softmax Function                  #
 #-----------------------------------------------------#
-def softmax(x):
-    """Compute softmax values for each sets of scores in x."""
-    e_x = np.exp(x - np.max(x))
-    return e_x / e_x.sum()
\ No newline at end of file
+def softmax(x, axis=None):
+    """Compute softmax values for each sets of scores in x.
+
+    If an axis is provided, the softmax is computed independently along this
+    axis (e.g. axis=-1 for a row-wise softmax on a 2D array).
+    """
+    e_x = np.exp(x - np.max(x, axis=axis, keepdims=True))
+    return e_x / e_x.sum(axis=axis, keepdims=True)
\ No newline at end of file
@@ -17,7 +17,8 @@ setup(
                      'pandas>=1.1.4',
                      'pillow>=7.2.0',
                      'plotnine>=0.7.1',
-                     'tqdm>=4.35.0'],
+                     'tqdm>=4.35.0',
+                     'threadpoolctl>=2.0.0'],
    classifiers=["Programming Language :: Python :: 3",
                 "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
                 "Operating System :: OS Independent",
@@ -0,0 +1,79 @@
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import os
+import pickle
+import numpy as np
+# Internal libraries/scripts
+from ensmic.ensemble.prediction_cube import PredictionCube
+from ensmic.ensemble.logistic_regression import ELM_LogisticRegression
+
+#-----------------------------------------------------#
+#                    Test Utilities                   #
+#-----------------------------------------------------#
+def create_data(n_samples, n_architectures=3, n_classes=3, seed=0):
+    # Create random predictions which are informative about the labels
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, n_classes, size=n_samples)
+    logits = rng.normal(size=(n_samples, n_architectures, n_classes))
+    logits[np.arange(n_samples), :, labels] += 1.5
+    probs = np.exp(logits) / np.exp(logits).sum(axis=-1, keepdims=True)
+    return PredictionCube(probs), labels
+
+#-----------------------------------------------------#
+#                  Persistence Tests                  #
+#-----------------------------------------------------#
+def test_update_after_dump_and_load(tmp_path):
+    train_x, train_y = create_data(200, seed=0)
+    new_x, new_y = create_data(50, seed=1)
+    # Reference: update without persistence
+    reference = ELM_LogisticRegression(n_classes=3)
+    reference.training(train_x, train_y)
+    reference.update(new_x, new_y)
+    # Dump a freshly trained model, load it and update it afterwards
+    model = ELM_LogisticRegression(n_classes=3)
+    model.training(train_x, train_y)
+    path_model = os.path.join(str(tmp_path), "model.LogisticRegression.npz")
+    model.dump(path_model)
+    loaded = ELM_LogisticRegression(n_classes=3)
+    loaded.load(path_model)
+    loaded.update(new_x, new_y)
+    # Loaded model has to match the reference
+    assert np.allclose(loaded.model.coef_, reference.model.coef_, atol=1e-8)
+    assert np.allclose(loaded.hessian, reference.hessian)
+    assert np.allclose(loaded.prediction(new_x), reference.prediction(new_x),
+                       atol=1e-8)
+
+def test_update_after_pickle():
+    train_x, train_y = create_data(200, seed=0)
+    new_x, new_y = create_data(50, seed=1)
+    # Reference: update without persistence
+    reference = ELM_LogisticRegression(n_classes=3)
+    reference.training(train_x, train_y)
+    reference.update(new_x, new_y)
+    # Pickled models (e.g. returned by workers) have to stay updatable
+    model = ELM_LogisticRegression(n_classes=3)
+    model.training(train_x, train_y)
+    model = pickle.loads(pickle.dumps(model))
+    assert model.train_data is None
+    model.update(new_x, new_y)
+    assert np.allclose(model.model.coef_, reference.model.coef_, atol=1e-8)
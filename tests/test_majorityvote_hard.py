@@ -0,0 +1,53 @@
+#==============================================================================#
+#  Author:       Dominik Müller                                                #
+#  Copyright:    2021 IT-Infrastructure for Translational Medical Research,    #
+#                University of Augsburg                                        #
+#                                                                              #
+#  This program is free software: you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation, either version 3 of the License, or           #
+#  (at your option) any later version.                                         #
+#                                                                              #
+#  This program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#==============================================================================#
+#-----------------------------------------------------#
+#                   Library imports                   #
+#-----------------------------------------------------#
+# External libraries
+import os
+import numpy as np
+# Internal libraries/scripts
+from ensmic.ensemble.prediction_cube import PredictionCube
+from ensmic.ensemble.majorityvote_hard import ELM_MajorityVote_Hard
+
+#-----------------------------------------------------#
+#                  Persistence Tests                  #
+#-----------------------------------------------------#
+def test_dump_load_parity_with_dict_weights(tmp_path):
+    # Create predictions with ties between architectures
+    rng = np.random.default_rng(0)
+    probs = rng.dirichlet(np.ones(3), size=(100, 4))
+    cube = PredictionCube(probs, architectures=["a", "b", "c", "d"])
+    labels = rng.integers(0, 3, size=100)
+    weights = {"d": 1.0, "c": 2.0, "b": 1.0, "a": 2.0}
+    # Fit model and dump it to disk
+    model = ELM_MajorityVote_Hard(n_classes=3, weights=weights,
+                                  tie_break="confidence")
+    model.training(cube, labels)
+    path_model = os.path.join(str(tmp_path), "model.MajorityVote_Hard.npz")
+    model.dump(path_model)
+    # Load model into a fresh instance without weights
+    loaded = ELM_MajorityVote_Hard(n_classes=3)
+    loaded.load(path_model)
+    assert loaded.tie_break == "confidence"
+    assert loaded.architectures == ["a", "b", "c", "d"]
+    # Predictions of the loaded model have to match the original one
+    assert np.allclose(loaded.prediction(cube), model.prediction(cube))
+    assert np.allclose(loaded.predict_batch(probs), model.predict_batch(probs))
+    assert np.allclose(loaded.predict_batch(probs), model.prediction(cube))